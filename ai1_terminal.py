@@ -6,7 +6,7 @@
 
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from ai_client import get_shared_client
 
 # ===== ЗАГРУЗКА КОНФИГУРАЦИИ =====
 load_dotenv('config.env')
@@ -25,10 +25,8 @@ class AI1Terminal:
             print("📋 Убедитесь, что AI_1_API_KEY указан правильно")
             exit(1)
         
-        self.client = OpenAI(
-            api_key=AI_1_API_KEY,
-            base_url=AI_1_BASE_URL,
-        )
+        # Тот же клиент, что и в веб-приложении: таймауты, повторы и ограничение запросов
+        self.client = get_shared_client(AI_1_API_KEY, AI_1_BASE_URL)
         print(f"✅ Подключение к {AI_1_MODEL} установлено")
     
     def send_message(self, message: str) -> str:
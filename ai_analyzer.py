@@ -5,30 +5,66 @@
 """
 
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import time
 import json
+from ai_cache import RequestCoalescer, make_cache_key
+from ai_client import ResilientClient, get_shared_client
+from ai_health import HealthMonitor
+from ai_stub import StubClient
+from metrics import REGISTRY
 
 # ===== ЗАГРУЗКА КОНФИГУРАЦИИ =====
-load_dotenv('config.env')
+def load_config():
+    """Читает config.env и переменные AI_2_* при создании анализатора, а не при импорте модуля"""
+    from dotenv import load_dotenv
+    load_dotenv('config.env')
 
-# Получаем конфигурацию
-AI_2_API_KEY = os.getenv("AI_2_API_KEY", "your_openai_api_key_here")
-AI_2_BASE_URL = os.getenv("AI_2_BASE_URL", "https://api.proxyapi.ru/openai/v1")
-AI_2_MODEL = os.getenv("AI_2_MODEL", "gpt-4o-mini")
+    return {
+        'api_key': os.getenv("AI_2_API_KEY", "your_openai_api_key_here"),
+        'base_url': os.getenv("AI_2_BASE_URL", "https://api.proxyapi.ru/openai/v1"),
+        'model': os.getenv("AI_2_MODEL", "gpt-4o-mini"),
+        # 1 - отвечать локальной заглушкой без обращения к API (для проверки без сети)
+        'stub': os.getenv("AI_2_STUB", "0") == "1"
+    }
+
+# Параметры генерации анализа
+ANALYSIS_MAX_TOKENS = 2000  # Ограничиваем длину ответа
+ANALYSIS_TEMPERATURE = 0.7  # Баланс между креативностью и точностью
+
+# Метрики запросов к AI для /metrics
+AI_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+AI_REQUEST_SECONDS = REGISTRY.histogram(
+    'ai_request_seconds', 'Длительность запросов к AI: completion, stream, probe', ['kind', 'outcome'], AI_BUCKETS
+)
+AI_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    'ai_first_token_seconds', 'Время до первого фрагмента потокового ответа', buckets=AI_BUCKETS
+)
+AI_TOKENS = REGISTRY.counter('ai_tokens_total', 'Токены в запросах к AI по данным API', ['type'])
+AI_RESPONSES = REGISTRY.counter('ai_responses_total', 'Ответы на запросы анализа по источнику', ['source'])
 
 class AIAnalyzer:
     """Класс для анализа данных через Яндекс.GPT"""
     
-    def __init__(self):
-        if AI_2_API_KEY == "your_openai_api_key_here":
-            raise ValueError("API ключ для AI не настроен в config.env. Убедитесь, что AI_2_API_KEY указан правильно.")
+    def __init__(self, client=None, cache=None, coalesce=True, health_ttl=60):
+        """client - готовый клиент (например, StubClient), cache - AIResponseCache,
+        coalesce - объединять одновременные одинаковые запросы,
+        health_ttl - сколько секунд считать актуальной проверку подключения"""
+        config = load_config()
+        if client is None and config['stub']:
+            client = StubClient()
+        if client is None:
+            if config['api_key'] == "your_openai_api_key_here":
+                raise ValueError("API ключ для AI не настроен в config.env. Убедитесь, что AI_2_API_KEY указан правильно.")
+            # Общий клиент с пулом соединений, таймаутами, повторами и ограничением одновременных запросов
+            client = get_shared_client(config['api_key'], config['base_url'])
+        elif not isinstance(client, ResilientClient):
+            client = ResilientClient(client)
         
-        self.client = OpenAI(
-            api_key=AI_2_API_KEY,
-            base_url=AI_2_BASE_URL,
-        )
-        self.model = AI_2_MODEL
+        self.client = client
+        self.model = config['model']
+        self.cache = cache
+        self.coalescer = RequestCoalescer() if coalesce else None
+        self.health = HealthMonitor(self.probe_connection, ttl_seconds=health_ttl)
     
     def format_table_data(self, data, columns):
         """Форматирует данные таблицы в читаемый вид"""
@@ -53,12 +89,22 @@ class AIAnalyzer:
         return formatted_data
     
     def create_analysis_prompt(self, table_data, columns):
-        """Создает промпт для анализа данных"""
+        """Создает промпт для анализа данных по первым строкам таблицы"""
         formatted_data = self.format_table_data(table_data, columns)
-        
+        return self.create_prompt("Here are the first 15 rows of the table:", formatted_data)
+    
+    def create_profile_prompt(self, profile_text):
+        """Создает промпт для анализа данных по профилю таблицы (см. ai_prompt.build_data_profile)"""
+        return self.create_prompt(
+            "Here is a profile of the whole table: column statistics, detected anomalies and a sample of rows:",
+            profile_text
+        )
+    
+    def create_prompt(self, intro, formatted_data):
+        """Добавляет к описанию данных инструкции и формат ответа"""
         prompt = f"""You are an analytical system with extensive experience. Your task is to analyze tabular data, draw conclusions, and identify anomalies or interesting trends.
 
-Here are the first 15 rows of the table:
+{intro}
 
 {formatted_data}
 
@@ -86,13 +132,10 @@ Please provide the analysis in English language with clear bullet points and str
         
         return prompt
     
-    def analyze_data(self, table_data, columns):
-        """Анализирует данные через Яндекс.GPT"""
+    def request_completion(self, prompt):
+        """Отправляет промпт к AI и возвращает текст ответа"""
+        started = time.perf_counter()
         try:
-            # Создаем промпт
-            prompt = self.create_analysis_prompt(table_data, columns)
-            
-            # Отправляем запрос к AI
             chat_completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -101,46 +144,154 @@ Please provide the analysis in English language with clear bullet points and str
                         "content": prompt
                     }
                 ],
-                max_tokens=2000,  # Ограничиваем длину ответа
-                temperature=0.7   # Баланс между креативностью и точностью
+                max_tokens=ANALYSIS_MAX_TOKENS,
+                temperature=ANALYSIS_TEMPERATURE
             )
+        except Exception:
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='completion', outcome='error')
+            raise
+        AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='completion', outcome='ok')
+        
+        usage = getattr(chat_completion, 'usage', None)
+        if usage is not None:
+            AI_TOKENS.inc(usage.prompt_tokens or 0, type='prompt')
+            AI_TOKENS.inc(usage.completion_tokens or 0, type='completion')
+        return chat_completion.choices[0].message.content
+    
+    def analyze_data(self, table_data, columns, refresh=False, prompt=None):
+        """Анализирует данные через Яндекс.GPT
+
+        Ответ на тот же промпт берется из кэша, refresh=True запрашивает новый.
+        prompt - готовый промпт (например, create_profile_prompt) вместо первых строк
+        """
+        try:
+            # Создаем промпт
+            if prompt is None:
+                prompt = self.create_analysis_prompt(table_data, columns)
+            key = make_cache_key(self.model, prompt, ANALYSIS_TEMPERATURE, ANALYSIS_MAX_TOKENS)
+            
+            if self.cache is not None and not refresh:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    AI_RESPONSES.inc(source='cache')
+                    return {
+                        'success': True,
+                        'analysis': cached,
+                        'model': self.model,
+                        'cached': True,
+                        'coalesced': False
+                    }
+            
+            def request():
+                response = self.request_completion(prompt)
+                if self.cache is not None:
+                    self.cache.put(key, self.model, response)
+                return response
+            
+            # Одинаковые одновременные запросы ждут один вызов API
+            if self.coalescer is not None:
+                response, coalesced = self.coalescer.run(key, request)
+            else:
+                response, coalesced = request(), False
             
-            response = chat_completion.choices[0].message.content
+            AI_RESPONSES.inc(source='coalesced' if coalesced else 'api')
             return {
                 'success': True,
                 'analysis': response,
-                'model': self.model
+                'model': self.model,
+                'cached': False,
+                'coalesced': coalesced
             }
             
         except Exception as e:
+            AI_RESPONSES.inc(source='error')
             return {
                 'success': False,
                 'error': f"Ошибка при анализе данных: {str(e)}",
                 'model': self.model
             }
     
-    def get_status(self):
-        """Проверяет статус подключения к AI"""
+    def stream_analysis(self, table_data, columns, refresh=False, prompt=None):
+        """Анализирует данные, отдавая ответ по мере генерации
+
+        Генератор событий: meta (модель, из кэша ли ответ), delta (очередной фрагмент
+        текста), done или error. Готовый ответ из кэша отдается одним фрагментом
+        """
+        started = None
         try:
-            # Простой тестовый запрос
-            test_completion = self.client.chat.completions.create(
+            if prompt is None:
+                prompt = self.create_analysis_prompt(table_data, columns)
+            key = make_cache_key(self.model, prompt, ANALYSIS_TEMPERATURE, ANALYSIS_MAX_TOKENS)
+            
+            cached = self.cache.get(key) if self.cache is not None and not refresh else None
+            yield {'type': 'meta', 'model': self.model, 'cached': cached is not None}
+            if cached is not None:
+                AI_RESPONSES.inc(source='cache')
+                yield {'type': 'delta', 'text': cached}
+                yield {'type': 'done'}
+                return
+            
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {
                         "role": "user",
-                        "content": "Тест подключения"
+                        "content": prompt
                     }
                 ],
-                max_tokens=10
+                max_tokens=ANALYSIS_MAX_TOKENS,
+                temperature=ANALYSIS_TEMPERATURE,
+                stream=True
             )
-            return {
-                'connected': True,
-                'model': self.model,
-                'status': 'Подключено'
-            }
+            
+            parts = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    if not parts:
+                        AI_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                    parts.append(text)
+                    yield {'type': 'delta', 'text': text}
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='stream', outcome='ok')
+            AI_RESPONSES.inc(source='api')
+            
+            # В кэш попадает только полностью полученный ответ
+            if self.cache is not None and parts:
+                self.cache.put(key, self.model, ''.join(parts))
+            yield {'type': 'done'}
+            
         except Exception as e:
-            return {
-                'connected': False,
-                'model': self.model,
-                'status': f'Ошибка подключения: {str(e)}'
-            } 
\ No newline at end of file
+            if started is not None:
+                AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='stream', outcome='error')
+            AI_RESPONSES.inc(source='error')
+            yield {'type': 'error', 'error': f"Ошибка при анализе данных: {str(e)}"}
+    
+    def probe_connection(self):
+        """Легкая проверка подключения: список моделей вместо генерации ответа (в обход выключателя)"""
+        from openai import NotFoundError
+
+        started = time.perf_counter()
+        try:
+            self.client.probe_models()
+        except NotFoundError:
+            # Прокси без списка моделей - сервер ответил, ключ принят
+            pass
+        except Exception:
+            AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='probe', outcome='error')
+            raise
+        AI_REQUEST_SECONDS.observe(time.perf_counter() - started, kind='probe', outcome='ok')
+    
+    def get_status(self, force=False):
+        """Проверяет статус подключения к AI (результат проверки кэшируется)"""
+        check = self.health.get_status(force=force)
+        return {
+            'connected': check['ok'],
+            'model': self.model,
+            'status': 'Подключено' if check['ok'] else f"Ошибка подключения: {check['error']}",
+            'latency_ms': check['latency_ms'],
+            'checked_at': check['checked_at'],
+            'stale': check['stale']
+        }
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Кэш ответов нейросети
+Ответы хранятся в SQLite и переживают перезапуск сервера. Ключ - модель,
+хеш промпта и параметры генерации, записи устаревают через ttl_seconds,
+при превышении max_entries удаляются давно не использованные. Одинаковые
+запросы, пришедшие одновременно, объединяются в один вызов API
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_cache_key(model, prompt, temperature, max_tokens):
+    """Ключ кэша: модель, хеш промпта и параметры генерации"""
+    payload = json.dumps([model, prompt, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """Постоянный кэш ответов в SQLite с временем жизни и ограничением числа записей"""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, model TEXT, response TEXT, '
+                'created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)'
+            )
+
+    def _connect(self):
+        """Открывает соединение (SQLite-соединение нельзя делить между потоками)"""
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        """Возвращает сохраненный ответ или None, если его нет или он устарел"""
+        now = time.time()
+        with self.lock, self._connect() as connection:
+            row = connection.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+
+            connection.execute(
+                'UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?', (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, response):
+        """Сохраняет ответ и удаляет лишние записи"""
+        now = time.time()
+        with self.lock, self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at, hits) '
+                'VALUES (?, ?, ?, ?, ?, 0)', (key, model, response, now, now)
+            )
+            self._prune(connection, now)
+
+    def _prune(self, connection, now):
+        """Удаляет устаревшие записи и самые давно использованные сверх max_entries"""
+        connection.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        connection.execute(
+            'DELETE FROM responses WHERE key NOT IN '
+            '(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)', (self.max_entries,)
+        )
+
+    def clear(self):
+        """Удаляет все сохраненные ответы"""
+        with self.lock, self._connect() as connection:
+            connection.execute('DELETE FROM responses')
+
+    def get_stats(self):
+        """Возвращает счетчики кэша"""
+        with self.lock, self._connect() as connection:
+            entries = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class CoalescedCallFailed(Exception):
+    """Общий вызов прерван (таймаут процесса, остановка сервера) и не вернул результат"""
+
+
+class RequestCoalescer:
+    """Объединяет одновременные одинаковые запросы: API вызывает только первый,
+    остальные ждут его результата"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.coalesced = 0
+
+    def run(self, key, function):
+        """Выполняет function для ключа или ждет уже идущего вызова
+
+        Возвращает (результат, True если результат получен чужим вызовом)
+        """
+        with self.lock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self.inflight[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = function()
+        except BaseException as e:
+            # KeyboardInterrupt, SystemExit и т.п. не пробрасываем в чужие потоки, но ожидающие
+            # должны получить ошибку, а не пустой результат
+            call['error'] = e if isinstance(e, Exception) else CoalescedCallFailed(
+                f"Общий запрос прерван: {type(e).__name__}"
+            )
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            call['done'].set()
+        return call['result'], False
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Общий клиент AI для веб-приложения и терминальных программ
+Один клиент OpenAI на пару (ключ, адрес) держит пул HTTP соединений. Запросы
+ограничены таймаутом и числом одновременных вызовов, временные ошибки
+повторяются с экспоненциальной задержкой со случайным разбросом, а после серии
+ошибок подряд автоматический выключатель на время перестает обращаться к API
+"""
+
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+def retryable_errors():
+    """Ошибки, после которых запрос имеет смысл повторить (сеть, таймаут, лимит, сбой сервера)
+
+    openai импортируется здесь, а не при загрузке модуля - это заметно ускоряет запуск приложения
+    """
+    try:
+        from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+        return (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+    except ImportError:
+        return (ConnectionError, TimeoutError)
+
+
+def client_errors():
+    """Ошибки запроса, на которые сервер ответил (4xx, нет /models у прокси): API доступен, повтор не нужен"""
+    try:
+        from openai import APIStatusError
+        return (APIStatusError,)
+    except ImportError:
+        return ()
+
+
+def client_settings():
+    """Параметры клиента из config.env (читаются при создании клиента)"""
+    return {
+        'timeout': float(os.getenv("AI_TIMEOUT_SECONDS", "60")),
+        'connect_timeout': float(os.getenv("AI_CONNECT_TIMEOUT_SECONDS", "10")),
+        'max_retries': int(os.getenv("AI_MAX_RETRIES", "3")),
+        'max_concurrency': int(os.getenv("AI_MAX_CONCURRENCY", "4")),
+        'failure_threshold': int(os.getenv("AI_BREAKER_FAILURES", "5")),
+        'reset_seconds': float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+    }
+
+
+class CircuitOpenError(Exception):
+    """Выключатель разомкнут: API недавно отвечал ошибками подряд"""
+
+
+class ClientBusyError(Exception):
+    """Все слоты одновременных запросов заняты"""
+
+
+class CircuitBreaker:
+    """Автоматический выключатель: closed - запросы идут, open - отклоняются,
+    half_open - после паузы пропускается один пробный запрос"""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Разрешает запрос или бросает CircuitOpenError; возвращает True для пробного запроса"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return False
+            if state == 'half_open' and not self.trial:
+                self.trial = True
+                return True
+            retry_in = max(self.reset_seconds - (time.time() - self.opened_at), 0)
+        raise CircuitOpenError(
+            f"AI временно недоступен после {self.failure_threshold} ошибок подряд, повторите через {retry_in:.0f} с"
+        )
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                # Неудачный пробный запрос снова размыкает выключатель на reset_seconds
+                self.opened_at = time.time()
+
+    def release_trial(self):
+        """Пробный запрос прерван без ответа сервера - следующий запрос снова может стать пробным"""
+        with self.lock:
+            self.trial = False
+
+
+class ResilientClient:
+    """Обертка клиента OpenAI: ограничение одновременных запросов, повторы и выключатель
+
+    Повторяет интерфейс client.chat.completions.create и client.models.list
+    """
+
+    def __init__(self, client, max_retries=3, max_concurrency=4, acquire_timeout=None,
+                 failure_threshold=5, reset_seconds=30, backoff_base=0.5, backoff_max=8.0):
+        self.client = client
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.retryable_errors = retryable_errors()
+        self.client_errors = client_errors()
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+        self.models = SimpleNamespace(list=self.list_models)
+
+    def backoff(self, attempt):
+        """Задержка перед повтором: случайная в пределах экспоненциально растущего окна"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def acquire(self):
+        """Занимает слот одновременного запроса"""
+        if not self.semaphore.acquire(timeout=self.acquire_timeout):
+            with self.lock:
+                self.rejected += 1
+            raise ClientBusyError(f"Слишком много одновременных запросов к AI (максимум {self.max_concurrency})")
+        with self.lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+
+    def call(self, function, *args, defer_success=False, **kwargs):
+        """Вызывает метод клиента с повторами временных ошибок
+
+        Каждый вызов, в том числе пробный в состоянии half_open, завершается отметкой
+        в выключателе - иначе выключатель остался бы в half_open до перезапуска.
+        defer_success=True - успешный вызов отмечает вызывающий (потоковый ответ
+        считается успешным, только когда дошел до конца)
+        """
+        attempt = 0
+        while True:
+            try:
+                trial = self.breaker.allow()
+            except CircuitOpenError:
+                with self.lock:
+                    self.rejected += 1
+                raise
+            with self.lock:
+                self.calls += 1
+            reachable = None
+            try:
+                result = function(*args, **kwargs)
+                reachable = True
+            except self.retryable_errors as e:
+                reachable = False
+                error = e
+            except self.client_errors:
+                # Сервер ответил ошибкой запроса - он доступен, повторять бесполезно
+                reachable = True
+                defer_success = False
+                raise
+            finally:
+                if reachable is False:
+                    self.breaker.record_failure()
+                elif reachable is None:
+                    if trial:
+                        self.breaker.release_trial()
+                elif not defer_success:
+                    self.breaker.record_success()
+            if reachable:
+                return result
+
+            with self.lock:
+                self.failures += 1
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+            with self.lock:
+                self.retries += 1
+
+    def create_completion(self, **kwargs):
+        """client.chat.completions.create с ограничениями; при stream=True слот занят до конца ответа"""
+        self.acquire()
+        try:
+            result = self.call(self.client.chat.completions.create, defer_success=bool(kwargs.get('stream')), **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        if kwargs.get('stream'):
+            return self.guard_stream(result)
+        self.release()
+        return result
+
+    def guard_stream(self, stream):
+        """Отдает фрагменты потокового ответа и освобождает слот, когда поток закончился или закрыт
+
+        Выключатель получает отметку по итогу всего ответа: обрыв соединения или таймаут
+        посреди ответа - ошибка, иначе (в том числе если поток закрыл читатель) - успех
+        """
+        failed = False
+        try:
+            for chunk in stream:
+                yield chunk
+        except self.client_errors:
+            raise
+        except Exception:
+            failed = True
+            with self.lock:
+                self.failures += 1
+            raise
+        finally:
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self.release()
+
+    def list_models(self):
+        """client.models.list с ограничениями"""
+        self.acquire()
+        try:
+            return self.call(self.client.models.list)
+        finally:
+            self.release()
+
+    def probe_models(self):
+        """client.models.list для проверки доступности: без повторов, слота и выключателя
+
+        Ошибки фоновых проверок не должны размыкать выключатель для запросов
+        пользователей, а разомкнутый выключатель - скрывать, что API снова доступен
+        """
+        return self.client.models.list()
+
+    def get_stats(self):
+        """Возвращает счетчики клиента и состояние выключателя"""
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'circuit': self.breaker.state
+            }
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_client(api_key, base_url):
+    """Возвращает общий для процесса клиент для ключа и адреса API, создавая его при первом вызове"""
+    key = (api_key, base_url)
+    with _shared_lock:
+        if key not in _shared_clients:
+            from openai import OpenAI, Timeout
+
+            settings = client_settings()
+            # Повторы выполняет ResilientClient, встроенные повторы OpenAI отключены
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=Timeout(settings['timeout'], connect=settings['connect_timeout']),
+                max_retries=0
+            )
+            _shared_clients[key] = ResilientClient(
+                client,
+                max_retries=settings['max_retries'],
+                max_concurrency=settings['max_concurrency'],
+                acquire_timeout=settings['timeout'],
+                failure_threshold=settings['failure_threshold'],
+                reset_seconds=settings['reset_seconds']
+            )
+        return _shared_clients[key]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Проверка доступности AI без платных запросов
+Вместо генерации ответа вызывается легкая проверка (список моделей), результат
+хранится ttl_seconds. Устаревший результат отдается сразу, а новая проверка
+идет в фоне. История проверок дает задержку и долю ошибок. Периодическую
+проверку из нескольких процессов сервера ведет один - тот, что держит файл блокировки
+"""
+
+import threading
+import time
+from collections import deque
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+class HealthMonitor:
+    """Кэшированный статус подключения с фоновым обновлением и историей проверок"""
+
+    def __init__(self, probe, ttl_seconds=60, history_size=100):
+        self.probe = probe
+        self.ttl_seconds = ttl_seconds
+        self.history = deque(maxlen=history_size)
+        self.last = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.check_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.lock_file = None
+
+    def check(self):
+        """Выполняет проверку и сохраняет её результат"""
+        # Одновременные проверки не нужны - второй вызов дождется первого
+        with self.check_lock:
+            started = time.time()
+            try:
+                self.probe()
+                error = None
+            except Exception as e:
+                error = str(e)
+            record = {
+                'checked_at': started,
+                'latency_ms': round((time.time() - started) * 1000, 1),
+                'ok': error is None,
+                'error': error
+            }
+            with self.lock:
+                self.history.append(record)
+                self.last = record
+                self.refreshing = False
+            return record
+
+    def refresh_in_background(self):
+        """Запускает проверку в фоновом потоке, если она еще не идет"""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self.check, name='ai-health', daemon=True).start()
+
+    def get_status(self, force=False):
+        """Возвращает последний результат проверки
+
+        Первая проверка и force=True выполняются сразу, устаревший результат
+        возвращается с отметкой stale, а обновление уходит в фон
+        """
+        with self.lock:
+            last = self.last
+        if last is None or force:
+            return dict(self.check(), stale=False)
+
+        stale = time.time() - last['checked_at'] > self.ttl_seconds
+        if stale:
+            self.refresh_in_background()
+        return dict(last, stale=stale)
+
+    def start(self, interval, lock_path=None):
+        """Периодически обновляет статус в фоновом потоке
+
+        lock_path - файл блокировки, общий для процессов сервера: проверяет только
+        процесс, захвативший его, остальные пробуют захватить его на каждом шаге и
+        подхватывают проверки, если этот процесс завершится
+        """
+        def run():
+            while not self.stop_event.wait(interval):
+                if lock_path is None or self.hold_refresh_lock(lock_path):
+                    self.check()
+
+        threading.Thread(target=run, name='ai-health-refresh', daemon=True).start()
+
+    def hold_refresh_lock(self, lock_path):
+        """Захватывает файл блокировки периодической проверки (без ожидания); True - проверяет этот процесс"""
+        if self.lock_file is not None or not FCNTL_AVAILABLE:
+            return True
+        lock_file = open(lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Блокировка держится, пока файл открыт, и снимается системой при завершении процесса
+        self.lock_file = lock_file
+        return True
+
+    def stop(self):
+        """Останавливает периодическое обновление"""
+        self.stop_event.set()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def get_history(self):
+        """Возвращает историю проверок и сводку: доля ошибок и задержки"""
+        with self.lock:
+            history = list(self.history)
+
+        latencies = sorted(record['latency_ms'] for record in history if record['ok'])
+        failures = sum(1 for record in history if not record['ok'])
+        return {
+            'checks': len(history),
+            'error_rate': round(failures / len(history), 4) if history else None,
+            'latency_avg_ms': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'latency_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            'ttl_seconds': self.ttl_seconds,
+            'history': history
+        }
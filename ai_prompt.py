@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Описание таблицы для промпта нейросети
+Вместо первых строк модель получает профиль данных: размер таблицы, статистику
+и частые значения столбцов, найденные аномалии и выборку строк по группам.
+Размер описания ограничен бюджетом токенов и не зависит от числа строк
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Бюджет токенов на описание данных (без инструкций промпта)
+PROMPT_TOKEN_BUDGET = 3000
+
+# Максимум строк в выборке
+SAMPLE_ROWS = 20
+
+# Максимальная длина значения ячейки в выборке и в частых значениях
+MAX_VALUE_LENGTH = 40
+
+# Доля бюджета под описание столбцов и под аномалии, остальное - выборка строк
+COLUMNS_SHARE = 0.6
+ANOMALIES_SHARE = 0.15
+
+# Категория для стратифицированной выборки должна иметь не больше стольких значений
+MAX_STRATA = 20
+
+
+def estimate_tokens(text):
+    """Оценка числа токенов: около 4 байт UTF-8 на токен (кириллица считается вдвое дороже)"""
+    return math.ceil(len(text.encode('utf-8')) / 4)
+
+
+def format_value(value):
+    """Короткая запись значения для промпта"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return '—'
+    if isinstance(value, (float, np.floating)):
+        return f'{value:.4g}'
+    text = str(value).replace('\n', ' ')
+    if text.endswith(' 00:00:00'):
+        text = text[:-9]
+    return text if len(text) <= MAX_VALUE_LENGTH else text[:MAX_VALUE_LENGTH - 3] + '...'
+
+
+def describe_column(column, dtype, stats):
+    """Строка описания столбца по его статистике"""
+    stats = stats or {}
+    nulls = f", null {stats['null_ratio']:.0%}" if stats.get('null_ratio') else ''
+
+    if stats.get('type') == 'numeric':
+        quantiles = stats.get('quantiles') or {}
+        return (
+            f"- {column} (numeric{nulls}): min {format_value(stats['min'])}, "
+            f"q25 {format_value(quantiles.get('25%'))}, median {format_value(quantiles.get('50%'))}, "
+            f"q75 {format_value(quantiles.get('75%'))}, max {format_value(stats['max'])}, "
+            f"mean {format_value(stats['mean'])}, std {format_value(stats.get('std'))}, sum {format_value(stats['sum'])}"
+        )
+    if stats.get('type') == 'datetime':
+        return f"- {column} (datetime{nulls}): from {format_value(stats['min_date'])} to {format_value(stats['max_date'])}"
+    if stats.get('type') in ('categorical', 'text'):
+        top = ', '.join(
+            f"{format_value(item['value'])} ({item['count']})" for item in stats.get('top_values', [])
+        )
+        approx = '~' if stats.get('approximate') else ''
+        return f"- {column} ({stats['type']}{nulls}): {approx}{stats['unique_count']} unique; top: {top}"
+    return f"- {column} ({dtype})"
+
+
+def find_anomalies(df, data_types, stats, exact):
+    """Аномалии по статистике столбцов; exact - df содержит все строки и выбросы можно посчитать"""
+    anomalies = []
+    for column in df.columns:
+        column_stats = stats.get(column) or {}
+        kind = column_stats.get('type')
+
+        if kind == 'error':
+            anomalies.append(f"- {column}: statistics failed ({column_stats.get('error')})")
+            continue
+        if column_stats.get('null_ratio', 0) >= 0.5:
+            anomalies.append(f"- {column}: {column_stats['null_ratio']:.0%} of values are missing")
+
+        if kind == 'numeric' and column_stats.get('count'):
+            quantiles = column_stats.get('quantiles') or {}
+            q1, q3 = quantiles.get('25%'), quantiles.get('75%')
+            if column_stats['min'] == column_stats['max']:
+                anomalies.append(f"- {column}: constant value {format_value(column_stats['min'])}")
+            elif q1 is not None and q3 is not None:
+                # Границы Тьюки: за пределами 1.5 межквартильного размаха
+                low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+                if column_stats['min'] < low or column_stats['max'] > high:
+                    detail = ''
+                    if exact:
+                        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                        with np.errstate(invalid='ignore'):
+                            outliers = int(np.count_nonzero((values < low) | (values > high)))
+                        detail = f"{outliers} values "
+                    anomalies.append(
+                        f"- {column}: {detail}outside Tukey fences [{format_value(low)}, {format_value(high)}], "
+                        f"range {format_value(column_stats['min'])}..{format_value(column_stats['max'])}"
+                    )
+
+        if kind in ('categorical', 'text') and column_stats.get('total_count'):
+            top = column_stats.get('top_values') or []
+            if column_stats.get('unique_count') == 1:
+                anomalies.append(f"- {column}: constant value {format_value(top[0]['value']) if top else '—'}")
+            elif top and top[0]['count'] / column_stats['total_count'] >= 0.9:
+                share = top[0]['count'] / column_stats['total_count']
+                anomalies.append(f"- {column}: value {format_value(top[0]['value'])} makes up {share:.0%} of rows")
+    return anomalies
+
+
+def sample_rows(df, data_types, stats, size, seed):
+    """Выборка строк: поровну из каждой группы категориального столбца или случайная
+
+    Возвращает (строки, столбец групп или None)
+    """
+    if len(df) <= size:
+        return df, None
+
+    strata = [
+        column for column in df.columns
+        if data_types.get(column) == 'categorical'
+        and 1 < (stats.get(column) or {}).get('unique_count', 0) <= MAX_STRATA
+    ]
+    rng = np.random.default_rng(seed)
+    if not strata:
+        return df.iloc[np.sort(rng.choice(len(df), size, replace=False))], None
+
+    # Строки групп по очереди: каждая категория представлена, пока хватает места
+    codes = pd.factorize(df[strata[0]])[0]
+    order = rng.permutation(len(df))
+    groups = [order[codes[order] == code] for code in range(codes.max() + 1)]
+    if (codes < 0).any():
+        groups.append(order[codes[order] < 0])
+    picked = []
+    for position in range(size):
+        for group in groups:
+            if position < len(group) and len(picked) < size:
+                picked.append(group[position])
+        if len(picked) >= size:
+            break
+    return df.iloc[np.sort(picked)], strata[0]
+
+
+def build_data_profile(df, data_types, stats, total_rows=None, token_budget=PROMPT_TOKEN_BUDGET,
+                       sample_size=SAMPLE_ROWS, exact=True, seed=0):
+    """Описание таблицы для промпта в пределах token_budget
+
+    df - таблица или её первые строки (exact=False), stats - профиль calculate_basic_stats.
+    Возвращает словарь: text, tokens, columns, sample_rows, anomalies
+    """
+    total_rows = len(df) if total_rows is None else total_rows
+    columns = list(df.columns)
+
+    overview = f"Dataset: {total_rows:,} rows, {len(columns)} columns."
+    # Заголовки разделов, пустые строки между ними и строка о пропущенных столбцах тоже входят в бюджет
+    titles = (
+        f'\n\nColumns:\n- ... and {len(columns)} more columns\n\nDetected anomalies:\n- none found\n\n'
+        f'Sample (00 rows sampled evenly across values of ):\n'
+    )
+    used = estimate_tokens(overview) + estimate_tokens(titles) + max(estimate_tokens(str(column)) for column in columns)
+
+    # Столбцы в порядке таблицы, пока укладываются в свою долю бюджета
+    column_lines = []
+    for column in columns:
+        line = describe_column(column, data_types.get(column, 'text'), stats.get(column))
+        if used + estimate_tokens(line + '\n') > token_budget * COLUMNS_SHARE:
+            break
+        column_lines.append(line)
+        used += estimate_tokens(line + '\n')
+    described = len(column_lines)
+    if described < len(columns):
+        column_lines.append(f"- ... and {len(columns) - described} more columns")
+
+    anomaly_lines = []
+    for line in find_anomalies(df, data_types, stats, exact):
+        if used + estimate_tokens(line + '\n') > token_budget * (COLUMNS_SHARE + ANOMALIES_SHARE):
+            break
+        anomaly_lines.append(line)
+        used += estimate_tokens(line + '\n')
+
+    # Выборка строк заполняет оставшийся бюджет
+    shown = columns[:max(described, 1)]
+    header = ' | '.join(str(column) for column in shown)
+    used += estimate_tokens(header + '\n')
+    sample, stratum = sample_rows(df, data_types, stats, sample_size, seed)
+    row_lines = []
+    for _, row in sample.iterrows():
+        line = ' | '.join(format_value(row[column]) for column in shown)
+        if used + estimate_tokens(line + '\n') > token_budget:
+            break
+        row_lines.append(line)
+        used += estimate_tokens(line + '\n')
+
+    sections = [overview, '', 'Columns:'] + column_lines
+    sections += ['', 'Detected anomalies:'] + (anomaly_lines or ['- none found'])
+    if stratum is not None:
+        sample_title = f'rows sampled evenly across values of {stratum}'
+    elif len(sample) < len(df):
+        sample_title = 'randomly sampled rows'
+    else:
+        sample_title = 'rows'
+    sections += ['', f'Sample ({len(row_lines)} {sample_title}):', header] + row_lines
+
+    text = '\n'.join(sections)
+    return {
+        'text': text,
+        'tokens': estimate_tokens(text),
+        'columns': described,
+        'sample_rows': len(row_lines),
+        'anomalies': len(anomaly_lines)
+    }
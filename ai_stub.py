@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка клиента OpenAI для проверки без сети
+Повторяет интерфейс client.chat.completions.create и возвращает
+детерминированный ответ, построенный по промпту
+"""
+
+import hashlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+class StubCompletions:
+    """Заглушка client.chat.completions"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, model, messages, max_tokens=None, temperature=None, stream=False, **kwargs):
+        """Возвращает ответ в формате chat completion без обращения к API
+
+        stream=True возвращает итератор фрагментов, как при потоковом ответе API
+        """
+        with self.client.lock:
+            self.client.calls += 1
+
+        prompt = messages[-1]['content'] if messages else ''
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        content = (
+            "### 1. Brief Description of Data Structure\n"
+            f"Stub analysis for prompt {digest} ({len(prompt)} characters), model {model}.\n\n"
+            "### 2. Main Trends or Patterns\n- Stub response, no request was sent\n\n"
+            "### 3. Possible Anomalies or Unusual Values\n- None\n\n"
+            "### 4. Practical Conclusions and Recommendations\n- Configure AI_2_API_KEY for real analysis"
+        )
+        if max_tokens:
+            content = content[:max_tokens * 4]
+        if stream:
+            return self.stream_chunks(model, content)
+
+        if self.client.delay:
+            time.sleep(self.client.delay)
+        message = SimpleNamespace(role='assistant', content=content)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')])
+
+    def stream_chunks(self, model, content):
+        """Отдает ответ по словам, распределяя задержку между фрагментами"""
+        words = re.findall(r'\S+\s*|\s+', content)
+        for word in words:
+            if self.client.delay:
+                time.sleep(self.client.delay / len(words))
+            delta = SimpleNamespace(role='assistant', content=word)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+
+class StubClient:
+    """Заглушка клиента OpenAI; delay - задержка ответа в секундах, calls - число вызовов"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=StubCompletions(self))
+        self.models = SimpleNamespace(list=self.list_models)
+
+    def list_models(self):
+        """Заглушка client.models.list"""
+        return SimpleNamespace(data=[SimpleNamespace(id='stub-model', object='model')])
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Консольный анализатор файлов без веб-приложения
+Запускает тот же конвейер, что и app.py (чтение, типы данных, статистика,
+диаграммы), для файлов, папок и zip архивов в пуле процессов (batch.py) и
+выводит результат в JSON или NDJSON. Flask и AI модуль не импортируются -
+подходит для cron и конвейеров
+
+Запуск:
+    python analyze.py отчет.xlsx                        # JSON в stdout
+    python analyze.py exports/ отчеты.zip --workers 4 -o result.json
+    python analyze.py exports/ --format ndjson -o out.ndjson --workers 4
+    python analyze.py big.csv --format ndjson | jq .total_rows
+
+В формате ndjson каждая строка - результат одного файла, выводится сразу по
+готовности; последняя строка - {"summary": {...}}. Ход работы пишется в stderr.
+Код завершения: 0 - все файлы разобраны, 1 - нечего анализировать, 2 - есть ошибки
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Анализ Excel, CSV и PDF файлов с выводом в JSON или NDJSON')
+    parser.add_argument('paths', nargs='+', help='Файлы, папки или zip архивы')
+    parser.add_argument('-f', '--format', choices=['json', 'ndjson'], default='json', help='Формат вывода')
+    parser.add_argument('-o', '--output', help='Файл для результата (по умолчанию stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Число процессов (по умолчанию по числу ядер, 1 - без пула)')
+    parser.add_argument('--preview-rows', type=int, default=0, help='Сколько первых строк включить в результат')
+    parser.add_argument('--sheet', default='', help='Лист книги Excel (по умолчанию первый)')
+    parser.add_argument('--pdf-first-page', default='', help='Первая страница PDF')
+    parser.add_argument('--pdf-last-page', default='', help='Последняя страница PDF')
+    parser.add_argument('--exact', action='store_true', help='Точные квантили и число уникальных значений')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Не выводить ход работы в stderr')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Основная функция"""
+    args = parse_args(argv)
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    # pandas и парсеры загружаются только после разбора аргументов (--help отвечает сразу)
+    from batch import collect_files, run_batch
+    from pipeline import json_safe, parse_read_options
+
+    try:
+        options = parse_read_options({
+            'sheet': args.sheet,
+            'pdf_first_page': args.pdf_first_page,
+            'pdf_last_page': args.pdf_last_page
+        })
+    except ValueError as e:
+        log(f"❌ {e}")
+        return 1
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    def write_line(record):
+        output.write(json.dumps(json_safe(record), ensure_ascii=False, default=str) + '\n')
+        output.flush()
+
+    def on_result(result):
+        if result['success']:
+            log(f"✅ {result['name']}: {result['total_rows']} строк, {len(result['columns'])} столбцов, "
+                f"{result['seconds']:.2f} с")
+        else:
+            log(f"❌ {result['name']}: {result['error']}")
+        if args.format == 'ndjson':
+            write_line(result)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='analyze-') as workdir:
+            try:
+                items, skipped = collect_files(args.paths, workdir)
+            except ValueError as e:
+                log(f"❌ {e}")
+                return 1
+            for item in skipped:
+                log(f"⚠️ {item['name']}: {item['error']}")
+                if args.format == 'ndjson':
+                    write_line(dict(item, success=False, skipped=True))
+            if not items:
+                log("❌ Нет файлов для анализа")
+                return 1
+
+            log(f"🚀 Анализ {len(items)} файлов...")
+            batch = run_batch(
+                items,
+                workers=args.workers,
+                settings={'PROFILE_EXACT': args.exact},
+                preview_rows=max(args.preview_rows, 0),
+                skipped=skipped,
+                on_result=on_result,
+                options=options
+            )
+
+        summary = batch['summary']
+        if args.format == 'ndjson':
+            write_line({'summary': summary})
+        else:
+            json.dump(json_safe(batch), output, ensure_ascii=False, default=str)
+            output.write('\n')
+        log(f"📊 {summary['succeeded']} из {summary['files']} файлов, {summary['total_rows']} строк, "
+            f"{summary['files_per_second']} файлов/с, {summary['rows_per_second']} строк/с "
+            f"({summary['workers']} процессов, {summary['seconds']} с)")
+        if summary['common_columns']:
+            log(f"🔗 Общие столбцы: {', '.join(summary['common_columns'])}")
+        return 0 if summary['failed'] == 0 else 2
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,346 +4,335 @@
 """
 
 import os
-import pandas as pd
 import json
-import csv
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from werkzeug.utils import secure_filename
-import numpy as np
-import pdfplumber
-
-# Импортируем AI модуль
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from importlib.util import find_spec
+from flask import (
+    Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context, g,
+    has_request_context
+)
+from flask.json.provider import DefaultJSONProvider
+from data_cache import DataFrameCache
+from streaming import build_streaming_charts, read_csv_window, iter_csv_chunks
+from type_inference import infer_column_types, normalize_dtypes
+from charts import ChartAggregator
+from excel_reader import list_sheets
+from jobs import JobQueue, JobQueueFull
+from table_query import TableIndex, parse_filters, query_chunks
+from ai_cache import AIResponseCache
+from ai_prompt import build_data_profile, estimate_tokens
+import pipeline
+import batch
+from pipeline import (
+    allowed_file, generate_charts_data, frame_to_records, write_snapshot,
+    load_read_options, save_read_options, parse_read_options
+)
+from upload_store import (
+    store_upload, read_artifacts, write_artifacts, remove_saved_data, get_view_name, split_view_name,
+    options_key, settings_fingerprint, UploadMetrics, UploadRejected
+)
+from metrics import REGISTRY
+
+# Импортируем AI модуль (сам клиент OpenAI загружается при первом обращении к AI)
 try:
     from ai_analyzer import AIAnalyzer
+    if find_spec('openai') is None:
+        raise ImportError('openai')
     AI_AVAILABLE = True
 except ImportError:
     AI_AVAILABLE = False
     print("⚠️ AI модуль недоступен. Анализ через нейросеть отключен.")
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024 * 1024  # 2GB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.config['DATA_CACHE_MAX_BYTES'] = 512 * 1024 * 1024  # 512MB под разобранные файлы
+app.config['STREAMING_THRESHOLD_BYTES'] = 50 * 1024 * 1024  # CSV больше 50MB читаем по частям
+app.config['TYPE_INFERENCE_SAMPLE_SIZE'] = 1000  # Строк в выборке для определения типов
+app.config['PDF_WORKERS'] = None  # Процессов для разбора PDF (None - по числу ядер)
+app.config['UPLOAD_WORKERS'] = 2  # Файлов, обрабатываемых одновременно в фоне
+app.config['MAX_PENDING_JOBS'] = 20  # Максимум задач в очереди и в работе
+app.config['JOB_TTL_SECONDS'] = 3600  # Сколько хранить результат завершенной задачи
+app.config['TABLE_QUERY_MAX_LIMIT'] = 1000  # Максимум строк в одном окне таблицы
+app.config['PROFILE_EXACT'] = False  # Точные квантили и число уникальных значений для любых таблиц
+app.config['PROFILE_APPROX_MIN_ROWS'] = pipeline.APPROX_MIN_ROWS  # С какого числа строк статистика приближенная
+app.config['BATCH_WORKERS'] = None  # Процессов для пакетного анализа (None - по числу ядер)
+app.config['BATCH_MAX_FILES'] = batch.BATCH_MAX_FILES  # Максимум файлов в одном пакете (с учетом содержимого архивов)
+app.config['AI_CACHE_PATH'] = os.path.join('uploads', 'ai_cache.sqlite')  # Кэш ответов нейросети
+app.config['AI_CACHE_TTL_SECONDS'] = 7 * 24 * 3600  # Сколько хранить ответ нейросети
+app.config['AI_CACHE_MAX_ENTRIES'] = 1000  # Максимум сохраненных ответов
+app.config['AI_PROMPT_MODE'] = 'profile'  # Что отправлять нейросети: profile - профиль таблицы, rows - первые 15 строк
+app.config['AI_PROMPT_TOKEN_BUDGET'] = 3000  # Бюджет токенов на описание данных в промпте
+app.config['AI_PROMPT_SAMPLE_ROWS'] = 20  # Максимум строк выборки в промпте
+app.config['AI_HEALTH_TTL_SECONDS'] = 60  # Сколько считать актуальной проверку подключения к AI
+app.config['AI_HEALTH_REFRESH_SECONDS'] = 300  # Период фоновой проверки подключения (None - только по запросу)
+app.config['AI_HEALTH_LOCK_PATH'] = os.path.join('uploads', 'ai_health.lock')  # Фоновую проверку ведет один процесс сервера
+app.config['SERVER_TIMING'] = False  # Заголовок Server-Timing с длительностью этапов каждого запроса (видно в DevTools)
 
 # Создаем папку для загрузок если её нет
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Разрешенные расширения файлов
-ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'pdf'}
+# Кэш разобранных файлов, чтобы не перечитывать их при каждом запросе
+data_cache = DataFrameCache(max_bytes=app.config['DATA_CACHE_MAX_BYTES'])
 
-# Инициализируем AI анализатор
-ai_analyzer = None
-if AI_AVAILABLE:
-    try:
-        ai_analyzer = AIAnalyzer()
-        print("✅ AI анализатор инициализирован")
-    except Exception as e:
-        print(f"❌ Ошибка инициализации AI анализатора: {e}")
-        ai_analyzer = None
+# Объем и скорость записи загрузок, отклоненные файлы
+upload_metrics = UploadMetrics()
 
-def allowed_file(filename):
-    """Проверяет, является ли файл разрешенным"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Метрики производительности для /metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    'analyzer_stage_seconds', 'Длительность этапов обработки: upload, parse, infer, stats, charts, serialize', ['stage']
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'analyzer_request_seconds', 'Длительность обработки запросов', ['endpoint', 'method', 'status']
+)
+ROWS_PROCESSED = REGISTRY.counter('analyzer_rows_processed_total', 'Строк в разобранных файлах', ['format'])
+BYTES_PROCESSED = REGISTRY.counter('analyzer_bytes_processed_total', 'Байт в разобранных файлах', ['format'])
+CACHE_HIT_RATIO = REGISTRY.gauge('analyzer_cache_hit_ratio', 'Доля попаданий в кэш', ['cache'])
+CACHE_LOOKUPS = REGISTRY.counter('analyzer_cache_lookups_total', 'Обращений к кэшу', ['cache', 'result'])
+CACHE_ENTRIES = REGISTRY.gauge('analyzer_cache_entries', 'Записей в кэше', ['cache'])
+DATA_CACHE_BYTES = REGISTRY.gauge('analyzer_data_cache_bytes', 'Объем разобранных файлов в кэше')
+UPLOADS = REGISTRY.counter('analyzer_uploads_total', 'Загрузок по результату', ['result'])
 
-def detect_csv_delimiter(filepath):
-    """Автоматически определяет разделитель в CSV файле"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            sample = file.read(1024)
-            if not sample.strip():
-                return ','
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-            return delimiter
-    except:
-        # Если не удалось определить, пробуем стандартные разделители
-        delimiters = [',', ';', '\t', '|']
-        for delimiter in delimiters:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as file:
-                    sample = file.read(1024)
-                    if delimiter in sample:
-                        return delimiter
-            except:
-                continue
-        return ','  # По умолчанию запятая
-
-def extract_pdf_table(filepath):
-    """Извлекает первую таблицу из PDF файла"""
-    try:
-        with pdfplumber.open(filepath) as pdf:
-            if not pdf.pages:
-                raise Exception("PDF файл не содержит страниц")
-            
-            # Ищем таблицу на первой странице
-            first_page = pdf.pages[0]
-            tables = first_page.extract_tables()
-            
-            if not tables:
-                raise Exception("На первой странице PDF не найдено таблиц")
-            
-            # Берем первую таблицу
-            table = tables[0]
-            
-            if not table or len(table) == 0:
-                raise Exception("Первая таблица пуста")
-            
-            # Убираем пустые строки
-            table = [row for row in table if any(cell is not None and str(cell).strip() for cell in row)]
-            
-            if len(table) < 2:  # Нужна хотя бы заголовок и одна строка данных
-                raise Exception("Таблица содержит недостаточно данных (нужны заголовок и хотя бы одна строка)")
-            
-            # Первая строка - заголовки
-            headers = [str(cell).strip() if cell is not None else f'Column_{i}' for i, cell in enumerate(table[0])]
-            
-            # Остальные строки - данные
-            data_rows = []
-            for row in table[1:]:
-                # Дополняем строку до длины заголовков
-                while len(row) < len(headers):
-                    row.append(None)
-                # Обрезаем если длиннее
-                row = row[:len(headers)]
-                # Преобразуем в строки и очищаем
-                cleaned_row = [str(cell).strip() if cell is not None else '' for cell in row]
-                data_rows.append(cleaned_row)
-            
-            # Создаем DataFrame
-            df = pd.DataFrame(data_rows, columns=pd.Index(headers))
-            
-            # Удаляем столбцы с пустыми заголовками
-            df = df.loc[:, df.columns.map(lambda x: str(x).strip() != '')]
-            
-            # Удаляем полностью пустые строки и столбцы
-            df = df.dropna(how='all')
-            df = df.dropna(axis=1, how='all')
-            
-            if df.empty:
-                raise Exception("После очистки таблица стала пустой")
-            
-            return df
-            
-    except Exception as e:
-        raise Exception(f"Ошибка при извлечении таблицы из PDF: {str(e)}")
+# Очередь фоновой обработки загруженных файлов
+job_queue = JobQueue(
+    workers=app.config['UPLOAD_WORKERS'],
+    max_pending=app.config['MAX_PENDING_JOBS'],
+    ttl_seconds=app.config['JOB_TTL_SECONDS']
+)
 
-def read_file(filepath):
-    """Читает файл в зависимости от его типа"""
-    file_extension = filepath.rsplit('.', 1)[1].lower()
-    
+@contextmanager
+def timed_stage(name):
+    """Замеряет этап обработки: гистограмма для /metrics и Server-Timing текущего запроса"""
+    started = time.perf_counter()
     try:
-        if file_extension in ['xlsx', 'xls']:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        # Фоновые задачи выполняются вне запроса - для них только гистограмма
+        if has_request_context():
+            g.setdefault('timings', []).append((name, elapsed))
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON провайдер Flask, замеряющий сериализацию ответов (этап serialize)"""
+
+    def dumps(self, obj, **kwargs):
+        with timed_stage('serialize'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+def collect_cache_metrics():
+    """Переносит счетчики кэшей и загрузок в метрики перед выводом /metrics"""
+    caches = {'data': data_cache.get_stats()}
+    # Анализатор не создается ради метрик - только если к AI уже обращались
+    if ai_analyzer is not None and ai_analyzer.cache is not None:
+        caches['ai'] = ai_analyzer.cache.get_stats()
+    for cache, stats in caches.items():
+        CACHE_HIT_RATIO.set(stats['hit_ratio'], cache=cache)
+        CACHE_LOOKUPS.set_total(stats['hits'], cache=cache, result='hit')
+        CACHE_LOOKUPS.set_total(stats['misses'], cache=cache, result='miss')
+        CACHE_ENTRIES.set(stats['entries'], cache=cache)
+    DATA_CACHE_BYTES.set(caches['data']['current_bytes'])
+
+    uploads = upload_metrics.get_stats()
+    UPLOADS.set_total(uploads['uploads'], result='stored')
+    UPLOADS.set_total(uploads['duplicates'], result='duplicate')
+    UPLOADS.set_total(uploads['rejected'], result='rejected')
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+# AI анализатор создается при первом запросе к AI: запуск приложения не ждет загрузки openai и config.env
+ai_analyzer = None
+ai_analyzer_ready = False
+ai_analyzer_lock = threading.Lock()
+
+def get_ai_analyzer():
+    """Возвращает AI анализатор, создавая его при первом вызове (None - анализатор недоступен)"""
+    global ai_analyzer, ai_analyzer_ready
+    if ai_analyzer_ready or not AI_AVAILABLE:
+        return ai_analyzer
+    with ai_analyzer_lock:
+        if not ai_analyzer_ready:
             try:
-                # Пробуем прочитать Excel файл с openpyxl
-                if file_extension == 'xlsx':
-                    df = pd.read_excel(filepath, engine='openpyxl')
-                    return df
-                else:
-                    # Для .xls файлов используем xlrd
-                    df = pd.read_excel(filepath, engine='xlrd')
-                    return df
+                ai_analyzer = AIAnalyzer(cache=AIResponseCache(
+                    app.config['AI_CACHE_PATH'],
+                    ttl_seconds=app.config['AI_CACHE_TTL_SECONDS'],
+                    max_entries=app.config['AI_CACHE_MAX_ENTRIES']
+                ), health_ttl=app.config['AI_HEALTH_TTL_SECONDS'])
+                if app.config['AI_HEALTH_REFRESH_SECONDS']:
+                    ai_analyzer.health.start(app.config['AI_HEALTH_REFRESH_SECONDS'], app.config['AI_HEALTH_LOCK_PATH'])
+                print("✅ AI анализатор инициализирован")
             except Exception as e:
-                try:
-                    # Пробуем альтернативный движок
-                    if file_extension == 'xlsx':
-                        df = pd.read_excel(filepath, engine='xlrd')
-                    else:
-                        df = pd.read_excel(filepath, engine='openpyxl')
-                    return df
-                except Exception as e2:
-                    raise Exception(f"Не удалось прочитать Excel файл. Убедитесь, что файл не поврежден и имеет правильный формат.")
-                    
-        elif file_extension == 'csv':
-            delimiter = detect_csv_delimiter(filepath)
-            
-            # Пробуем разные кодировки с современными параметрами
-            encodings = ['utf-8', 'cp1251', 'latin-1', 'iso-8859-1']
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(
-                        filepath, 
-                        delimiter=delimiter, 
-                        encoding=encoding,
-                        on_bad_lines='skip',  # Пропускаем проблемные строки
-                        low_memory=False
-                    )
-                    if not df.empty:
-                        return df
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    continue
-            
-            # Если ничего не работает, используем utf-8 с обработкой ошибок
-            return pd.read_csv(
-                filepath, 
-                delimiter=delimiter, 
-                encoding='utf-8', 
-                on_bad_lines='skip',
-                low_memory=False
-            )
-        
-        elif file_extension == 'pdf':
-            return extract_pdf_table(filepath)
-        
-        raise ValueError(f"Неподдерживаемый тип файла: {file_extension}")
-        
-    except Exception as e:
-        raise Exception(f"Ошибка при чтении файла {filepath}: {str(e)}")
+                print(f"❌ Ошибка инициализации AI анализатора: {e}")
+                ai_analyzer = None
+            ai_analyzer_ready = True
+    return ai_analyzer
+
+def pipeline_settings():
+    """Параметры конвейера анализа из конфигурации приложения"""
+    return {key: app.config[key] for key in pipeline.DEFAULT_SETTINGS}
 
-def detect_data_types(df):
+def artifacts_fingerprint():
+    """Отпечаток параметров анализа для сохраненных результатов: после их изменения файлы разбираются заново"""
+    return settings_fingerprint(pipeline_settings())
+
+def read_file(filepath, options, progress=None):
+    """Читает файл в зависимости от его типа с параметрами чтения (лист, страницы PDF)"""
+    return pipeline.read_file(filepath, progress, options, pdf_workers=app.config['PDF_WORKERS'])
+
+def detect_data_types(df, type_info=None):
     """Автоматически определяет типы данных в столбцах"""
-    data_types = {}
-    
-    for column in df.columns:
-        # Пропускаем столбцы с пустыми заголовками или полностью пустые
-        if str(column).strip() == '' or df[column].isna().all():
-            data_types[column] = 'empty'
-            continue
-            
-        # Пробуем определить тип
-        sample_data = df[column].dropna().head(100)
-        
-        if len(sample_data) == 0:
-            data_types[column] = 'empty'
-            continue
-            
-        # Проверяем на числовой тип
-        try:
-            pd.to_numeric(sample_data, errors='raise')
-            data_types[column] = 'numeric'
-        except:
-            # Проверяем на дату с более строгими параметрами
-            try:
-                # Пробуем только стандартные форматы дат
-                pd.to_datetime(sample_data, format='%Y-%m-%d', errors='raise')
-                data_types[column] = 'datetime'
-            except:
-                try:
-                    pd.to_datetime(sample_data, format='%d.%m.%Y', errors='raise')
-                    data_types[column] = 'datetime'
-                except:
-                    try:
-                        pd.to_datetime(sample_data, format='%m/%d/%Y', errors='raise')
-                        data_types[column] = 'datetime'
-                    except:
-                        # Проверяем на категориальный (если уникальных значений мало)
-                        unique_count = sample_data.nunique()
-                        total_count = len(sample_data)
-                        if total_count > 0:
-                            unique_ratio = unique_count / total_count
-                            if unique_ratio < 0.5 and unique_count < 50:
-                                data_types[column] = 'categorical'
-                            else:
-                                data_types[column] = 'text'
-                        else:
-                            data_types[column] = 'text'
-    
-    return data_types
-
-def generate_charts_data(df, data_types, selected_category=None):
-    """Генерирует данные для диаграмм на основе типов данных"""
-    charts = []
-    
-    # Ищем числовые столбцы для bar chart
-    numeric_columns = [col for col, dtype in data_types.items() if dtype == 'numeric']
-    categorical_columns = [col for col, dtype in data_types.items() if dtype == 'categorical']
-    
-    # Если выбрана категория, используем её
-    if selected_category and selected_category in categorical_columns:
-        categorical_columns = [selected_category]
-    
-    # Bar chart: категория + числовое значение
-    if categorical_columns and numeric_columns:
-        for cat_col in categorical_columns[:2]:  # Берем максимум 2 категориальных столбца
-            for num_col in numeric_columns[:2]:   # Берем максимум 2 числовых столбца
-                if cat_col != num_col:
-                    # Группируем данные
-                    grouped = df.groupby(cat_col)[num_col].sum().sort_values(ascending=False).head(10)
-                    
-                    charts.append({
-                        'type': 'bar',
-                        'title': f'{num_col} по {cat_col}',
-                        'category': cat_col,
-                        'value': num_col,
-                        'data': {
-                            'labels': grouped.index.tolist(),
-                            'values': grouped.values.tolist()
-                        }
-                    })
-                    break
-            break
-    
-    # Line chart: дата + числовое значение
-    datetime_columns = [col for col, dtype in data_types.items() if dtype == 'datetime']
-    if datetime_columns and numeric_columns:
-        for date_col in datetime_columns[:1]:  # Берем первый столбец с датами
-            for num_col in numeric_columns[:1]:  # Берем первый числовой столбец
-                if date_col != num_col:
-                    # Группируем по дате
-                    df_copy = df.copy()
-                    df_copy[date_col] = pd.to_datetime(df_copy[date_col])
-                    df_copy = df_copy.sort_values(date_col)
-                    
-                    # Берем последние 20 точек для читаемости
-                    recent_data = df_copy.tail(20)
-                    
-                    charts.append({
-                        'type': 'line',
-                        'title': f'{num_col} по времени ({date_col})',
-                        'category': date_col,
-                        'value': num_col,
-                        'data': {
-                            'labels': recent_data[date_col].dt.strftime('%Y-%m-%d').tolist(),
-                            'values': recent_data[num_col].tolist()
-                        }
-                    })
-                    break
-    
-    return charts
-
-def calculate_basic_stats(df, data_types):
-    """Вычисляет базовую статистику по данным"""
-    stats = {}
-    
-    for column in df.columns:
-        dtype = data_types.get(column, 'text')
-        
-        try:
-            if dtype == 'numeric':
-                stats[column] = {
-                    'type': 'numeric',
-                    'sum': float(df[column].sum()),
-                    'mean': float(df[column].mean()),
-                    'min': float(df[column].min()),
-                    'max': float(df[column].max()),
-                    'count': int(df[column].count())
-                }
-            elif dtype == 'datetime':
-                stats[column] = {
-                    'type': 'datetime',
-                    'min_date': str(df[column].min()),
-                    'max_date': str(df[column].max()),
-                    'count': int(df[column].count())
-                }
-            else:
-                stats[column] = {
-                    'type': dtype,
-                    'unique_count': int(df[column].nunique()),
-                    'total_count': int(df[column].count()),
-                    'most_common': df[column].mode().iloc[0] if not df[column].mode().empty else None
-                }
-        except Exception as e:
-            # Устанавливаем базовую статистику в случае ошибки
-            stats[column] = {
-                'type': 'error',
-                'error': str(e),
-                'count': int(df[column].count()) if len(df) > 0 else 0
-            }
+    return pipeline.detect_data_types(df, type_info, sample_size=app.config['TYPE_INFERENCE_SAMPLE_SIZE'])
+
+def calculate_basic_stats(df, data_types, exact=None):
+    """Вычисляет базовую статистику по данным: квантили, гистограммы, частые значения"""
+    if exact is None:
+        exact = app.config['PROFILE_EXACT']
+    with timed_stage('stats'):
+        return pipeline.calculate_basic_stats(df, data_types, exact, app.config['PROFILE_APPROX_MIN_ROWS'])
+
+def is_streaming_file(filepath):
+    """Проверяет, нужно ли читать файл по частям"""
+    return pipeline.is_streaming_file(filepath, app.config['STREAMING_THRESHOLD_BYTES'])
+
+def stream_file(filepath, progress=None):
+    """Читает большой CSV файл по частям, не загружая его в память целиком"""
+    return pipeline.stream_file(filepath, progress, sample_size=app.config['TYPE_INFERENCE_SAMPLE_SIZE'])
+
+def ignore_progress(stage, done=None, total=None):
+    """Обработчик прогресса по умолчанию (для синхронных запросов)"""
+
+def count_processed(filepath, rows):
+    """Учитывает разобранный файл в метриках строк и байт"""
+    file_format = filepath.rsplit('.', 1)[1].lower()
+    ROWS_PROCESSED.inc(rows, format=file_format)
+    BYTES_PROCESSED.inc(os.path.getsize(filepath), format=file_format)
+
+def resolve_upload(filename):
+    """Путь к загруженному файлу и параметры чтения по имени представления из запроса
+
+    Возвращает (filepath, options) или (None, None), если файл или параметры не найдены
+    """
+    try:
+        stored_name, key = split_view_name(filename)
+    except ValueError:
+        return None, None
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+    if not allowed_file(stored_name) or not os.path.exists(filepath):
+        return None, None
+    options = load_read_options(filepath, key)
+    if options is None:
+        return None, None
+    return filepath, options
+
+def load_data(filepath, options=None, report=ignore_progress):
+    """Возвращает разобранный файл и типы данных из кэша или читает файл заново
+
+    options - параметры чтения; у каждого набора параметров своя запись кэша.
+    report(stage, done, total) получает прогресс этапов чтения (parse) и определения типов (infer)
+    """
+    options = options or {}
+    view = options_key(options)
+    entry = data_cache.get(filepath, view)
+    if entry is None and is_streaming_file(filepath):
+        # В кэше хранятся только первые строки и накопленная статистика (этап parse включает stats)
+        with timed_stage('parse'):
+            summary = stream_file(filepath, progress=lambda done, total: report('parse', done, total))
+        count_processed(filepath, summary['total_rows'])
+        entry = data_cache.put(
+            filepath,
+            summary['preview'],
+            view=view,
+            data_types=summary['data_types'],
+            stats=summary['stats'],
+            csv_dialect=summary['dialect'],
+            streaming=summary
+        )
+    elif entry is None:
+        report('parse')
+        with timed_stage('parse'):
+            df = read_file(filepath, options, progress=lambda done, total: report('parse', done, total))
+        count_processed(filepath, len(df))
+        report('infer')
+        with timed_stage('infer'):
+            type_info = infer_column_types(df, sample_size=app.config['TYPE_INFERENCE_SAMPLE_SIZE'])
+            # Приводим столбцы к типам один раз - дальше все функции работают с типизированной таблицей
+            df = normalize_dtypes(df, type_info)
+            data_types = detect_data_types(df, type_info)
+        entry = data_cache.put(
+            filepath,
+            df,
+            view=view,
+            data_types=data_types,
+            type_info=type_info,
+            csv_dialect=df.attrs.get('csv_dialect'),
+            pdf_extraction=df.attrs.get('pdf_extraction')
+        )
+    return entry
+
+def get_total_rows(entry):
+    """Возвращает количество строк в файле"""
+    if 'streaming' in entry:
+        return entry['streaming']['total_rows']
+    return len(entry['df'])
+
+def get_charts(entry, selected_category=None, time_bucket=None, metric='sum'):
+    """Строит диаграммы по записи кэша"""
+    if 'streaming' in entry:
+        with timed_stage('charts'):
+            return build_streaming_charts(entry['streaming'], selected_category, time_bucket, metric)
     
-    return stats
+    with timed_stage('charts'):
+        # Группировки по категориям вычисляются один раз на файл
+        if 'chart_aggregator' not in entry:
+            entry['chart_aggregator'] = ChartAggregator(entry['df'], entry['data_types'])
+        charts = generate_charts_data(
+            entry['df'],
+            entry['data_types'],
+            selected_category,
+            time_bucket,
+            aggregator=entry['chart_aggregator'],
+            metric=metric
+        )
+        # Группировки хранятся в записи кэша и занимают память из его бюджета
+        data_cache.refresh_size(entry)
+        return charts
+
+def get_stats(entry):
+    """Возвращает статистику по файлу, вычисляя её один раз на запись кэша"""
+    if 'stats' not in entry:
+        data_cache.attach(entry, stats=calculate_basic_stats(entry['df'], entry['data_types']))
+    return entry['stats']
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_timing(response):
+    """Длительность запроса в метриках и, если включено, заголовок Server-Timing"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(
+        elapsed, endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code
+    )
+    if app.config['SERVER_TIMING']:
+        timings = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in g.get('timings', [])]
+        response.headers['Server-Timing'] = ', '.join(timings + [f'total;dur={elapsed * 1000:.1f}'])
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики производительности в текстовом формате Prometheus"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -355,69 +344,357 @@ def debug():
     """Отладочная страница"""
     return send_from_directory('.', 'debug.html')
 
+def get_sheets(filepath):
+    """Возвращает список листов Excel файла (для остальных форматов - None)"""
+    if filepath.rsplit('.', 1)[1].lower() not in ['xlsx', 'xls']:
+        return None
+    return list_sheets(filepath)
+
+def analyze_upload(filename, filepath, options=None, report=ignore_progress, original_filename=None):
+    """Читает файл и формирует ответ с первыми строками, диаграммами и статистикой
+
+    options - параметры чтения; в ответе filename - имя представления файла с
+    этими параметрами, по нему браузер делает следующие запросы.
+    Возвращает пару (данные ответа, HTTP статус)
+    """
+    options = options or {}
+    filename = get_view_name(filename, options)
+    
+    # Тот же файл с теми же параметрами чтения уже разбирался - отдаем сохраненный результат
+    payload = read_artifacts(filepath, options, artifacts_fingerprint())
+    if payload is not None:
+        return dict(payload, original_filename=original_filename or filename, reused=True), 200
+    
+    # Читаем файл и определяем типы данных (результат попадает в кэш)
+    entry = load_data(filepath, options, report)
+    df = entry['df']
+    data_types = entry['data_types']
+    
+    # Проверяем, что файл не пустой
+    if df.empty:
+        return {'error': 'Файл пустой или не содержит данных'}, 400
+    
+    # Сохраняем колоночный снимок для последующих запросов
+    if 'streaming' not in entry:
+        write_snapshot(filepath, df, options)
+    
+    # Вычисляем базовую статистику
+    report('stats')
+    stats = get_stats(entry)
+    
+    # Генерируем данные для диаграмм
+    report('charts')
+    charts = get_charts(entry)
+    
+    # Подготавливаем первые 100 строк
+    first_100 = frame_to_records(df.head(100))
+    
+    # Получаем названия столбцов
+    columns = df.columns.tolist()
+    
+    sheets = get_sheets(filepath)
+    
+    payload = {
+        'success': True,
+        'filename': filename,
+        'total_rows': get_total_rows(entry),
+        'streaming': 'streaming' in entry,
+        'columns': columns,
+        'data': first_100,
+        'data_types': data_types,
+        'type_confidence': {column: info['confidence'] for column, info in entry.get('type_info', {}).items()},
+        'charts': charts,
+        'stats': stats,
+        'csv_dialect': entry.get('csv_dialect'),
+        'pdf_extraction': entry.get('pdf_extraction'),
+        'sheets': sheets,
+        'sheet': options.get('sheet', sheets[0]) if sheets else None
+    }
+    write_artifacts(filepath, options, payload, serialize=app.json.dumps, fingerprint=artifacts_fingerprint())
+    return dict(payload, original_filename=original_filename or filename, reused=False), 200
+
+def discard_upload(filepath):
+    """Удаляет загруженный файл и всё, что было для него сохранено"""
+    data_cache.invalidate(filepath)
+    remove_saved_data(filepath)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+def save_upload(stream, original_filename, form):
+    """Проверяет и сохраняет поток файла вместе с параметрами чтения
+
+    Файл хранится под именем из хеша содержимого, начало файла проверяется до
+    записи остальной части. Возвращает словарь загрузки (filename, filepath,
+    options, original_filename, is_new, upload) или ответ с ошибкой
+    """
+    if stream is None or not original_filename:
+        return None, (jsonify({'error': 'Файл не выбран'}), 400)
+    
+    if not allowed_file(original_filename):
+        return None, (jsonify({'error': 'Неподдерживаемый формат файла. Поддерживаются: .xlsx, .xls, .csv, .pdf'}), 400)
+    
+    try:
+        read_options = parse_read_options(form)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    
+    # Сохраняем файл по частям, считая хеш содержимого
+    extension = original_filename.rsplit('.', 1)[1].lower()
+    try:
+        with timed_stage('upload'):
+            stored = store_upload(stream, app.config['UPLOAD_FOLDER'], extension)
+    except UploadRejected as e:
+        upload_metrics.record_rejected()
+        print(f"⛔ Загрузка {original_filename} отклонена: {str(e)}")
+        return None, (jsonify({'error': str(e)}), 400)
+    filename, filepath, is_new = stored['filename'], stored['filepath'], stored['is_new']
+    
+    # Другой лист или диапазон страниц того же файла - отдельное представление, прежние не меняются
+    save_read_options(filepath, read_options)
+    
+    return {
+        'filename': filename,
+        'filepath': filepath,
+        'options': read_options,
+        'original_filename': original_filename,
+        'is_new': is_new,
+        'upload': upload_metrics.record(stored)
+    }, None
+
+def queue_upload(upload):
+    """Ставит обработку сохраненного файла в очередь и возвращает ответ с id задачи"""
+    # Уже загружавшийся файл мог открыть кто-то еще - удаляем только новые файлы
+    on_error = (lambda: discard_upload(upload['filepath'])) if upload['is_new'] else None
+    try:
+        job_id = job_queue.submit(
+            analyze_upload, upload['filename'], upload['filepath'], upload['options'],
+            original_filename=upload['original_filename'],
+            on_error=on_error
+        )
+    except JobQueueFull as e:
+        if on_error:
+            on_error()
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'filename': get_view_name(upload['filename'], upload['options']),
+        'upload': upload['upload']
+    }), 202
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Обработка загрузки файла"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'Файл не выбран'}), 400
+        file = request.files.get('file')
+        upload, error = save_upload(file.stream if file else None, file.filename if file else None, request.form)
+        if error:
+            return error
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'Файл не выбран'}), 400
-        
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename) if file.filename else 'unknown_file'
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            # Сохраняем файл
-            file.save(filepath)
+        try:
+            payload, status = analyze_upload(
+                upload['filename'], upload['filepath'], upload['options'],
+                original_filename=upload['original_filename']
+            )
+            return jsonify(dict(payload, upload=upload['upload'])), status
             
-            try:
-                # Читаем файл
-                df = read_file(filepath)
-                
-                # Проверяем, что файл не пустой
-                if df.empty:
-                    return jsonify({'error': 'Файл пустой или не содержит данных'}), 400
-                
-                # Определяем типы данных
-                data_types = detect_data_types(df)
-                
-                # Генерируем данные для диаграмм
-                charts = generate_charts_data(df, data_types)
-                
-                # Вычисляем базовую статистику
-                stats = calculate_basic_stats(df, data_types)
-                
-                # Подготавливаем первые 100 строк
-                first_100 = df.head(100).fillna('').to_dict('records')
-                
-                # Получаем названия столбцов
-                columns = df.columns.tolist()
-                
-                return jsonify({
-                    'success': True,
-                    'filename': filename,
-                    'total_rows': len(df),
-                    'columns': columns,
-                    'data': first_100,
-                    'data_types': data_types,
-                    'charts': charts,
-                    'stats': stats
-                })
-                
-            except Exception as e:
-                # Удаляем файл в случае ошибки
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return jsonify({'error': f'Ошибка при обработке файла: {str(e)}'}), 500
+        except Exception as e:
+            # Удаляем файл в случае ошибки (если он не загружался раньше)
+            if upload['is_new']:
+                discard_upload(upload['filepath'])
+            return jsonify({'error': f'Ошибка при обработке файла: {str(e)}'}), 500
+        
+    except Exception as e:
+        return jsonify({'error': f'Неожиданная ошибка: {str(e)}'}), 500
+
+@app.route('/upload_async', methods=['POST'])
+def upload_file_async():
+    """Сохраняет файл и ставит его обработку в очередь, сразу возвращая id задачи"""
+    try:
+        file = request.files.get('file')
+        upload, error = save_upload(file.stream if file else None, file.filename if file else None, request.form)
+        if error:
+            return error
+        return queue_upload(upload)
         
-        return jsonify({'error': 'Неподдерживаемый формат файла. Поддерживаются: .xlsx, .xls, .csv, .pdf'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Неожиданная ошибка: {str(e)}'}), 500
+
+@app.route('/upload_stream', methods=['POST'])
+def upload_file_stream():
+    """Принимает файл телом запроса и ставит его обработку в очередь
+
+    Имя файла и параметры чтения передаются в строке запроса. Тело читается по
+    частям прямо из соединения, поэтому файл не того формата отклоняется по
+    первым килобайтам, не дожидаясь передачи остальной части
+    """
+    try:
+        upload, error = save_upload(request.stream, request.args.get('filename'), request.args)
+        if error:
+            response, status = error
+            # Остаток тела не читался - закрываем соединение, чтобы он не попал в следующий запрос
+            response.headers['Connection'] = 'close'
+            return response, status
+        return queue_upload(upload)
         
     except Exception as e:
         return jsonify({'error': f'Неожиданная ошибка: {str(e)}'}), 500
 
+@app.route('/upload_stats', methods=['GET'])
+def upload_stats():
+    """Метрики загрузок: объем, средняя и последняя скорость записи, отклоненные файлы"""
+    return jsonify(upload_metrics.get_stats())
+
+def run_batch_job(workdir, sources, skipped, preview_rows, report=ignore_progress):
+    """Фоновая задача пакетного анализа: распаковка архивов и анализ файлов в пуле процессов
+
+    Этап parse показывает, сколько файлов пакета уже разобрано. Папка пакета удаляется после анализа
+    """
+    try:
+        items = []
+        for source in sources:
+            if source['archive']:
+                try:
+                    items.extend(batch.extract_archive(source['path'], workdir, source['name']))
+                except ValueError as e:
+                    skipped.append({'name': source['name'], 'error': str(e)})
+            else:
+                items.append({'name': source['name'], 'path': source['path']})
+
+        finished = []
+        report('parse', 0, len(items))
+
+        def on_result(result):
+            finished.append(result)
+            report('parse', len(finished), len(items))
+
+        result = batch.run_batch(
+            items,
+            workers=app.config['BATCH_WORKERS'],
+            settings=pipeline_settings(),
+            preview_rows=preview_rows,
+            skipped=skipped,
+            on_result=on_result
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = result['summary']
+    print(f"📦 Пакет: {summary['succeeded']} из {summary['files']} файлов, {summary['total_rows']} строк, "
+          f"{summary['files_per_second']} файлов/с, {summary['rows_per_second']} строк/с")
+    return dict(result, success=True), 200
+
+@app.route('/batch_analyze', methods=['POST'])
+def batch_analyze():
+    """Пакетный анализ: несколько файлов или zip архивов в поле files
+
+    Файлы сохраняются, а анализ в пуле процессов выполняется фоновой задачей:
+    ответ сразу содержит id задачи, результаты по файлам и сводку с
+    пропускной способностью отдает /jobs/<id>/result. Число файлов в архивах
+    проверяется по их оглавлению до распаковки
+    """
+    files = [file for file in request.files.getlist('files') if file and file.filename]
+    if not files:
+        return jsonify({'error': 'Файлы не выбраны'}), 400
+
+    try:
+        preview_rows = min(max(int(request.form.get('preview_rows', 0)), 0), app.config['TABLE_QUERY_MAX_LIMIT'])
+    except ValueError:
+        return jsonify({'error': 'preview_rows должно быть целым числом'}), 400
+
+    # Файлы пакета не попадают в папку загрузок и удаляются задачей после анализа
+    workdir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'], prefix='batch-')
+    try:
+        sources = []
+        skipped = []
+        total_files = 0
+        for file in files:
+            if batch.is_archive(file.filename):
+                stored = store_upload(file.stream, workdir, 'zip', validate=False)
+                try:
+                    total_files += len(batch.list_archive_members(stored['filepath'], file.filename))
+                except ValueError as e:
+                    skipped.append({'name': file.filename, 'error': str(e)})
+                    continue
+                sources.append({'name': file.filename, 'path': stored['filepath'], 'archive': True})
+            elif allowed_file(file.filename):
+                extension = file.filename.rsplit('.', 1)[1].lower()
+                try:
+                    stored = store_upload(file.stream, workdir, extension)
+                except UploadRejected as e:
+                    skipped.append({'name': file.filename, 'error': str(e)})
+                    continue
+                total_files += 1
+                sources.append({'name': file.filename, 'path': stored['filepath'], 'archive': False})
+            else:
+                skipped.append({'name': file.filename, 'error': 'Неподдерживаемый формат файла'})
+
+        batch.check_batch_size(total_files, app.config['BATCH_MAX_FILES'])
+        job_id = job_queue.submit(run_batch_job, workdir, sources, skipped, preview_rows)
+
+    except batch.BatchTooLarge as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFull as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return jsonify({'error': f'Ошибка пакетного анализа: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'job_id': job_id, 'files': total_files, 'skipped': skipped}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Состояние задачи обработки: текущий этап и прогресс по этапам"""
+    status = job_queue.get_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Результат задачи в том же формате, что и ответ /upload"""
+    status = job_queue.get_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    
+    if status['status'] == 'error':
+        return jsonify({'error': f"Ошибка при обработке файла: {status['error']}"}), 500
+    if status['status'] != 'done':
+        return jsonify({'status': status['status'], 'stage': status['stage']}), 202
+    
+    payload, code = job_queue.get_result(job_id)
+    return jsonify(payload), code
+
+@app.route('/select_sheet', methods=['POST'])
+def select_sheet():
+    """Перечитывает уже загруженный Excel файл с другим листом"""
+    data = request.get_json()
+    filename = data.get('filename')
+    sheet = data.get('sheet')
+    
+    if not filename or not sheet:
+        return jsonify({'error': 'Не указано имя файла или лист'}), 400
+    
+    filepath, options = resolve_upload(filename)
+    if filepath is None:
+        return jsonify({'error': 'Файл не найден'}), 404
+    
+    try:
+        if sheet not in (get_sheets(filepath) or []):
+            return jsonify({'error': f'Лист "{sheet}" не найден'}), 400
+        
+        # Другой лист - другое представление файла; представления других пользователей не меняются
+        options = dict(options, sheet=sheet)
+        save_read_options(filepath, options)
+        
+        payload, status = analyze_upload(split_view_name(filename)[0], filepath, options)
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при чтении листа: {str(e)}'}), 500
+
 @app.route('/load_more', methods=['POST'])
 def load_more():
     """Загрузка дополнительных строк"""
@@ -429,20 +706,28 @@ def load_more():
     if not filename:
         return jsonify({'error': 'Имя файла не указано'}), 400
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    filepath, options = resolve_upload(filename)
     
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({'error': 'Файл не найден'}), 404
     
     try:
-        df = read_file(filepath)
-        end_offset = min(offset + limit, len(df))
+        entry = load_data(filepath, options)
+        total_rows = get_total_rows(entry)
+        end_offset = min(offset + limit, total_rows)
         
-        if offset >= len(df):
+        if offset >= total_rows:
             return jsonify({'data': [], 'has_more': False})
         
-        more_data = df.iloc[offset:end_offset].fillna('').to_dict('records')
-        has_more = end_offset < len(df)
+        if 'streaming' in entry:
+            # Большой файл целиком в памяти не хранится - читаем только нужное окно
+            summary = entry['streaming']
+            window = read_csv_window(filepath, summary['dialect'], offset, end_offset - offset)
+        else:
+            window = entry['df'].iloc[offset:end_offset]
+        
+        more_data = frame_to_records(window)
+        has_more = end_offset < total_rows
         
         return jsonify({
             'data': more_data,
@@ -453,25 +738,117 @@ def load_more():
     except Exception as e:
         return jsonify({'error': f'Ошибка при загрузке данных: {str(e)}'}), 500
 
+@app.route('/table_query', methods=['POST'])
+def table_query():
+    """Окно строк таблицы с фильтрами, сортировкой и поиском на сервере"""
+    data = request.get_json()
+    filename = data.get('filename')
+    
+    if not filename:
+        return jsonify({'error': 'Имя файла не указано'}), 400
+    
+    filepath, options = resolve_upload(filename)
+    
+    if filepath is None:
+        return jsonify({'error': 'Файл не найден'}), 404
+    
+    try:
+        offset = max(int(data.get('offset', 0)), 0)
+        limit = min(max(int(data.get('limit', 100)), 1), app.config['TABLE_QUERY_MAX_LIMIT'])
+        filters = parse_filters(data.get('filters'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Некорректный запрос: {str(e)}'}), 400
+    
+    search = str(data.get('search') or '').strip()
+    sort_by = data.get('sort_by') or None
+    descending = bool(data.get('descending', False))
+    
+    try:
+        entry = load_data(filepath, options)
+        
+        if 'streaming' in entry:
+            # Файл не хранится в памяти - выполняем запрос за один проход по частям
+            summary = entry['streaming']
+            window, row_numbers, total_matches = query_chunks(
+                iter_csv_chunks(filepath, summary['dialect']), entry['data_types'],
+                filters, search, sort_by, descending, offset, limit
+            )
+        else:
+            # Индексы для поиска и сортировки строятся один раз на файл
+            if 'table_index' not in entry:
+                entry['table_index'] = TableIndex(entry['df'])
+            window, row_numbers, total_matches = entry['table_index'].query(
+                filters, search, sort_by, descending, offset, limit
+            )
+            # Индексы растут с каждым новым столбцом поиска и сортировки - учитываем их в бюджете кэша
+            data_cache.refresh_size(entry)
+        
+        return jsonify({
+            'data': frame_to_records(window),
+            'row_numbers': [int(number) for number in row_numbers],
+            'total_rows': get_total_rows(entry),
+            'total_matches': total_matches,
+            'offset': offset + len(row_numbers),
+            'has_more': offset + len(row_numbers) < total_matches
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при выполнении запроса: {str(e)}'}), 500
+
+@app.route('/column_stats', methods=['POST'])
+def column_stats():
+    """Профиль столбцов; exact=true пересчитывает квантили и уникальные значения точно"""
+    data = request.get_json()
+    filename = data.get('filename')
+    exact = bool(data.get('exact', False))
+    
+    if not filename:
+        return jsonify({'error': 'Имя файла не указано'}), 400
+    
+    filepath, options = resolve_upload(filename)
+    
+    if filepath is None:
+        return jsonify({'error': 'Файл не найден'}), 404
+    
+    try:
+        entry = load_data(filepath, options)
+        if 'streaming' in entry or not exact or exact == app.config['PROFILE_EXACT']:
+            # Файлы, прочитанные по частям, профилируются только приближенно за один проход
+            stats = get_stats(entry)
+        else:
+            stats = calculate_basic_stats(entry['df'], entry['data_types'], exact=True)
+        
+        return jsonify({
+            'success': True,
+            'stats': stats,
+            'exact': exact and 'streaming' not in entry
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при расчете статистики: {str(e)}'}), 500
+
 @app.route('/update_charts', methods=['POST'])
 def update_charts():
     """Обновление диаграмм с выбранной категорией"""
     data = request.get_json()
     filename = data.get('filename')
     selected_category = data.get('selected_category')
+    time_bucket = data.get('time_bucket')
+    metric = data.get('metric') or 'sum'
     
     if not filename:
         return jsonify({'error': 'Имя файла не указано'}), 400
     
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    filepath, options = resolve_upload(filename)
     
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({'error': 'Файл не найден'}), 404
     
     try:
-        df = read_file(filepath)
-        data_types = detect_data_types(df)
-        charts = generate_charts_data(df, data_types, selected_category)
+        entry = load_data(filepath, options)
+        charts = get_charts(entry, selected_category, time_bucket, metric)
         
         return jsonify({
             'success': True,
@@ -481,45 +858,87 @@ def update_charts():
     except Exception as e:
         return jsonify({'error': f'Ошибка при обновлении диаграмм: {str(e)}'}), 500
 
+def get_ai_prompt(data):
+    """Промпт для запроса на анализ или ответ с ошибкой
+
+    В режиме profile нейросеть получает профиль всей таблицы в пределах бюджета
+    токенов, в режиме rows - первые 15 строк. Возвращает словарь: rows, columns,
+    prompt (None - построить по строкам), mode, prompt_tokens
+    """
+    filename = data.get('filename')
+    mode = data.get('mode', app.config['AI_PROMPT_MODE'])
+    if mode not in ('profile', 'rows'):
+        return None, (jsonify({'error': f'Неизвестный режим промпта: {mode}'}), 400)
+    
+    if not filename:
+        return None, (jsonify({'error': 'Имя файла не указано'}), 400)
+    
+    # Проверяем доступность AI анализатора
+    analyzer = get_ai_analyzer()
+    if analyzer is None:
+        return None, (jsonify({
+            'error': 'AI анализатор недоступен. Проверьте настройки в config.env',
+            'status': 'unavailable'
+        }), 503)
+    
+    filepath, options = resolve_upload(filename)
+    
+    if filepath is None:
+        return None, (jsonify({'error': 'Файл не найден'}), 404)
+    
+    # Читаем файл (из кэша)
+    entry = load_data(filepath, options)
+    df = entry['df']
+    if df.empty:
+        return None, (jsonify({'error': 'Файл пустой или не содержит данных'}), 400)
+    
+    first_15_rows = frame_to_records(df.head(15))
+    columns = df.columns.tolist()
+    if mode == 'rows':
+        prompt = analyzer.create_analysis_prompt(first_15_rows, columns)
+    else:
+        # Для больших CSV в кэше только первые строки - выбросы считаются по статистике
+        profile = build_data_profile(
+            df, entry['data_types'], get_stats(entry),
+            total_rows=get_total_rows(entry),
+            token_budget=app.config['AI_PROMPT_TOKEN_BUDGET'],
+            sample_size=app.config['AI_PROMPT_SAMPLE_ROWS'],
+            exact='streaming' not in entry
+        )
+        prompt = analyzer.create_profile_prompt(profile['text'])
+    
+    return {
+        'rows': first_15_rows,
+        'columns': columns,
+        'prompt': prompt,
+        'mode': mode,
+        'prompt_tokens': estimate_tokens(prompt)
+    }, None
+
 @app.route('/ai_analysis', methods=['POST'])
 def ai_analysis():
     """Анализ данных через Яндекс.GPT"""
     try:
         data = request.get_json()
-        filename = data.get('filename')
-        
-        if not filename:
-            return jsonify({'error': 'Имя файла не указано'}), 400
-        
-        # Проверяем доступность AI анализатора
-        if not AI_AVAILABLE or ai_analyzer is None:
-            return jsonify({
-                'error': 'AI анализатор недоступен. Проверьте настройки в config.env',
-                'status': 'unavailable'
-            }), 503
-        
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        if not os.path.exists(filepath):
-            return jsonify({'error': 'Файл не найден'}), 404
-        
-        # Читаем файл и берем первые 15 строк
-        df = read_file(filepath)
-        if df.empty:
-            return jsonify({'error': 'Файл пустой или не содержит данных'}), 400
-        
-        # Берем первые 15 строк
-        first_15_rows = df.head(15).fillna('').to_dict('records')
-        columns = df.columns.tolist()
+        request_prompt, error = get_ai_prompt(data)
+        if error:
+            return error
         
-        # Анализируем данные через AI
-        result = ai_analyzer.analyze_data(first_15_rows, columns)
+        # Анализируем данные через AI (refresh - не брать ответ из кэша)
+        result = get_ai_analyzer().analyze_data(
+            request_prompt['rows'], request_prompt['columns'],
+            refresh=bool(data.get('refresh')), prompt=request_prompt['prompt']
+        )
         
         if result['success']:
             return jsonify({
                 'success': True,
                 'analysis': result['analysis'],
                 'model': result['model'],
+                'cached': result['cached'],
+                'coalesced': result['coalesced'],
+                'prompt_mode': request_prompt['mode'],
+                'prompt_tokens': request_prompt['prompt_tokens'],
                 'status': 'completed'
             })
         else:
@@ -535,6 +954,39 @@ def ai_analysis():
             'status': 'error'
         }), 500
 
+@app.route('/ai_analysis_stream', methods=['POST'])
+def ai_analysis_stream():
+    """Анализ данных с передачей ответа по мере генерации (Server-Sent Events)
+
+    Каждое событие - строка "data: {json}": meta, delta с фрагментом текста, done или error
+    """
+    try:
+        data = request.get_json()
+        request_prompt, error = get_ai_prompt(data)
+        if error:
+            return error
+        events = get_ai_analyzer().stream_analysis(
+            request_prompt['rows'], request_prompt['columns'],
+            refresh=bool(data.get('refresh')), prompt=request_prompt['prompt']
+        )
+    except Exception as e:
+        return jsonify({
+            'error': f'Ошибка при анализе данных: {str(e)}',
+            'status': 'error'
+        }), 500
+    
+    def generate():
+        for event in events:
+            if event['type'] == 'meta':
+                event = dict(event, prompt_mode=request_prompt['mode'], prompt_tokens=request_prompt['prompt_tokens'])
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    # Отключаем буферизацию в прокси, чтобы фрагменты доходили до браузера сразу
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/ai_status', methods=['GET'])
 def ai_status():
     """Проверка статуса AI анализатора"""
@@ -544,18 +996,23 @@ def ai_status():
             'status': 'AI модуль недоступен'
         })
     
-    if ai_analyzer is None:
+    analyzer = get_ai_analyzer()
+    if analyzer is None:
         return jsonify({
             'available': False,
             'status': 'AI анализатор не инициализирован'
         })
     
     try:
-        status = ai_analyzer.get_status()
+        # Проверка кэшируется, refresh=1 выполняет её заново
+        status = analyzer.get_status(force=request.args.get('refresh') == '1')
         return jsonify({
             'available': status['connected'],
             'model': status['model'],
-            'status': status['status']
+            'status': status['status'],
+            'latency_ms': status['latency_ms'],
+            'checked_at': status['checked_at'],
+            'stale': status['stale']
         })
     except Exception as e:
         return jsonify({
@@ -563,5 +1020,28 @@ def ai_status():
             'status': f'Ошибка проверки статуса: {str(e)}'
         })
 
+@app.route('/ai_health', methods=['GET'])
+def ai_health():
+    """История проверок подключения к AI (задержка, доля ошибок) и счетчики клиента"""
+    analyzer = get_ai_analyzer()
+    if analyzer is None:
+        return jsonify({'error': 'AI анализатор не инициализирован'}), 503
+    return jsonify(dict(analyzer.health.get_history(), client=analyzer.client.get_stats()))
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Счетчики кэша разобранных файлов"""
+    return jsonify(data_cache.get_stats())
+
+@app.route('/ai_cache_stats', methods=['GET'])
+def ai_cache_stats():
+    """Счетчики кэша ответов нейросети и число объединенных запросов"""
+    analyzer = get_ai_analyzer()
+    if analyzer is None or analyzer.cache is None:
+        return jsonify({'error': 'AI анализатор не инициализирован'}), 503
+    stats = analyzer.cache.get_stats()
+    stats['coalesced'] = analyzer.coalescer.coalesced if analyzer.coalescer else 0
+    return jsonify(stats)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Пакетный анализ файлов
+Принимает файлы, папки и zip архивы и анализирует каждый файл в отдельном
+процессе пула (по числу ядер). Возвращает результаты по файлам и общую
+сводку с пропускной способностью в файлах и строках в секунду.
+Используется маршрутом /batch_analyze и консольным анализатором analyze.py
+"""
+
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_extract import get_pool_context
+from pipeline import allowed_file, analyze_file
+
+# Ограничение на распакованный размер архива (защита от zip-бомб)
+ARCHIVE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Ограничение на число файлов в одном пакете (с учетом содержимого архивов)
+BATCH_MAX_FILES = 100
+
+
+def is_archive(path):
+    """Проверяет, является ли файл zip архивом (по расширению)"""
+    return path.lower().endswith('.zip')
+
+
+class BatchTooLarge(ValueError):
+    """В пакете (с учетом содержимого архивов) больше файлов, чем разрешено"""
+
+
+def list_archive_members(path, name=None):
+    """Поддерживаемые файлы архива по его оглавлению, без распаковки
+
+    Распакованный размер проверяется заранее (защита от zip-бомб)
+    """
+    name = name or os.path.basename(path)
+    try:
+        with zipfile.ZipFile(path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and allowed_file(info.filename)
+                # Пропускаем служебные файлы macOS и пути, выходящие за пределы архива
+                and not info.filename.startswith(('__MACOSX/', '/')) and '..' not in info.filename.split('/')
+            ]
+    except zipfile.BadZipFile:
+        raise ValueError(f'Архив "{name}" поврежден или не является zip архивом')
+
+    if sum(info.file_size for info in members) > ARCHIVE_MAX_BYTES:
+        raise ValueError(f'Архив "{name}" слишком большой после распаковки')
+    return members
+
+
+def check_batch_size(count, max_files=BATCH_MAX_FILES):
+    """Бросает BatchTooLarge, если файлов в пакете больше max_files"""
+    if count > max_files:
+        raise BatchTooLarge(f"Слишком много файлов в пакете ({count}), максимум {max_files}")
+
+
+def extract_archive(path, workdir, name=None, max_files=None):
+    """Распаковывает из архива поддерживаемые файлы, возвращает [{name, path}]
+
+    Число файлов (max_files) и распакованный размер проверяются по оглавлению до распаковки
+    """
+    name = name or os.path.basename(path)
+    members = list_archive_members(path, name)
+    if max_files is not None:
+        check_batch_size(len(members), max_files)
+
+    folder = tempfile.mkdtemp(dir=workdir, prefix='archive-')
+    items = []
+    with zipfile.ZipFile(path) as archive:
+        for position, info in enumerate(members):
+            # Имена внутри архива не используются как пути на диске
+            target = os.path.join(folder, f'{position}_{os.path.basename(info.filename)}')
+            with archive.open(info) as source, open(target, 'wb') as output:
+                while True:
+                    chunk = source.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+            items.append({'name': f'{name}/{info.filename}', 'path': target})
+    return items
+
+
+def collect_files(paths, workdir, max_files=BATCH_MAX_FILES):
+    """Раскрывает пути в список файлов для анализа: папки обходятся рекурсивно, архивы распаковываются
+
+    Возвращает (файлы [{name, path}], пропущенные [{name, error}]); если файлов
+    больше max_files, бросает BatchTooLarge, не распаковывая лишние архивы
+    """
+    items = []
+    skipped = []
+
+    def add_archive(path):
+        try:
+            items.extend(extract_archive(path, workdir, max_files=max_files - len(items)))
+        except BatchTooLarge:
+            raise
+        except ValueError as e:
+            skipped.append({'name': path, 'error': str(e)})
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    filepath = os.path.join(root, filename)
+                    if is_archive(filename):
+                        add_archive(filepath)
+                    elif allowed_file(filename):
+                        items.append({'name': filepath, 'path': filepath})
+        elif not os.path.exists(path):
+            skipped.append({'name': path, 'error': 'Файл не найден'})
+        elif is_archive(path):
+            add_archive(path)
+        elif allowed_file(path):
+            items.append({'name': path, 'path': path})
+        else:
+            skipped.append({'name': path, 'error': 'Неподдерживаемый формат файла'})
+
+    check_batch_size(len(items), max_files)
+    return items, skipped
+
+
+def analyze_item(item, settings=None, preview_rows=0, options=None):
+    """Анализирует один файл пакета; ошибка попадает в результат, а не прерывает пакет"""
+    # Файлы уже обрабатываются параллельно - PDF внутри процесса разбираем последовательно
+    settings = dict(settings or {}, PDF_WORKERS=1)
+    started = time.perf_counter()
+    try:
+        result = analyze_file(item['path'], options=options, settings=settings, preview_rows=preview_rows)
+        result.update(name=item['name'], success=True)
+        return result
+    except Exception as e:
+        return {
+            'name': item['name'],
+            'file': item['path'],
+            'success': False,
+            'error': str(e),
+            'seconds': round(time.perf_counter() - started, 4)
+        }
+
+
+def summarize(results, skipped, seconds, workers):
+    """Общая сводка по пакету: объем, ошибки, пропускная способность"""
+    succeeded = [result for result in results if result['success']]
+    total_rows = sum(result['total_rows'] for result in succeeded)
+    total_bytes = sum(result['size_bytes'] for result in succeeded)
+
+    formats = {}
+    for result in succeeded:
+        formats[result['format']] = formats.get(result['format'], 0) + 1
+
+    # Столбцы, которые есть во всех файлах (например, в ежемесячных выгрузках одного отчета)
+    common_columns = None
+    for result in succeeded:
+        columns = set(result['columns'])
+        common_columns = columns if common_columns is None else common_columns & columns
+
+    return {
+        'files': len(results),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'skipped': len(skipped),
+        'total_rows': total_rows,
+        'total_bytes': total_bytes,
+        'formats': formats,
+        'common_columns': sorted(common_columns) if common_columns else [],
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'files_per_second': round(len(results) / seconds, 2) if seconds else None,
+        'rows_per_second': round(total_rows / seconds) if seconds else None,
+        'mb_per_second': round(total_bytes / seconds / 1024 / 1024, 2) if seconds else None
+    }
+
+
+def run_batch(items, workers=None, settings=None, preview_rows=0, skipped=None, on_result=None, options=None):
+    """Анализирует файлы пакета в пуле процессов
+
+    workers - число процессов (по умолчанию по числу ядер, 1 - в текущем процессе),
+    options - параметры чтения (лист, страницы PDF) для всех файлов,
+    on_result(result) вызывается для каждого файла по мере готовности.
+    Возвращает {'results': результаты в порядке файлов, 'summary': сводка}
+    """
+    skipped = skipped or []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(items) or 1))
+    started = time.perf_counter()
+    results = [None] * len(items)
+
+    if workers == 1:
+        for position, item in enumerate(items):
+            results[position] = analyze_item(item, settings, preview_rows, options)
+            if on_result:
+                on_result(results[position])
+    else:
+        # Процессы пула запускаются через forkserver: пакет может запускаться из потока веб-сервера
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_pool_context()) as executor:
+            futures = {
+                executor.submit(analyze_item, item, settings, preview_rows, options): position
+                for position, item in enumerate(items)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if on_result:
+                    on_result(future.result())
+
+    summary = summarize(results, skipped, time.perf_counter() - started, workers)
+    return {'results': results, 'summary': summary, 'skipped': skipped}
+
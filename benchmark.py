@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Замеры производительности конвейера анализа на синтетических таблицах
+
+Запуск:
+    python benchmark.py types --rows 20000 --columns 300
+    python benchmark.py stats --rows 1000000 --columns 12
+    python benchmark.py startup --repeat 5 --target-ms 1500
+    python benchmark.py load --workers 1,2,4 --concurrency 8 --requests 200
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiling import profile_frame
+from type_inference import infer_column_types, normalize_dtypes
+
+
+def make_wide_table(rows, columns, seed=0):
+    """Создает широкую таблицу со столбцами разных типов (все значения - строки, как в CSV)"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    categories = np.array(['Север', 'Юг', 'Запад', 'Восток', 'Центр'])
+    dates = pd.date_range('2020-01-01', periods=1000, freq='D').strftime('%d.%m.%Y').to_numpy()
+
+    for index in range(columns):
+        kind = index % 4
+        if kind == 0:
+            data[f'num_{index}'] = rng.normal(100, 15, rows).round(2).astype(str)
+        elif kind == 1:
+            data[f'date_{index}'] = rng.choice(dates, rows)
+        elif kind == 2:
+            data[f'cat_{index}'] = rng.choice(categories, rows)
+        else:
+            data[f'text_{index}'] = np.char.add('item_', rng.integers(0, rows, rows).astype(str))
+
+    return pd.DataFrame(data, dtype=object)
+
+
+def legacy_detect_data_types(df):
+    """Прежняя реализация detect_data_types (цикл по столбцам, выборка head(100))"""
+    data_types = {}
+
+    for column in df.columns:
+        if str(column).strip() == '' or df[column].isna().all():
+            data_types[column] = 'empty'
+            continue
+
+        sample_data = df[column].dropna().head(100)
+
+        if len(sample_data) == 0:
+            data_types[column] = 'empty'
+            continue
+
+        try:
+            pd.to_numeric(sample_data, errors='raise')
+            data_types[column] = 'numeric'
+        except Exception:
+            for date_format in ['%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']:
+                try:
+                    pd.to_datetime(sample_data, format=date_format, errors='raise')
+                    data_types[column] = 'datetime'
+                    break
+                except Exception:
+                    continue
+            else:
+                unique_count = sample_data.nunique()
+                unique_ratio = unique_count / len(sample_data)
+                if unique_ratio < 0.5 and unique_count < 50:
+                    data_types[column] = 'categorical'
+                else:
+                    data_types[column] = 'text'
+
+    return data_types
+
+
+def legacy_calculate_basic_stats(df, data_types):
+    """Прежняя реализация calculate_basic_stats (цикл по столбцам, mode() дважды)"""
+    stats = {}
+
+    for column in df.columns:
+        dtype = data_types.get(column, 'text')
+
+        try:
+            if dtype == 'numeric':
+                values = df[column].to_numpy()
+                count = int(df[column].count())
+                total = float(np.nansum(values, dtype=np.float64))
+                stats[column] = {
+                    'type': 'numeric',
+                    'sum': total,
+                    'mean': total / count if count else float('nan'),
+                    'min': float(df[column].min()),
+                    'max': float(df[column].max()),
+                    'count': count
+                }
+            elif dtype == 'datetime':
+                stats[column] = {
+                    'type': 'datetime',
+                    'min_date': str(df[column].min()),
+                    'max_date': str(df[column].max()),
+                    'count': int(df[column].count())
+                }
+            else:
+                stats[column] = {
+                    'type': dtype,
+                    'unique_count': int(df[column].nunique()),
+                    'total_count': int(df[column].count()),
+                    'most_common': df[column].mode().iloc[0] if not df[column].mode().empty else None
+                }
+        except Exception as e:
+            stats[column] = {'type': 'error', 'error': str(e)}
+
+    return stats
+
+
+def measure(function, repeat):
+    """Возвращает лучшее время выполнения функции из repeat запусков"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_types(args):
+    """Сравнивает прежнее и новое определение типов на широкой таблице"""
+    df = make_wide_table(args.rows, args.columns)
+    print(f"📊 Таблица: {args.rows} строк x {args.columns} столбцов")
+
+    legacy_time, legacy_types = measure(lambda: legacy_detect_data_types(df), args.repeat)
+    new_time, type_info = measure(lambda: infer_column_types(df, sample_size=args.sample_size), args.repeat)
+
+    new_types = {column: info['type'] for column, info in type_info.items()}
+    mismatches = [column for column in df.columns if legacy_types[column] != new_types[column]]
+
+    print(f"⏱️  Прежний цикл по столбцам: {legacy_time * 1000:.1f} мс")
+    print(f"⚡ Векторное определение (выборка {args.sample_size}): {new_time * 1000:.1f} мс")
+    print(f"🚀 Ускорение: x{legacy_time / new_time:.1f}")
+    print(f"🔍 Расхождений в типах: {len(mismatches)}")
+    for column in mismatches[:10]:
+        print(f"   - {column}: {legacy_types[column]} -> {new_types[column]} "
+              f"(уверенность {type_info[column]['confidence']})")
+
+
+def bench_stats(args):
+    """Сравнивает прежний расчет статистики с профилированием (приближенным и точным)"""
+    df = make_wide_table(args.rows, args.columns)
+    type_info = infer_column_types(df)
+    df = normalize_dtypes(df, type_info)
+    data_types = {column: info['type'] for column, info in type_info.items()}
+    print(f"📊 Таблица: {args.rows} строк x {args.columns} столбцов")
+
+    legacy_time, _ = measure(lambda: legacy_calculate_basic_stats(df, data_types), args.repeat)
+    approx_time, approx = measure(lambda: profile_frame(df, data_types), args.repeat)
+    exact_time, exact = measure(lambda: profile_frame(df, data_types, exact=True), args.repeat)
+
+    print(f"⏱️  Прежний цикл по столбцам (sum/mean/min/max, nunique, mode): {legacy_time * 1000:.1f} мс")
+    print(f"⚡ Профилирование, приближенное для высоких таблиц: {approx_time * 1000:.1f} мс "
+          f"(x{legacy_time / approx_time:.1f})")
+    print(f"🎯 Профилирование, точное: {exact_time * 1000:.1f} мс (x{legacy_time / exact_time:.1f})")
+
+    # Точность приближенных оценок относительно точного режима
+    median_errors = []
+    unique_errors = []
+    for column, stat in exact.items():
+        estimate = approx[column]
+        if stat['type'] == 'numeric' and stat['quantiles']['50%']:
+            median_errors.append(abs(estimate['quantiles']['50%'] / stat['quantiles']['50%'] - 1))
+        elif 'unique_count' in stat and stat['unique_count']:
+            unique_errors.append(abs(estimate['unique_count'] / stat['unique_count'] - 1))
+    if median_errors:
+        print(f"🔍 Макс. относительная ошибка медианы: {max(median_errors) * 100:.2f}%")
+    if unique_errors:
+        print(f"🔍 Макс. относительная ошибка числа уникальных значений: {max(unique_errors) * 100:.2f}%")
+
+
+def bench_threshold(args):
+    """Ищет число строк, с которого приближенное профилирование быстрее точного (для APPROX_MIN_ROWS)"""
+    print(f"📊 Столбцов: {args.columns}, лучшее из {args.repeat} запусков")
+    crossover = None
+    for rows in sorted(int(value) for value in args.rows.split(',')):
+        df = make_wide_table(rows, args.columns)
+        type_info = infer_column_types(df)
+        df = normalize_dtypes(df, type_info)
+        data_types = {column: info['type'] for column, info in type_info.items()}
+
+        # approx_min_rows=0 включает приближенные оценки при любом числе строк
+        approx_time, _ = measure(lambda: profile_frame(df, data_types, approx_min_rows=0), args.repeat)
+        exact_time, _ = measure(lambda: profile_frame(df, data_types, exact=True), args.repeat)
+        faster = approx_time < exact_time
+        if faster and crossover is None:
+            crossover = rows
+        elif not faster:
+            crossover = None
+        print(f"   {rows:>10} строк: точно {exact_time * 1000:8.1f} мс, приближенно {approx_time * 1000:8.1f} мс "
+              f"{'⚡' if faster else '🎯'}")
+
+    if crossover is None:
+        print("🎯 Приближенное профилирование не быстрее точного ни на одном размере")
+    else:
+        print(f"⚡ Приближенное профилирование стабильно быстрее точного начиная с {crossover} строк")
+
+
+# Модули, которые должны загружаться при первом использовании, а не при запуске приложения
+LAZY_MODULES = ['pdfplumber', 'openpyxl', 'xlrd', 'openai']
+
+
+def parse_import_times(output):
+    """Разбирает вывод python -X importtime: [(модуль, глубина вложенности, собственное мс, суммарное мс)]"""
+    modules = []
+    for line in output.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[0].startswith('import time:') or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(parts[0].split(':')[1]) / 1000, int(parts[1]) / 1000))
+    return modules
+
+
+def bench_startup(args):
+    """Время запуска веб-приложения: импорт app.py в новом процессе и самые долгие импорты"""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    script = 'import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)'
+
+    import_times = []
+    process_times = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', script], cwd=folder, capture_output=True, text=True)
+        process_times.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            print(f"❌ Ошибка импорта app.py:\n{completed.stderr}")
+            return 1
+        import_times.append(float(completed.stdout.strip().splitlines()[-1]))
+
+    import_ms = statistics.median(import_times) * 1000
+    print(f"⏱️  Импорт app.py (медиана из {args.repeat}): {import_ms:.0f} мс")
+    print(f"⏱️  Процесс целиком (интерпретатор и импорт): {statistics.median(process_times) * 1000:.0f} мс")
+
+    # Отдельный запуск с -X importtime: отчет по модулям (сам отчет замедляет импорт)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                               cwd=folder, capture_output=True, text=True)
+    modules = parse_import_times(completed.stderr)
+    # Вложенные модули выводятся перед родителем: прямые импорты app.py - перед строкой app
+    direct = []
+    children = []
+    for module in modules:
+        if module[1] == 0:
+            if module[0] == 'app':
+                direct = sorted(children, key=lambda child: -child[3])
+                break
+            children = []
+        elif module[1] == 1:
+            children.append(module)
+    print("📦 Самые долгие импорты app.py (с вложенными модулями):")
+    for name, _, _, cumulative in direct[:args.top]:
+        print(f"   {cumulative:8.1f} мс  {name}")
+
+    loaded = {module[0] for module in modules}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"⚠️  При запуске загружаются модули, нужные только по требованию: {', '.join(eager)}")
+    else:
+        print(f"✅ Не загружаются при запуске: {', '.join(LAZY_MODULES)}")
+
+    if args.target_ms and import_ms > args.target_ms:
+        print(f"❌ Импорт дольше цели {args.target_ms:.0f} мс")
+        return 1
+    if args.target_ms:
+        print(f"🎯 Цель {args.target_ms:.0f} мс выполнена")
+    return 0
+
+
+def http_json(url, data=None, content_type='application/json', timeout=120):
+    """Отправляет запрос и возвращает (код ответа, JSON ответа)"""
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': content_type} if data else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def start_server(folder, workers, threads):
+    """Запускает serve.py на свободном порту и ждет, пока он начнет отвечать"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    base = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--threads', str(threads), '--max-requests', '0'],
+        cwd=folder, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base + '/', timeout=1).close()
+            return process, base
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"serve.py не запустился ({workers} процессов); проверьте, что установлен gunicorn")
+
+
+def upload_for_load(base, path):
+    """Загружает файл через /upload_stream и дожидается окончания обработки, возвращает имя на сервере"""
+    with open(path, 'rb') as file:
+        query = urllib.parse.urlencode({'filename': os.path.basename(path)})
+        status, upload = http_json(f'{base}/upload_stream?{query}', file.read(), 'application/octet-stream')
+    if status != 202:
+        raise RuntimeError(f"Загрузка не удалась: {upload.get('error')}")
+    while True:
+        status, job = http_json(f"{base}/jobs/{upload['job_id']}")
+        if job.get('status') == 'done':
+            return upload['filename']
+        if job.get('status') == 'error' or status != 200:
+            raise RuntimeError(f"Обработка не удалась: {job.get('error')}")
+        time.sleep(0.1)
+
+
+def bench_load(args):
+    """Нагрузочный тест рабочего режима: пропускная способность при разном числе процессов"""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    print(f"📊 Файл: {args.file}, {args.requests} запросов /column_stats (exact), "
+          f"{args.concurrency} одновременно, {args.threads} потоков на процесс, ядер: {os.cpu_count()}")
+
+    results = []
+    for workers in [int(value) for value in args.workers.split(',')]:
+        process, base = start_server(folder, workers, args.threads)
+        try:
+            filename = upload_for_load(base, args.file)
+            body = json.dumps({'filename': filename, 'exact': True}).encode('utf-8')
+
+            def request_stats():
+                started = time.perf_counter()
+                status, _ = http_json(f'{base}/column_stats', body)
+                return status, time.perf_counter() - started
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                # Прогрев: каждый процесс читает файл в свой кэш
+                list(executor.map(lambda _: request_stats(), range(workers * args.threads)))
+                started = time.perf_counter()
+                responses = list(executor.map(lambda _: request_stats(), range(args.requests)))
+                elapsed = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        latencies = sorted(latency for _, latency in responses)
+        errors = sum(1 for status, _ in responses if status != 200)
+        throughput = len(responses) / elapsed
+        results.append(throughput)
+        print(f"⚡ {workers} процессов: {throughput:.1f} запросов/с, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+              f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.0f} мс, "
+              f"x{throughput / results[0]:.2f} к первому замеру" + (f", ошибок: {errors}" if errors else ''))
+    return 0
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description='Замеры производительности анализатора')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    types_parser = subparsers.add_parser('types', help='Определение типов данных на широкой таблице')
+    types_parser.add_argument('--rows', type=int, default=20000)
+    types_parser.add_argument('--columns', type=int, default=300)
+    types_parser.add_argument('--sample-size', type=int, default=1000)
+    types_parser.add_argument('--repeat', type=int, default=3)
+    types_parser.set_defaults(handler=bench_types)
+
+    stats_parser = subparsers.add_parser('stats', help='Статистика по столбцам: прежний цикл и профилирование')
+    stats_parser.add_argument('--rows', type=int, default=1_000_000)
+    stats_parser.add_argument('--columns', type=int, default=12)
+    stats_parser.add_argument('--repeat', type=int, default=1)
+    stats_parser.set_defaults(handler=bench_stats)
+
+    threshold_parser = subparsers.add_parser('threshold', help='Порог строк для приближенного профилирования')
+    threshold_parser.add_argument('--rows', default='100000,300000,500000,1000000,2000000',
+                                  help='Число строк через запятую')
+    threshold_parser.add_argument('--columns', type=int, default=12)
+    threshold_parser.add_argument('--repeat', type=int, default=3)
+    threshold_parser.set_defaults(handler=bench_threshold)
+
+    startup_parser = subparsers.add_parser('startup', help='Время импорта app.py и отчет по долгим импортам')
+    startup_parser.add_argument('--repeat', type=int, default=5)
+    startup_parser.add_argument('--top', type=int, default=10, help='Сколько модулей показать в отчете')
+    startup_parser.add_argument('--target-ms', type=float, default=None,
+                                help='Цель по времени импорта; если она превышена, код завершения 1')
+    startup_parser.set_defaults(handler=bench_startup)
+
+    load_parser = subparsers.add_parser('load', help='Нагрузочный тест serve.py с разным числом процессов')
+    load_parser.add_argument('--workers', default='1,2,4', help='Число процессов через запятую')
+    load_parser.add_argument('--threads', type=int, default=2)
+    load_parser.add_argument('--concurrency', type=int, default=8, help='Одновременных запросов')
+    load_parser.add_argument('--requests', type=int, default=200)
+    load_parser.add_argument('--file', default='III.xlsx', help='Файл, по которому считается статистика')
+    load_parser.set_defaults(handler=bench_load)
+
+    args = parser.parse_args()
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
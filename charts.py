@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Подготовка данных для диаграмм без копирования и сортировки всей таблицы
+Столбчатые диаграммы строятся по одной группировке на категорию,
+которая вычисляется один раз на файл
+"""
+
+import numpy as np
+import pandas as pd
+
+# Сколько групп показывать на столбчатой диаграмме, остальные объединяются в "Другое"
+BAR_CHART_TOP_N = 10
+OTHER_LABEL = 'Другое'
+
+# Сколько категориальных и числовых столбцов использовать для столбчатых диаграмм
+BAR_CHART_CATEGORIES = 2
+BAR_CHART_VALUES = 2
+
+# Показатели столбчатой диаграммы и их подписи в заголовке
+BAR_METRICS = {
+    'sum': '',
+    'mean': ' (среднее)',
+    'count': ' (количество)'
+}
+
+# Сколько последних записей показывать на линейной диаграмме
+LINE_CHART_POINTS = 20
+
+# Сколько последних периодов показывать при группировке по времени
+LINE_CHART_MAX_BUCKETS = 120
+
+# Доступные периоды группировки линейной диаграммы
+TIME_BUCKETS = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M'
+}
+
+
+def recent_points(dates, values, size=LINE_CHART_POINTS):
+    """Возвращает size последних по дате точек, отсортированных по дате"""
+    # Частичный отбор nlargest вместо сортировки всего столбца
+    recent_dates = dates.dropna().nlargest(size, keep='last').sort_values(kind='stable')
+    return recent_dates, values.loc[recent_dates.index]
+
+
+def aggregate_by_period(dates, values, time_bucket, max_buckets=LINE_CHART_MAX_BUCKETS):
+    """Суммирует значения по периодам (день, неделя, месяц)"""
+    periods = dates.dt.to_period(TIME_BUCKETS[time_bucket])
+    totals = values.groupby(periods).sum().sort_index().tail(max_buckets)
+    return totals.index.start_time, totals
+
+
+def build_line_chart(dates, values, date_col, num_col, time_bucket=None):
+    """Строит линейную диаграмму по столбцу дат и числовому столбцу"""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+
+    if time_bucket in TIME_BUCKETS:
+        labels, points = aggregate_by_period(dates, values, time_bucket)
+    else:
+        time_bucket = None
+        labels, points = recent_points(dates, values)
+
+    return {
+        'type': 'line',
+        'title': f'{num_col} по времени ({date_col})',
+        'category': date_col,
+        'value': num_col,
+        'time_bucket': time_bucket,
+        'data': {
+            'labels': pd.Series(labels).dt.strftime('%Y-%m-%d').tolist(),
+            'values': [None if pd.isna(value) else float(value) for value in pd.to_numeric(points, errors='coerce')]
+        }
+    }
+
+
+def aggregate_by_category(df, category, value_columns):
+    """Одна группировка по категории сразу для всех числовых столбцов: суммы и количества"""
+    return df.groupby(category, observed=True)[value_columns].agg(['sum', 'count'])
+
+
+def top_groups(aggregate, value_column, metric='sum', top_n=BAR_CHART_TOP_N):
+    """Возвращает top_n групп по показателю и группу "Другое" для остальных"""
+    sums = aggregate[(value_column, 'sum')].astype(float)
+    counts = aggregate[(value_column, 'count')].astype(float)
+    # Среднее выводим из суммы и количества, чтобы его можно было посчитать и для "Другое"
+    groups = pd.DataFrame({'sum': sums, 'count': counts, 'mean': sums / counts.replace(0, np.nan)})
+
+    ordered = groups.sort_values(metric, ascending=False, kind='stable')
+    top = ordered.head(top_n)
+    labels = top.index.tolist()
+    values = top[metric].tolist()
+
+    rest = ordered.iloc[top_n:]
+    if len(rest):
+        other_sum = rest['sum'].sum()
+        other_count = rest['count'].sum()
+        other = {'sum': other_sum, 'count': other_count, 'mean': other_sum / other_count if other_count else np.nan}
+        labels.append(OTHER_LABEL)
+        values.append(other[metric])
+
+    return labels, [None if pd.isna(value) else float(value) for value in values]
+
+
+class ChartAggregator:
+    """Группировки по категориям для столбчатых диаграмм, вычисляемые один раз на файл"""
+
+    def __init__(self, df, data_types, aggregates=None):
+        self.df = df
+        self.numeric_columns = [col for col, dtype in data_types.items() if dtype == 'numeric']
+        self.categorical_columns = [col for col, dtype in data_types.items() if dtype == 'categorical']
+        self.aggregates = dict(aggregates or {})
+
+    def aggregate(self, category):
+        """Возвращает группировку по категории, вычисляя её при первом обращении"""
+        if category not in self.aggregates:
+            if self.df is None:
+                return None
+            value_columns = [col for col in self.numeric_columns if col != category]
+            self.aggregates[category] = aggregate_by_category(self.df, category, value_columns)
+        return self.aggregates[category]
+
+    @property
+    def nbytes(self):
+        """Память, занятая группировками (исходная таблица не учитывается)"""
+        return sum(
+            int(aggregate.memory_usage(deep=True).sum())
+            for aggregate in self.aggregates.values() if aggregate is not None
+        )
+
+    def bar_charts(self, selected_category=None, metric='sum', top_n=BAR_CHART_TOP_N):
+        """Строит столбчатые диаграммы для пар категория x числовой столбец"""
+        if metric not in BAR_METRICS:
+            metric = 'sum'
+
+        categorical_columns = self.categorical_columns
+        if selected_category and selected_category in categorical_columns:
+            categorical_columns = [selected_category]
+
+        charts = []
+        for cat_col in categorical_columns[:BAR_CHART_CATEGORIES]:
+            aggregate = self.aggregate(cat_col)
+            if aggregate is None:
+                continue
+            value_columns = [col for col in self.numeric_columns if col != cat_col]
+            for num_col in value_columns[:BAR_CHART_VALUES]:
+                if (num_col, 'sum') not in aggregate.columns:
+                    continue
+                labels, values = top_groups(aggregate, num_col, metric, top_n)
+                charts.append({
+                    'type': 'bar',
+                    'title': f'{num_col} по {cat_col}{BAR_METRICS[metric]}',
+                    'category': cat_col,
+                    'value': num_col,
+                    'metric': metric,
+                    'data': {
+                        'labels': labels,
+                        'values': values
+                    }
+                })
+        return charts
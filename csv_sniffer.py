@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Определение параметров CSV файла по его началу
+Кодировка, разделитель, символ кавычек и строка заголовка определяются
+за одно чтение ограниченного префикса файла
+"""
+
+import codecs
+import csv
+
+# Сколько байт читать из начала файла
+SNIFF_SAMPLE_SIZE = 64 * 1024
+
+# Кодировки в порядке проверки (cp1251 - типичная кодировка выгрузок на русском)
+CANDIDATE_ENCODINGS = ['utf-8', 'cp1251', 'latin-1']
+
+CANDIDATE_DELIMITERS = [',', ';', '\t', '|']
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detect_encoding(raw, is_complete):
+    """Определяет кодировку по байтам префикса, возвращает (кодировка, BOM)"""
+    for bom, encoding in BOMS:
+        if raw.startswith(bom):
+            return encoding, True
+
+    for encoding in CANDIDATE_ENCODINGS:
+        # Префикс мог оборвать многобайтный символ, поэтому декодируем инкрементально
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(raw, final=is_complete)
+            return encoding, False
+        except UnicodeDecodeError:
+            continue
+
+    return 'latin-1', False
+
+
+def split_complete_lines(text, is_complete):
+    """Возвращает строки префикса без последней, возможно оборванной, строки"""
+    lines = text.splitlines()
+    if not is_complete and len(lines) > 1:
+        lines = lines[:-1]
+    return lines
+
+
+def detect_delimiter(lines):
+    """Определяет разделитель и символ кавычек"""
+    sample = '\n'.join(line for line in lines if line.strip())
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=''.join(CANDIDATE_DELIMITERS))
+        return dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        pass
+
+    # Выбираем разделитель, который чаще всего встречается в строках
+    counts = {delimiter: sum(line.count(delimiter) for line in lines) for delimiter in CANDIDATE_DELIMITERS}
+    best = max(CANDIDATE_DELIMITERS, key=lambda delimiter: counts[delimiter])
+    return (best if counts[best] > 0 else ','), '"'
+
+
+def detect_header_row(lines, delimiter, quotechar):
+    """Определяет номер строки заголовка и есть ли заголовок вообще"""
+    rows = list(csv.reader(lines, delimiter=delimiter, quotechar=quotechar))
+    widths = [len(row) for row in rows]
+    if not any(widths):
+        return 0, True
+
+    # Строки-преамбулы (название отчета и т.п.) содержат меньше полей, чем таблица
+    table_width = max(set(width for width in widths if width), key=widths.count)
+    header_row = next(index for index, width in enumerate(widths) if width >= table_width)
+
+    # Если в первой строке таблицы все значения - числа, заголовка нет
+    has_header = not all(is_number(value) for value in rows[header_row] if value.strip())
+    return header_row, has_header
+
+
+def is_number(value):
+    """Проверяет, является ли строка числом"""
+    try:
+        float(value.strip().replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+
+def sniff_csv(filepath, sample_size=SNIFF_SAMPLE_SIZE):
+    """Определяет кодировку, разделитель, кавычки и строку заголовка CSV файла"""
+    with open(filepath, 'rb') as file:
+        raw = file.read(sample_size + 1)
+
+    is_complete = len(raw) <= sample_size
+    return sniff_csv_bytes(raw[:sample_size], is_complete)
+
+
+def sniff_csv_bytes(raw, is_complete):
+    """Определяет параметры CSV по началу файла; is_complete - прочитан ли файл целиком"""
+    encoding, bom = detect_encoding(raw, is_complete)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(raw, final=is_complete)
+
+    lines = split_complete_lines(text, is_complete)
+    delimiter, quotechar = detect_delimiter(lines)
+    header_row, has_header = detect_header_row(lines, delimiter, quotechar)
+
+    return {
+        'encoding': encoding,
+        'bom': bom,
+        'delimiter': delimiter,
+        'quotechar': quotechar,
+        'header_row': header_row,
+        'has_header': has_header
+    }
+
+
+def csv_read_options(dialect):
+    """Преобразует параметры файла в аргументы pd.read_csv"""
+    return {
+        'sep': dialect['delimiter'],
+        'quotechar': dialect['quotechar'],
+        'encoding': dialect['encoding'],
+        'skiprows': dialect['header_row'],
+        'header': 0 if dialect['has_header'] else None,
+        'on_bad_lines': 'skip'
+    }
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Кэш разобранных DataFrame в памяти сервера
+Ключ кэша - путь к файлу и ключ параметров чтения (лист, страницы PDF);
+запись действительна, пока не изменились время изменения и размер файла.
+В размер записи входят и данные, вычисленные по таблице (статистика,
+группировки для диаграмм, индексы поиска и сортировки)
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Служебные поля записи, которые не входят в её размер
+ENTRY_FIELDS = ('key', 'signature', 'df', 'df_size', 'size')
+
+
+class DataFrameCache:
+    """LRU-кэш разобранных файлов с ограничением по памяти"""
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_signature(filepath):
+        """Возвращает подпись файла: время изменения и размер"""
+        stat = os.stat(filepath)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def estimate_size(value, seen=None):
+        """Оценивает объем памяти значения: DataFrame, массивы, словари и списки рекурсивно
+
+        Объекты с атрибутом nbytes (индексы таблицы, группировки) сообщают свой размер сами;
+        seen - id уже учтенных объектов, чтобы общая таблица не считалась дважды
+        """
+        seen = set() if seen is None else seen
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        try:
+            if isinstance(value, pd.DataFrame):
+                return int(value.memory_usage(index=True, deep=True).sum())
+            if isinstance(value, (pd.Series, pd.Index)):
+                return int(value.memory_usage(deep=True))
+            if isinstance(value, np.ndarray) or hasattr(value, 'nbytes'):
+                return int(value.nbytes)
+            if isinstance(value, dict):
+                return sys.getsizeof(value) + sum(
+                    DataFrameCache.estimate_size(key, seen) + DataFrameCache.estimate_size(item, seen)
+                    for key, item in value.items()
+                )
+            if isinstance(value, (list, tuple, set)):
+                return sys.getsizeof(value) + sum(DataFrameCache.estimate_size(item, seen) for item in value)
+            return sys.getsizeof(value)
+        except Exception:
+            return 0
+
+    def entry_size(self, entry):
+        """Размер записи: таблица (считается один раз) и все добавленные к ней данные"""
+        seen = {id(entry['df'])}
+        return entry['df_size'] + sum(
+            self.estimate_size(value, seen) for name, value in entry.items() if name not in ENTRY_FIELDS
+        )
+
+    def get(self, filepath, view=''):
+        """Возвращает запись кэша для файла с параметрами чтения view или None"""
+        key = (os.path.abspath(filepath), view)
+        try:
+            signature = self.file_signature(filepath)
+        except OSError:
+            signature = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['signature'] != signature:
+                if entry is not None:
+                    # Файл изменился - старая запись больше не актуальна
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, filepath, df, view='', **artifacts):
+        """Кладет DataFrame и связанные с ним данные в кэш"""
+        key = (os.path.abspath(filepath), view)
+        entry = {
+            'key': key,
+            'signature': self.file_signature(filepath),
+            'df': df,
+            'df_size': self.estimate_size(df),
+        }
+        entry.update(artifacts)
+        entry['size'] = self.entry_size(entry)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Слишком большие файлы не кэшируем, чтобы не вытеснить всё остальное
+            if entry['size'] > self.max_bytes:
+                return entry
+
+            self._entries[key] = entry
+            self.current_bytes += entry['size']
+
+            self._evict()
+
+        return entry
+
+    def attach(self, entry, **artifacts):
+        """Добавляет к записи данные, вычисленные по таблице, и учитывает их в размере"""
+        entry.update(artifacts)
+        self.refresh_size(entry)
+
+    def refresh_size(self, entry):
+        """Пересчитывает размер записи после того, как её данные выросли"""
+        size = self.entry_size(entry)
+        with self._lock:
+            if self._entries.get(entry['key']) is not entry:
+                # Запись уже вытеснена или не попала в кэш
+                entry['size'] = size
+                return
+            self.current_bytes += size - entry['size']
+            entry['size'] = size
+            if size > self.max_bytes:
+                self._remove(entry['key'])
+                self.evictions += 1
+            self._evict()
+
+    def _evict(self):
+        """Вытесняет давно использованные записи, пока кэш не уложится в max_bytes (под блокировкой)"""
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, filepath):
+        """Удаляет из кэша записи о файле со всеми параметрами чтения"""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self._remove(key)
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry['size']
+
+    def get_stats(self):
+        """Возвращает счетчики попаданий и заполненность кэша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Чтение Excel файлов
+Формат определяется по сигнатуре файла, а не по расширению, поэтому файл
+разбирается один раз. xlsx читается в режиме read-only openpyxl: строки листа
+перебираются без построения объектной модели книги. Значения всего листа при
+этом держатся в памяти до построения таблицы, так что память растет с размером
+листа (примерно вдвое больше итоговой таблицы на время разбора)
+"""
+
+import zipfile
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# Сигнатуры форматов: xlsx - zip архив, xls - составной документ OLE2
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Значения ячеек с ошибками формул, которые pd.read_excel превращает в NaN
+ERROR_VALUES = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+
+
+def detect_excel_format(filepath):
+    """Определяет формат Excel файла по первым байтам"""
+    with open(filepath, 'rb') as file:
+        head = file.read(len(XLS_SIGNATURE))
+
+    if head.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if head.startswith(XLS_SIGNATURE):
+        return 'xls'
+    raise ValueError("Файл не является книгой Excel (xlsx или xls)")
+
+
+def list_sheets(filepath):
+    """Возвращает названия листов без чтения их содержимого"""
+    if detect_excel_format(filepath) == 'xlsx':
+        import openpyxl
+        # В режиме read-only читается только описание книги
+        workbook = openpyxl.load_workbook(filepath, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+    import xlrd
+    workbook = xlrd.open_workbook(filepath, on_demand=True)
+    try:
+        return workbook.sheet_names()
+    finally:
+        workbook.release_resources()
+
+
+def convert_cell(value):
+    """Приводит значение ячейки к виду, который дает pd.read_excel"""
+    if value is None:
+        return ''
+    # Целые числа Excel хранит как float
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    # Ячейки с ошибками формул (#N/A, #DIV/0! и т.п.) считаем пропусками
+    if isinstance(value, str) and value in ERROR_VALUES:
+        return np.nan
+    return value
+
+
+def read_xlsx(filepath, sheet=None):
+    """Читает лист xlsx построчно в режиме read-only
+
+    Строки собираются в список и разбираются в таблицу целиком, как в
+    pd.read_excel: типы столбцов определяются по всем строкам сразу
+    """
+    import openpyxl
+
+    try:
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ValueError(f"Файл xlsx поврежден: {str(e)}")
+
+    try:
+        if sheet is not None and sheet not in workbook.sheetnames:
+            raise ValueError(f'Лист "{sheet}" не найден. Доступные листы: {", ".join(workbook.sheetnames)}')
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        sheet_name = worksheet.title
+
+        # Размеры листа в файле бывают неверными, определяем их по самим строкам
+        worksheet.reset_dimensions()
+
+        rows = []
+        last_filled = -1
+        width = 0
+        # values_only отдает значения без создания объектов ячеек
+        for row in worksheet.iter_rows(values_only=True):
+            values = [convert_cell(value) for value in row]
+            # Отбрасываем пустые ячейки справа
+            while values and values[-1] == '':
+                values.pop()
+            if values:
+                last_filled = len(rows)
+                width = max(width, len(values))
+            rows.append(values)
+    finally:
+        workbook.close()
+
+    # Отбрасываем пустые строки в конце листа и выравниваем строки по ширине на месте, без второй копии листа
+    del rows[last_filled + 1:]
+    for values in rows:
+        values.extend([''] * (width - len(values)))
+    if not rows:
+        return pd.DataFrame(), sheet_name
+
+    # Тот же разбор, что и в pd.read_excel: заголовок, пропуски и типы столбцов
+    df = TextParser(rows, header=0).read()
+    return df, sheet_name
+
+
+def read_excel(filepath, sheet=None):
+    """Читает лист Excel файла (по умолчанию первый) одним проходом"""
+    excel_format = detect_excel_format(filepath)
+
+    if excel_format == 'xlsx':
+        df, sheet_name = read_xlsx(filepath, sheet)
+    else:
+        sheets = list_sheets(filepath)
+        if sheet is not None and sheet not in sheets:
+            raise ValueError(f'Лист "{sheet}" не найден. Доступные листы: {", ".join(sheets)}')
+        sheet_name = sheet if sheet is not None else sheets[0]
+        df = pd.read_excel(filepath, engine='xlrd', sheet_name=sheet_name)
+
+    df.attrs['excel_sheet'] = sheet_name
+    return df
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Фоновые задачи обработки файлов
+Запрос на загрузку сразу получает id задачи, а чтение файла, определение типов,
+статистика и диаграммы выполняются в ограниченном пуле потоков. При работе в
+нескольких процессах состояние и результаты задач хранятся в общей папке.
+Процесс регулярно отмечает свои незавершенные задачи; задача, процесс которой
+завершился (перезапуск gunicorn по max_requests или по таймауту) или давно не
+отмечался, считается прерванной и завершается с ошибкой
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Этапы обработки файла в порядке выполнения и их подписи
+JOB_STAGES = {
+    'parse': 'Чтение файла',
+    'infer': 'Определение типов данных',
+    'stats': 'Базовая статистика',
+    'charts': 'Диаграммы'
+}
+
+# Как часто сохранять прогресс задачи в общую папку (секунды)
+STATE_SAVE_INTERVAL = 0.5
+
+# Как часто процесс отмечает свои незавершенные задачи в общей папке (секунды)
+HEARTBEAT_INTERVAL = 5
+
+# Задача без отметки дольше этого времени считается прерванной (секунды)
+HEARTBEAT_TIMEOUT = 60
+
+# Ошибка задачи, процесс которой завершился, не закончив её
+ABANDONED_JOB_ERROR = 'Обработка прервана: рабочий процесс сервера был перезапущен. Загрузите файл еще раз'
+
+
+class JobQueueFull(Exception):
+    """Очередь задач переполнена"""
+
+
+class JobQueue:
+    """Пул потоков для задач обработки с отслеживанием прогресса по этапам"""
+
+    def __init__(self, workers=2, max_pending=20, ttl_seconds=3600):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.state_folder = None
+        self.heartbeat_pid = None
+
+    def share_state(self, folder):
+        """Сохраняет состояние задач в папку, общую для процессов веб-сервера
+
+        Запрос о задаче может прийти не в тот процесс, который её выполняет
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.state_folder = folder
+
+    def submit(self, function, *args, on_error=None, **kwargs):
+        """Ставит задачу в очередь и возвращает её id
+
+        function вызывается с именованным аргументом report(stage, done=None, total=None)
+        """
+        with self.lock:
+            self._cleanup()
+            pending = sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Слишком много файлов в обработке ({pending}), попробуйте позже")
+
+            self._start_heartbeat()
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'id': job_id,
+                'owner_pid': os.getpid(),
+                'status': 'queued',
+                'stage': None,
+                'stages': {stage: {'status': 'pending', 'progress': 0.0} for stage in JOB_STAGES},
+                'error': None,
+                'result': None,
+                'created_at': time.time(),
+                'finished_at': None,
+                'saved_at': 0.0
+            }
+            self._save(self.jobs[job_id])
+
+        self.executor.submit(self._run, job_id, function, args, kwargs, on_error)
+        return job_id
+
+    def _start_heartbeat(self):
+        """Запускает поток отметок задач в текущем процессе (вызывается под блокировкой)
+
+        Очередь создается в главном процессе gunicorn, а потоки при fork не
+        копируются, поэтому поток запускается в каждом рабочем процессе при первой задаче
+        """
+        if self.state_folder is None or self.heartbeat_pid == os.getpid():
+            return
+        self.heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        """Периодически сохраняет незавершенные задачи процесса - время сохранения служит отметкой"""
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self.lock:
+                for job in self.jobs.values():
+                    if job['status'] in ('queued', 'running'):
+                        self._save(job)
+
+    def _run(self, job_id, function, args, kwargs, on_error):
+        """Выполняет задачу в потоке пула"""
+        self._update(job_id, status='running')
+
+        def report(stage, done=None, total=None):
+            self._report(job_id, stage, done, total)
+
+        try:
+            result = function(*args, report=report, **kwargs)
+        except Exception as e:
+            if on_error:
+                on_error()
+            self._update(job_id, status='error', error=str(e), finished_at=time.time())
+            return
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                for stage in job['stages'].values():
+                    stage.update(status='done', progress=1.0)
+                job.update(status='done', stage=None, result=result, finished_at=time.time())
+                self._save(job, result=True)
+
+    def _report(self, job_id, stage, done, total):
+        """Отмечает текущий этап; предыдущие этапы считаются завершенными"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            for name in JOB_STAGES:
+                if name == stage:
+                    break
+                job['stages'][name].update(status='done', progress=1.0)
+
+            progress = min(done / total, 1.0) if total else 0.0
+            job['stages'][stage].update(status='running', progress=round(progress, 3))
+            changed = job['stage'] != stage
+            job['stage'] = stage
+            if changed or time.time() - job['saved_at'] >= STATE_SAVE_INTERVAL:
+                self._save(job)
+
+    def _update(self, job_id, **fields):
+        """Обновляет поля задачи"""
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+                self._save(self.jobs[job_id])
+
+    def _state_path(self, job_id, suffix='json'):
+        """Путь к файлу состояния задачи в общей папке"""
+        return os.path.join(self.state_folder, f'{job_id}.{suffix}')
+
+    def _write_state(self, path, value):
+        """Атомарно записывает JSON, чтобы другой процесс не прочитал файл наполовину"""
+        handle, temp_path = tempfile.mkstemp(dir=self.state_folder, suffix='.part')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as file:
+                json.dump(value, file, ensure_ascii=False, default=str)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _save(self, job, result=False):
+        """Сохраняет состояние задачи (и результат) в общую папку (вызывается под блокировкой)"""
+        if self.state_folder is None:
+            return
+        job['saved_at'] = time.time()
+        try:
+            if result:
+                # Результат записывается раньше состояния done - другой процесс не увидит done без результата
+                self._write_state(self._state_path(job['id'], 'result.json'), job['result'])
+            self._write_state(self._state_path(job['id']), {key: value for key, value in job.items() if key != 'result'})
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ Не удалось сохранить состояние задачи {job['id']}: {str(e)}")
+
+    def _load(self, job_id, suffix='json'):
+        """Читает состояние или результат задачи, выполняемой другим процессом"""
+        if self.state_folder is None or not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id, suffix), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _is_abandoned(self, job):
+        """Проверяет, что незавершенную задачу больше некому выполнять"""
+        if time.time() - job.get('saved_at', 0) > HEARTBEAT_TIMEOUT:
+            return True
+        pid = job.get('owner_pid')
+        if pid == os.getpid():
+            # Задачи этого процесса хранятся в памяти - на диске осталась задача прежнего процесса с тем же pid
+            return True
+        if pid and os.name == 'posix':
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except OSError:
+                pass
+        return False
+
+    def _load_status(self, job_id):
+        """Читает состояние задачи другого процесса; прерванную задачу отмечает ошибкой"""
+        job = self._load(job_id)
+        if job is None or job['status'] not in ('queued', 'running') or not self._is_abandoned(job):
+            return job
+        job.update(status='error', stage=None, error=ABANDONED_JOB_ERROR, finished_at=time.time())
+        try:
+            self._write_state(self._state_path(job_id), job)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ Не удалось сохранить состояние задачи {job_id}: {str(e)}")
+        print(f"⚠️ Задача {job_id} прервана: процесс {job.get('owner_pid')} ее не завершил")
+        return job
+
+    def _cleanup(self):
+        """Удаляет завершенные задачи старше ttl_seconds (вызывается под блокировкой)"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['finished_at'] and now - job['finished_at'] > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+        if self.state_folder is not None:
+            for name in os.listdir(self.state_folder):
+                path = os.path.join(self.state_folder, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl_seconds:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def get_status(self, job_id):
+        """Возвращает состояние задачи без результата или None, если задачи нет"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return self._describe(job)
+        job = self._load_status(job_id)
+        return self._describe(job) if job else None
+
+    def _describe(self, job):
+        """Состояние задачи для ответа: этапы, общий прогресс, время выполнения"""
+        stages = {name: dict(stage) for name, stage in job['stages'].items()}
+        progress = sum(stage['progress'] for stage in stages.values()) / len(stages)
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'stage_label': JOB_STAGES.get(job['stage']),
+            'stages': stages,
+            'progress': round(progress, 3),
+            'error': job['error'],
+            'elapsed': round((job['finished_at'] or time.time()) - job['created_at'], 3)
+        }
+
+    def get_result(self, job_id):
+        """Возвращает результат задачи (None, если она еще не завершилась)"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return job['result']
+        return self._load(job_id, 'result.json')
+
+    def get_stats(self):
+        """Возвращает количество задач по состояниям"""
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Метрики производительности в формате Prometheus
+Счетчики, значения и гистограммы задержек хранятся в памяти процесса и
+выводятся текстом для /metrics. Без внешних зависимостей. Каждая серия несет
+метку pid: при запуске через serve.py у рабочих процессов свои значения, и
+запрос /metrics попадает в случайный процесс. Серии разных процессов не
+смешиваются, а общие значения считаются в Prometheus, например
+sum without(pid) (rate(analyzer_rows_processed_total[5m]))
+"""
+
+import os
+import threading
+import time
+
+# Память процесса доступна через resource только в Linux и macOS
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Границы корзин гистограмм задержек (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def escape_label(value):
+    """Экранирует значение метки по правилам текстового формата Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    """Записывает метки в виде {name="value",...}"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+def format_number(value):
+    """Число в текстовом формате Prometheus"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Общая часть метрик: имя, описание, значения по наборам меток"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        """Набор меток в фиксированном порядке"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+    def render(self, extra_labels=()):
+        """Строки метрики; extra_labels добавляются к каждой серии (метка pid)"""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            # Копия, чтобы значения не менялись во время вывода
+            items = sorted(
+                (labels, dict(value, counts=list(value['counts'])) if isinstance(value, dict) else value)
+                for labels, value in self.values.items()
+            )
+        for labels, value in items:
+            lines.extend(self.render_value(tuple(extra_labels) + labels, value))
+        return lines
+
+    def render_value(self, labels, value):
+        return [f'{self.name}{format_labels(labels)} {format_number(value)}']
+
+
+class Counter(Metric):
+    """Растущий счетчик (запросы, строки, байты)"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Переносит растущий итог, который ведет другой объект процесса (счетчики кэша и загрузок)"""
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Gauge(Metric):
+    """Текущее значение (память, доля попаданий в кэш)"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Гистограмма значений по корзинам: для задержек и их квантилей в Prometheus"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][position] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def render_value(self, labels, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['counts']):
+            cumulative += count
+            bucket_labels = labels + (('le', format_number(float(bound))),)
+            lines.append(f'{self.name}_bucket{format_labels(bucket_labels)} {cumulative}')
+        lines.append(f'{self.name}_sum{format_labels(labels)} {format_number(state["sum"])}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {state["count"]}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса и функций, обновляющих значения перед выводом"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def register(self, metric_class, name, description, labelnames=(), **kwargs):
+        """Возвращает метрику с этим именем, создавая её при первом обращении"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, description, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self.register(Counter, name, description, labelnames)
+
+    def gauge(self, name, description, labelnames=()):
+        return self.register(Gauge, name, description, labelnames)
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram, name, description, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        """collector() вызывается перед каждым выводом (например, переносит счетчики кэша в метрики)"""
+        with self.lock:
+            self.collectors.append(collector)
+
+    def reset(self):
+        """Обнуляет значения всех метрик (в новом процессе после fork)"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus, каждая серия с меткой pid процесса"""
+        with self.lock:
+            collectors = list(self.collectors)
+            metrics = list(self.metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ Ошибка сбора метрик: {str(e)}")
+        extra_labels = (('pid', os.getpid()),)
+        lines = []
+        for metric in sorted(metrics, key=lambda metric: metric.name):
+            lines.extend(metric.render(extra_labels))
+        return '\n'.join(lines) + '\n'
+
+
+# Метрики процесса (модули регистрируют свои метрики здесь же)
+REGISTRY = Registry()
+
+PROCESS_PEAK_MEMORY = REGISTRY.gauge(
+    'process_peak_resident_memory_bytes', 'Наибольший объем памяти процесса с момента запуска'
+)
+PROCESS_MEMORY = REGISTRY.gauge('process_resident_memory_bytes', 'Текущий объем памяти процесса')
+PROCESS_START = REGISTRY.gauge('process_start_time_seconds', 'Время запуска процесса (unix time)')
+
+# Рабочие процессы gunicorn создаются копированием главного - время запуска отмечаем
+# заново, а значения главного процесса не переносим в серии с новым pid
+process_started_at = time.time()
+
+
+def reset_after_fork():
+    global process_started_at
+    process_started_at = time.time()
+    REGISTRY.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def peak_memory_bytes():
+    """Пиковый объем памяти процесса (None, если недоступен)"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def current_memory_bytes():
+    """Текущий объем памяти процесса по /proc (None, если недоступен)"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def collect_process_metrics():
+    """Обновляет метрики памяти и время запуска процесса"""
+    PROCESS_START.set(process_started_at)
+    peak = peak_memory_bytes()
+    if peak is not None:
+        PROCESS_PEAK_MEMORY.set(peak)
+    current = current_memory_bytes()
+    if current is not None:
+        PROCESS_MEMORY.set(current)
+
+
+REGISTRY.add_collector(collect_process_metrics)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Извлечение таблиц со всех страниц PDF файла
+Страницы обрабатываются параллельно в пуле процессов (pdfplumber нагружает CPU
+и держит GIL), таблицы-продолжения на соседних страницах склеиваются
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+# PDF с меньшим числом страниц обрабатываем в текущем процессе
+PARALLEL_MIN_PAGES = 8
+
+# Сколько страниц отдавать одному процессу за раз
+PAGES_PER_TASK = 4
+
+# Доля высоты страницы у верхнего и нижнего края: таблица, которая начинается (заканчивается)
+# в этой полосе, считается прижатой к краю - между ней и краем только колонтитулы
+PAGE_EDGE_MARGIN = 0.2
+
+# Модули, которые сервер forkserver загружает один раз для всех процессов пулов
+POOL_PRELOAD_MODULES = ['pipeline', 'pdfplumber']
+
+
+def get_pool_context():
+    """Способ запуска процессов пула: forkserver (Linux, macOS) или spawn (Windows)
+
+    Пулы создаются из многопоточных процессов (потоки Flask и gunicorn gthread,
+    очередь задач, пул HTTP соединений). Копия такого процесса через fork может
+    унаследовать блокировку, захваченную другим потоком, и зависнуть, поэтому
+    процессы пула запускаются с чистого интерпретатора
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Действует до первого запуска сервера; отсутствующие модули пропускаются
+        context.set_forkserver_preload(POOL_PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def clean_table(table):
+    """Убирает из таблицы пустые строки"""
+    return [row for row in table if any(cell is not None and str(cell).strip() for cell in row)]
+
+
+def extract_page_tables(filepath, page_numbers, on_page=None):
+    """Извлекает таблицы с указанных страниц (номера с нуля)"""
+    # pdfplumber загружается при первом разборе PDF, а не при запуске приложения
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(filepath) as pdf:
+        for page_number in page_numbers:
+            page = pdf.pages[page_number]
+            tables = []
+            for found in page.find_tables():
+                rows = clean_table(found.extract())
+                if rows:
+                    _, top, _, bottom = found.bbox
+                    tables.append({
+                        'rows': rows,
+                        'at_top': top <= page.height * PAGE_EDGE_MARGIN,
+                        'at_bottom': bottom >= page.height * (1 - PAGE_EDGE_MARGIN)
+                    })
+            results.append((page_number, tables))
+            # Освобождаем разобранные объекты страницы, чтобы память не росла с числом страниц
+            page.flush_cache()
+            if on_page:
+                on_page(len(results))
+    return results
+
+
+def count_pages(filepath):
+    """Возвращает количество страниц PDF"""
+    import pdfplumber
+
+    with pdfplumber.open(filepath) as pdf:
+        return len(pdf.pages)
+
+
+def normalize_header(row):
+    """Приводит строку заголовка к виду для сравнения"""
+    return tuple(str(cell).strip() if cell is not None else '' for cell in row)
+
+
+def cell_kind(cell):
+    """Вид значения ячейки для сравнения строк: пусто, число или текст"""
+    text = str(cell).strip() if cell is not None else ''
+    if not text:
+        return 'empty'
+    try:
+        float(text.replace(' ', '').replace(',', '.'))
+        return 'number'
+    except ValueError:
+        return 'text'
+
+
+def looks_like_data(row, sample_row):
+    """Строка похожа на строку данных sample_row: виды непустых ячеек совпадают
+
+    Строка заголовка другой таблицы той же ширины состоит из текста там, где в данных числа
+    """
+    return all(
+        kind == sample_kind or 'empty' in (kind, sample_kind)
+        for kind, sample_kind in zip(map(cell_kind, row), map(cell_kind, sample_row))
+    )
+
+
+def stitch_tables(page_tables):
+    """Склеивает таблицы-продолжения на следующих страницах
+
+    Продолжением считается таблица с тем же заголовком или таблица без заголовка:
+    предыдущая таблица доходит до низа своей страницы, новая начинается вверху
+    следующей, у нее та же ширина, а первая строка похожа на строки данных предыдущей
+    """
+    stitched = []
+    previous_page = None
+    for page_number, tables in page_tables:
+        for index, table in enumerate(tables):
+            rows = table['rows']
+            if stitched:
+                last = stitched[-1]
+                same_header = normalize_header(rows[0]) == last['header']
+                continues = (
+                    index == 0
+                    and table['at_top']
+                    and last['at_bottom']
+                    and previous_page == page_number - 1
+                    and last['last_page'] == previous_page
+                    and len(rows[0]) == len(last['header'])
+                    and bool(last['rows'])
+                    and looks_like_data(rows[0], last['rows'][-1])
+                )
+                if same_header:
+                    last['rows'].extend(rows[1:])
+                    last.update(last_page=page_number, at_bottom=table['at_bottom'])
+                    continue
+                if continues:
+                    last['rows'].extend(rows)
+                    last.update(last_page=page_number, at_bottom=table['at_bottom'])
+                    continue
+
+            stitched.append({
+                'header': normalize_header(rows[0]),
+                'header_row': rows[0],
+                'rows': list(rows[1:]),
+                'first_page': page_number,
+                'last_page': page_number,
+                'at_bottom': table['at_bottom']
+            })
+        if tables:
+            previous_page = page_number
+    return stitched
+
+
+def table_to_dataframe(header_row, rows):
+    """Создает DataFrame из строки заголовка и строк таблицы"""
+    headers = [str(cell).strip() if cell is not None else f'Column_{i}' for i, cell in enumerate(header_row)]
+
+    data_rows = []
+    for row in rows:
+        # Дополняем строку до длины заголовков и обрезаем, если она длиннее
+        row = list(row)[:len(headers)] + [None] * max(len(headers) - len(row), 0)
+        data_rows.append([str(cell).strip() if cell is not None else '' for cell in row])
+
+    df = pd.DataFrame(data_rows, columns=pd.Index(headers))
+
+    # Удаляем столбцы с пустыми заголовками
+    df = df.loc[:, df.columns.map(lambda x: str(x).strip() != '')]
+
+    # Удаляем полностью пустые строки и столбцы
+    df = df.dropna(how='all')
+    df = df.dropna(axis=1, how='all')
+    return df
+
+
+def extract_pdf_tables(filepath, first_page=None, last_page=None, workers=None, progress=None):
+    """Извлекает и склеивает таблицы со страниц first_page..last_page (номера с единицы)"""
+    total_pages = count_pages(filepath)
+    if total_pages == 0:
+        raise Exception("PDF файл не содержит страниц")
+
+    start = max((first_page or 1) - 1, 0)
+    stop = min(last_page or total_pages, total_pages)
+    page_numbers = list(range(start, stop))
+    if not page_numbers:
+        raise Exception(f"В PDF нет страниц в диапазоне {first_page}-{last_page}")
+
+    page_tables = []
+    if len(page_numbers) < PARALLEL_MIN_PAGES or workers == 1:
+        on_page = (lambda done: progress(done, len(page_numbers))) if progress else None
+        page_tables = extract_page_tables(filepath, page_numbers, on_page)
+    else:
+        batches = [page_numbers[i:i + PAGES_PER_TASK] for i in range(0, len(page_numbers), PAGES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=get_pool_context()) as executor:
+            futures = [executor.submit(extract_page_tables, filepath, batch) for batch in batches]
+            for future in as_completed(futures):
+                page_tables.extend(future.result())
+                if progress:
+                    progress(len(page_tables), len(page_numbers))
+
+    page_tables.sort(key=lambda item: item[0])
+    return stitch_tables(page_tables), len(page_numbers)
+
+
+def extract_pdf_table(filepath, first_page=None, last_page=None, workers=None, progress=None):
+    """Извлекает самую большую (после склейки) таблицу из PDF файла"""
+    try:
+        tables, pages = extract_pdf_tables(filepath, first_page, last_page, workers, progress)
+        tables = [table for table in tables if table['rows']]
+        if not tables:
+            raise Exception("В PDF не найдено таблиц с заголовком и хотя бы одной строкой данных")
+
+        table = max(tables, key=lambda item: len(item['rows']))
+        df = table_to_dataframe(table['header_row'], table['rows'])
+        if df.empty:
+            raise Exception("После очистки таблица стала пустой")
+
+        df.attrs['pdf_extraction'] = {
+            'pages_processed': pages,
+            'tables_found': len(tables),
+            'table_pages': [table['first_page'] + 1, table['last_page'] + 1]
+        }
+        return df
+
+    except Exception as e:
+        raise Exception(f"Ошибка при извлечении таблицы из PDF: {str(e)}")
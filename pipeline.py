@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Конвейер анализа файла без веб-приложения
+Чтение файла, определение типов, статистика и диаграммы. Используется
+веб-приложением, пакетной обработкой и консольным анализатором; не импортирует
+Flask и AI модуль, параметры передаются аргументами
+"""
+
+import json
+import math
+import os
+import time
+
+import pandas as pd
+
+from charts import ChartAggregator, build_line_chart
+from csv_sniffer import sniff_csv, csv_read_options
+from excel_reader import read_excel
+from pdf_extract import extract_pdf_table
+from profiling import APPROX_MIN_ROWS, profile_frame
+from streaming import build_streaming_charts, stream_csv
+from table_query import format_dates
+from type_inference import infer_column_types, normalize_dtypes
+from upload_store import get_view_path, options_key, write_atomically
+
+# Колоночные снимки файлов требуют pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    SNAPSHOT_AVAILABLE = True
+except ImportError:
+    SNAPSHOT_AVAILABLE = False
+
+# Ключ метаданных схемы Arrow с параметрами чтения и df.attrs снимка
+SNAPSHOT_METADATA_KEY = 'csv_analysis'
+
+# Разрешенные расширения файлов
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'pdf'}
+
+# Строк в выборке для определения типов
+TYPE_INFERENCE_SAMPLE_SIZE = 1000
+
+# CSV больше этого размера читаем по частям
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+# Параметры конвейера по умолчанию (те же ключи, что и в app.config)
+DEFAULT_SETTINGS = {
+    'PDF_WORKERS': None,
+    'STREAMING_THRESHOLD_BYTES': STREAMING_THRESHOLD_BYTES,
+    'TYPE_INFERENCE_SAMPLE_SIZE': TYPE_INFERENCE_SAMPLE_SIZE,
+    'PROFILE_EXACT': False,
+    'PROFILE_APPROX_MIN_ROWS': APPROX_MIN_ROWS
+}
+
+
+def allowed_file(filename):
+    """Проверяет, является ли файл разрешенным"""
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def get_snapshot_path(filepath, options=None):
+    """Возвращает путь к колоночному снимку файла с этими параметрами чтения"""
+    return get_view_path(filepath, options) + '.feather'
+
+
+def write_snapshot(filepath, df, options=None):
+    """Сохраняет разобранный DataFrame рядом с файлом в формате Feather (Arrow)
+
+    В метаданные схемы Arrow записываются параметры чтения, с которыми получена
+    таблица, и df.attrs (параметры CSV, сведения о разборе PDF, лист книги) -
+    Feather сам их не сохраняет
+    """
+    if not SNAPSHOT_AVAILABLE:
+        return False
+
+    try:
+        # Feather требует строковые уникальные названия столбцов
+        columns = [col for col in df.columns if isinstance(col, str)]
+        if len(columns) != len(df.columns) or len(set(columns)) != len(columns):
+            return False
+
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        saved = json.dumps({'options': options or {}, 'attrs': df.attrs}, ensure_ascii=False, default=str)
+        metadata = dict(table.schema.metadata or {}, **{SNAPSHOT_METADATA_KEY: saved.encode('utf-8')})
+        table = table.replace_schema_metadata(metadata)
+        # Без сжатия, чтобы снимок можно было читать через memory map
+        write_atomically(
+            get_snapshot_path(filepath, options),
+            lambda path: feather.write_feather(table, path, compression='uncompressed'),
+            mode=None
+        )
+        return True
+    except Exception:
+        # Например, столбцы со смешанными типами значений - работаем без снимка
+        return False
+
+
+def read_snapshot(filepath, options=None, columns=None):
+    """Читает колоночный снимок, если он новее исходного файла и получен с теми же параметрами чтения"""
+    if not SNAPSHOT_AVAILABLE:
+        return None
+
+    snapshot_path = get_snapshot_path(filepath, options)
+    try:
+        if os.path.getmtime(snapshot_path) < os.path.getmtime(filepath):
+            return None
+        table = feather.read_table(snapshot_path, columns=columns, memory_map=True)
+        saved = json.loads((table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY.encode('utf-8'), b'null'))
+        # Снимок другого листа или диапазона страниц (или без метаданных) не подходит
+        if not saved or saved.get('options') != (options or {}):
+            return None
+        df = table.to_pandas()
+        df.attrs.update(saved.get('attrs') or {})
+        return df
+    except Exception:
+        return None
+
+
+def get_read_options_path(filepath, key):
+    """Возвращает путь к файлу с параметрами чтения по их ключу"""
+    return f'{filepath}.{key}.options.json'
+
+
+def save_read_options(filepath, options):
+    """Сохраняет параметры чтения (лист, диапазон страниц PDF) под их ключом, возвращает ключ
+
+    Файл параметров с данным ключом всегда одинаковый, поэтому запись не мешает
+    другим пользователям того же файла
+    """
+    key = options_key(options)
+    if key and not os.path.exists(get_read_options_path(filepath, key)):
+        write_atomically(
+            get_read_options_path(filepath, key),
+            lambda file: json.dump(options, file, ensure_ascii=False)
+        )
+    return key
+
+
+def load_read_options(filepath, key):
+    """Загружает параметры чтения по ключу из имени представления (None - ключ неизвестен)"""
+    if not key:
+        return {}
+    try:
+        with open(get_read_options_path(filepath, key), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def parse_read_options(form):
+    """Извлекает параметры чтения из полей формы загрузки"""
+    options = {}
+    for field in ['pdf_first_page', 'pdf_last_page']:
+        value = form.get(field, '').strip()
+        if value:
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f'Некорректное значение {field}: {value}')
+            options[field] = int(value)
+
+    sheet = form.get('sheet', '').strip()
+    if sheet:
+        options['sheet'] = sheet
+    return options
+
+
+def read_file(filepath, progress=None, options=None, pdf_workers=None):
+    """Читает файл в зависимости от его типа
+
+    options - параметры чтения (лист, страницы PDF)
+    """
+    file_extension = filepath.rsplit('.', 1)[1].lower()
+    options = options or {}
+
+    # Если есть свежий снимок с теми же параметрами чтения, разбирать исходный файл не нужно
+    df = read_snapshot(filepath, options)
+    if df is not None:
+        return df
+
+    try:
+        if file_extension in ['xlsx', 'xls']:
+            # Формат определяется по содержимому файла, поэтому файл разбирается один раз
+            return read_excel(filepath, sheet=options.get('sheet'))
+                
+        elif file_extension == 'csv':
+            # Параметры файла определяем по его началу, затем читаем файл один раз
+            dialect = sniff_csv(filepath)
+            try:
+                df = pd.read_csv(filepath, low_memory=False, **csv_read_options(dialect))
+            except UnicodeDecodeError:
+                # Недопустимые байты встретились дальше проверенного префикса
+                dialect['encoding'] = 'cp1251' if dialect['encoding'] == 'utf-8' else 'latin-1'
+                df = pd.read_csv(filepath, low_memory=False, **csv_read_options(dialect))
+        
+            df.attrs['csv_dialect'] = dialect
+            return df
+    
+        elif file_extension == 'pdf':
+            return extract_pdf_table(
+                filepath,
+                first_page=options.get('pdf_first_page'),
+                last_page=options.get('pdf_last_page'),
+                workers=pdf_workers,
+                progress=progress
+            )
+    
+        raise ValueError(f"Неподдерживаемый тип файла: {file_extension}")
+    
+    except Exception as e:
+        raise Exception(f"Ошибка при чтении файла {filepath}: {str(e)}")
+
+
+def detect_data_types(df, type_info=None, sample_size=TYPE_INFERENCE_SAMPLE_SIZE):
+    """Автоматически определяет типы данных в столбцах"""
+    if type_info is None:
+        type_info = infer_column_types(df, sample_size=sample_size)
+    return {column: info['type'] for column, info in type_info.items()}
+
+
+def generate_charts_data(df, data_types, selected_category=None, time_bucket=None, aggregator=None, metric='sum'):
+    """Генерирует данные для диаграмм на основе типов данных"""
+    numeric_columns = [col for col, dtype in data_types.items() if dtype == 'numeric']
+
+    # Bar chart: категория + числовое значение (группировки переиспользуются между вызовами)
+    if aggregator is None:
+        aggregator = ChartAggregator(df, data_types)
+    charts = aggregator.bar_charts(selected_category, metric)
+
+    # Line chart: дата + числовое значение
+    datetime_columns = [col for col, dtype in data_types.items() if dtype == 'datetime']
+    if datetime_columns and numeric_columns:
+        for date_col in datetime_columns[:1]:  # Берем первый столбец с датами
+            for num_col in numeric_columns[:1]:  # Берем первый числовой столбец
+                if date_col != num_col:
+                    # Используем только два нужных столбца, без копии всей таблицы
+                    charts.append(build_line_chart(df[date_col], df[num_col], date_col, num_col, time_bucket))
+                    break
+
+    return charts
+
+
+def calculate_basic_stats(df, data_types, exact=False, approx_min_rows=APPROX_MIN_ROWS):
+    """Вычисляет базовую статистику по данным: квантили, гистограммы, частые значения"""
+    return profile_frame(df, data_types, exact=exact, approx_min_rows=approx_min_rows)
+
+
+def is_streaming_file(filepath, threshold=STREAMING_THRESHOLD_BYTES):
+    """Проверяет, нужно ли читать файл по частям"""
+    return filepath.rsplit('.', 1)[1].lower() == 'csv' and \
+           os.path.getsize(filepath) > threshold
+
+
+def stream_file(filepath, progress=None, sample_size=TYPE_INFERENCE_SAMPLE_SIZE):
+    """Читает большой CSV файл по частям, не загружая его в память целиком"""
+    dialect = sniff_csv(filepath)
+
+    def detect_types(df):
+        return detect_data_types(df, sample_size=sample_size)
+
+    try:
+        summary = stream_csv(filepath, dialect, detect_types, progress=progress)
+    except UnicodeDecodeError:
+        # Недопустимые байты встретились дальше проверенного префикса
+        dialect['encoding'] = 'cp1251' if dialect['encoding'] == 'utf-8' else 'latin-1'
+        summary = stream_csv(filepath, dialect, detect_types, progress=progress)
+
+    summary['dialect'] = dialect
+    return summary
+
+
+def frame_to_records(df):
+    """Преобразует строки таблицы в список словарей для JSON"""
+    columns = {}
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # Даты без времени показываем без нулевого времени
+            series = format_dates(series)
+        columns[position] = series.astype(object)
+
+    page = pd.DataFrame(columns, index=df.index)
+    page.columns = df.columns
+    return page.fillna('').to_dict('records')
+
+
+def json_safe(value):
+    """Заменяет NaN и бесконечности на None, чтобы результат был корректным JSON"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def analyze_file(filepath, options=None, settings=None, preview_rows=0, progress=None):
+    """Полный анализ локального файла: типы, статистика и диаграммы
+
+    settings - параметры конвейера (см. DEFAULT_SETTINGS), preview_rows - сколько
+    первых строк включить в результат, progress(stage) - начало этапа.
+    Возвращает словарь результата; ошибки чтения пробрасываются
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    report = progress or (lambda stage: None)
+    started = time.perf_counter()
+    sample_size = settings['TYPE_INFERENCE_SAMPLE_SIZE']
+
+    report('parse')
+    streaming = is_streaming_file(filepath, settings['STREAMING_THRESHOLD_BYTES'])
+    if streaming:
+        # Большой CSV: статистика и группировки накапливаются по частям
+        summary = stream_file(filepath, sample_size=sample_size)
+        df = summary['preview']
+        data_types = summary['data_types']
+        total_rows = summary['total_rows']
+        report('stats')
+        stats = summary['stats']
+        report('charts')
+        charts = build_streaming_charts(summary)
+        details = {'csv_dialect': summary['dialect']}
+    else:
+        df = read_file(filepath, options=options or {}, pdf_workers=settings['PDF_WORKERS'])
+        details = {key: df.attrs[key] for key in ('csv_dialect', 'pdf_extraction', 'excel_sheet') if key in df.attrs}
+        report('infer')
+        type_info = infer_column_types(df, sample_size=sample_size)
+        df = normalize_dtypes(df, type_info)
+        data_types = detect_data_types(df, type_info)
+        total_rows = len(df)
+        report('stats')
+        stats = calculate_basic_stats(
+            df, data_types,
+            exact=settings['PROFILE_EXACT'],
+            approx_min_rows=settings['PROFILE_APPROX_MIN_ROWS']
+        )
+        report('charts')
+        charts = generate_charts_data(df, data_types)
+
+    result = {
+        'file': filepath,
+        'format': filepath.rsplit('.', 1)[1].lower(),
+        'size_bytes': os.path.getsize(filepath),
+        'total_rows': total_rows,
+        'streaming': streaming,
+        'columns': [str(column) for column in df.columns],
+        'data_types': {str(column): dtype for column, dtype in data_types.items()},
+        'stats': {str(column): value for column, value in stats.items()},
+        'charts': charts,
+        'seconds': round(time.perf_counter() - started, 4)
+    }
+    result.update(details)
+    if preview_rows:
+        result['data'] = frame_to_records(df.head(preview_rows))
+    return result
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Профилирование столбцов таблицы
+Числовые столбцы обрабатываются блоками одной матрицей numpy: количество, сумма,
+среднее, стандартное отклонение, квантили и гистограммы считаются сразу для всех
+столбцов блока. Для высоких таблиц квантили и число уникальных значений
+оцениваются по выборке и HyperLogLog; exact=True включает точный расчет
+"""
+
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Квантили в профиле столбца и их подписи
+QUANTILES = {'25%': 0.25, '50%': 0.5, '75%': 0.75}
+
+# Число интервалов гистограммы
+HISTOGRAM_BINS = 10
+
+# Сколько самых частых значений возвращать
+TOP_K = 5
+
+# Начиная с какого числа строк использовать приближенные оценки. До ~500 000 строк
+# точный расчет не медленнее приближенного (HyperLogLog проходит по всем значениям),
+# порог взят с запасом по замеру `python benchmark.py threshold`
+APPROX_MIN_ROWS = 1_000_000
+
+# Размер выборки для приближенных квантилей и частых значений
+SAMPLE_SIZE = 100_000
+
+# Точность HyperLogLog: 2^14 регистров, относительная ошибка около 0.8%
+HLL_PRECISION = 14
+
+# Максимум ячеек в одном блоке числовых столбцов (float64), чтобы ограничить память
+BLOCK_CELLS = 8_000_000
+
+
+class HyperLogLog:
+    """Приближенный подсчет уникальных значений с памятью 2^precision байт"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+
+    def update(self, series):
+        """Добавляет значения столбца (пропуски не учитываются)"""
+        present = series.notna().to_numpy()
+        if not present.any():
+            return
+        # categorize=False: не строим таблицу уникальных значений, ради этого и нужен HLL
+        hashes = pd.util.hash_pandas_object(series, index=False, categorize=False).to_numpy()[present]
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes << np.uint64(self.precision)
+
+        # Номер первой единицы в оставшихся битах
+        # Для rest == 0 логарифм не определен, такие значения заменяет np.where ниже
+        with np.errstate(divide='ignore', invalid='ignore'):
+            leading = 63 - np.floor(np.log2(rest.astype(np.float64))).astype(np.int64)
+        rank = np.where(rest == 0, 64 - self.precision + 1, leading + 1)
+
+        maxima = pd.Series(rank).groupby(index).max()
+        current = self.registers[maxima.index.to_numpy()]
+        self.registers[maxima.index.to_numpy()] = np.maximum(current, maxima.to_numpy()).astype(np.uint8)
+
+    def merge(self, other):
+        """Объединяет с другим счетчиком той же точности"""
+        self.registers = np.maximum(self.registers, other.registers)
+
+    def estimate(self):
+        """Возвращает оценку количества уникальных значений"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.size and zeros:
+            # Для малых количеств точнее линейный подсчет
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+class SampleSketch:
+    """Равномерная выборка фиксированного размера из потока значений
+
+    Каждому значению назначается случайный ключ, хранятся значения с наименьшими ключами,
+    поэтому выборки частей файла можно объединять
+    """
+
+    def __init__(self, size=SAMPLE_SIZE, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.array([], dtype=np.float64)
+        self.values = np.array([], dtype=np.float64)
+
+    def update(self, values):
+        """Добавляет числовые значения без пропусков"""
+        if len(values) == 0:
+            return
+        keys = np.concatenate([self.keys, self.rng.random(len(values))])
+        values = np.concatenate([self.values, np.asarray(values, dtype=np.float64)])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.values = keys, values
+
+
+def to_python(value):
+    """Приводит значение numpy к обычному типу Python для JSON"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def histogram(values, minimum, maximum, bins=HISTOGRAM_BINS, scale=1.0):
+    """Гистограмма значений одного столбца с равными интервалами от minimum до maximum"""
+    if len(values) == 0 or minimum is None or maximum is None:
+        return {'edges': [], 'counts': []}
+    if minimum == maximum:
+        return {'edges': [float(minimum), float(maximum)], 'counts': [int(round(len(values) * scale))]}
+    counts, edges = np.histogram(values, bins=bins, range=(minimum, maximum))
+    return {'edges': [float(edge) for edge in edges], 'counts': [int(round(count * scale)) for count in counts]}
+
+
+def numeric_profile(count, rows, total, minimum, maximum, std, quantiles, hist, approximate):
+    """Профиль числового столбца (поля calculate_basic_stats + распределение)"""
+    return {
+        'type': 'numeric',
+        'sum': total,
+        'mean': total / count if count else float('nan'),
+        'min': minimum if count else float('nan'),
+        'max': maximum if count else float('nan'),
+        'count': count,
+        'std': to_python(std),
+        'null_ratio': round(1 - count / rows, 4) if rows else 0.0,
+        'quantiles': {label: to_python(value) for label, value in quantiles.items()},
+        'histogram': hist,
+        'approximate': approximate
+    }
+
+
+def block_histograms(values, minimum, maximum, bins):
+    """Гистограммы всех столбцов блока одним bincount"""
+    rows, width = values.shape
+    span = np.where(maximum > minimum, maximum - minimum, 1.0)
+    with np.errstate(invalid='ignore'):
+        positions = np.floor((values - minimum) / span * bins)
+    valid = ~np.isnan(positions)
+    positions = np.clip(positions, 0, bins - 1)
+    flat = (positions + np.arange(width) * bins)[valid].astype(np.int64)
+    return np.bincount(flat, minlength=width * bins).reshape(width, bins)
+
+
+def profile_numeric_block(df, columns, exact, approx_min_rows, bins, rng):
+    """Профили блока числовых столбцов одной матрицей"""
+    rows = len(df)
+    values = np.column_stack([df[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in columns])
+    approximate = not exact and rows > approx_min_rows
+
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # Полностью пустые столбцы дают предупреждения "All-NaN slice" - для них вернется NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        counts = np.count_nonzero(~np.isnan(values), axis=0)
+        sums = np.nansum(values, axis=0)
+        minimums = np.nanmin(values, axis=0)
+        maximums = np.nanmax(values, axis=0)
+        means = sums / counts
+        stds = np.sqrt(np.nansum((values - means) ** 2, axis=0) / (counts - 1))
+
+        # Квантили требуют сортировки - для высоких таблиц считаем их по выборке строк
+        sample = values[rng.integers(0, rows, SAMPLE_SIZE)] if approximate else values
+        quantiles = np.nanquantile(sample, list(QUANTILES.values()), axis=0)
+
+    hists = block_histograms(values, minimums, maximums, bins)
+
+    profiles = {}
+    for position, column in enumerate(columns):
+        count = int(counts[position])
+        minimum, maximum = float(minimums[position]), float(maximums[position])
+        if count == 0:
+            hist = {'edges': [], 'counts': []}
+        elif minimum == maximum:
+            hist = {'edges': [minimum, maximum], 'counts': [count]}
+        else:
+            hist = {
+                'edges': [float(edge) for edge in np.linspace(minimum, maximum, bins + 1)],
+                'counts': [int(value) for value in hists[position]]
+            }
+        profiles[column] = numeric_profile(
+            count, rows, float(sums[position]), minimum, maximum, stds[position] if count > 1 else float('nan'),
+            dict(zip(QUANTILES, quantiles[:, position])), hist, approximate
+        )
+    return profiles
+
+
+def value_profile(dtype, rows, count, unique_count, top, approximate):
+    """Профиль категориального или текстового столбца (поля calculate_basic_stats + частоты)"""
+    return {
+        'type': dtype,
+        'unique_count': unique_count,
+        'total_count': count,
+        'most_common': top[0]['value'] if top else None,
+        'null_ratio': round(1 - count / rows, 4) if rows else 0.0,
+        'top_values': top,
+        'approximate': approximate
+    }
+
+
+def profile_values(series, dtype, exact, approx_min_rows, top_k, rng):
+    """Профиль категориального или текстового столбца за один проход подсчета частот"""
+    rows = len(series)
+    count = int(series.count())
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Для категорий частоты считаются по кодам без хеширования значений
+        codes = series.cat.codes.to_numpy()
+        frequencies = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        order = np.argsort(-frequencies, kind='stable')[:top_k]
+        top = [
+            {'value': to_python(series.cat.categories[index]), 'count': int(frequencies[index])}
+            for index in order if frequencies[index] > 0
+        ]
+        return value_profile(dtype, rows, count, int(np.count_nonzero(frequencies)), top, False)
+
+    if exact or rows <= approx_min_rows:
+        # Одна таблица частот дает и число уникальных значений, и самые частые
+        frequencies = series.value_counts(dropna=True)
+        top = [{'value': to_python(value), 'count': int(number)} for value, number in frequencies.head(top_k).items()]
+        return value_profile(dtype, rows, count, int(len(frequencies)), top, False)
+
+    # Высокий столбец: уникальные значения - HyperLogLog, частые значения - по выборке
+    sketch = HyperLogLog()
+    sketch.update(series)
+    sample = series.iloc[rng.integers(0, rows, SAMPLE_SIZE)]
+    scale = rows / SAMPLE_SIZE
+    top = [
+        {'value': to_python(value), 'count': int(round(number * scale))}
+        for value, number in sample.value_counts(dropna=True).head(top_k).items()
+    ]
+    return value_profile(dtype, rows, count, sketch.estimate(), top, True)
+
+
+def profile_datetime(series):
+    """Профиль столбца дат"""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, errors='coerce')
+    count = int(series.count())
+    return {
+        'type': 'datetime',
+        'min_date': str(series.min()),
+        'max_date': str(series.max()),
+        'count': count,
+        'null_ratio': round(1 - count / len(series), 4) if len(series) else 0.0
+    }
+
+
+def profile_frame(df, data_types, exact=False, approx_min_rows=APPROX_MIN_ROWS,
+                  bins=HISTOGRAM_BINS, top_k=TOP_K, seed=0):
+    """Профили всех столбцов таблицы в формате calculate_basic_stats"""
+    rng = np.random.default_rng(seed)
+    profiles = {}
+
+    numeric_columns = [column for column in df.columns if data_types.get(column, 'text') == 'numeric']
+    block_size = max(1, BLOCK_CELLS // max(len(df), 1))
+    for start in range(0, len(numeric_columns), block_size):
+        block = numeric_columns[start:start + block_size]
+        try:
+            profiles.update(profile_numeric_block(df, block, exact, approx_min_rows, bins, rng))
+        except (TypeError, ValueError):
+            # В блоке есть нечисловые значения - считаем столбцы по одному, чтобы ошибка касалась только их
+            for column in block:
+                try:
+                    profiles.update(profile_numeric_block(df, [column], exact, approx_min_rows, bins, rng))
+                except (TypeError, ValueError) as e:
+                    profiles[column] = {'type': 'error', 'error': str(e), 'count': int(df[column].count())}
+
+    for column in df.columns:
+        if column in profiles:
+            continue
+        dtype = data_types.get(column, 'text')
+        try:
+            if dtype == 'datetime':
+                profiles[column] = profile_datetime(df[column])
+            else:
+                profiles[column] = profile_values(df[column], dtype, exact, approx_min_rows, top_k, rng)
+        except Exception as e:
+            # Устанавливаем базовую статистику в случае ошибки
+            profiles[column] = {
+                'type': 'error',
+                'error': str(e),
+                'count': int(df[column].count()) if len(df) > 0 else 0
+            }
+
+    # Порядок столбцов как в таблице
+    return {column: profiles[column] for column in df.columns}
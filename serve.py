@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Запуск веб-приложения в рабочем режиме (gunicorn)
+Запросы обрабатывают несколько процессов с потоками, поэтому долгий разбор PDF
+у одного пользователя не останавливает остальных. Приложение и тяжелые
+библиотеки загружаются в главном процессе до создания рабочих - процессы
+получают их готовыми и делят память, пока не изменят её. Рабочий процесс
+перезапускается после max_requests запросов, чтобы память pandas не росла
+
+Запуск:
+    python serve.py                                   # процессов по числу ядер
+    python serve.py --workers 4 --threads 8 --max-requests 500
+
+Параметры по умолчанию можно задать в окружении: WEB_BIND, WEB_WORKERS,
+WEB_THREADS, WEB_MAX_REQUESTS, WEB_MAX_REQUESTS_JITTER, WEB_TIMEOUT
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from importlib.util import find_spec
+
+# gunicorn работает только в Linux и macOS
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    GUNICORN_AVAILABLE = False
+
+# Библиотеки, которые app.py загружает при первом использовании; здесь они
+# загружаются один раз в главном процессе, а не в каждом рабочем
+PRELOAD_MODULES = ['pdfplumber', 'openpyxl', 'xlrd']
+
+
+def preload_app():
+    """Импортирует приложение и общие данные только для чтения до создания рабочих процессов"""
+    for module in PRELOAD_MODULES:
+        if find_spec(module) is not None:
+            importlib.import_module(module)
+
+    from app import app, job_queue
+
+    # Запрос о фоновой задаче может прийти в любой процесс - состояние задач храним на диске
+    job_queue.share_state(os.path.join(app.config['UPLOAD_FOLDER'], 'jobs'))
+    # Шаблон компилируется один раз
+    app.jinja_env.get_template('index.html')
+    return app
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Запуск Excel, CSV & PDF Analyzer через gunicorn')
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND', '0.0.0.0:5000'), help='Адрес и порт')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='Рабочих процессов (по умолчанию по числу ядер)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', '4')),
+                        help='Потоков в каждом процессе')
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('WEB_MAX_REQUESTS', '500')),
+                        help='Перезапуск процесса после стольких запросов (0 - без перезапуска)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.getenv('WEB_MAX_REQUESTS_JITTER', '50')),
+                        help='Случайная добавка к max-requests, чтобы процессы не перезапускались одновременно')
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('WEB_TIMEOUT', '300')),
+                        help='Сколько секунд процесс может не отвечать (большие PDF и потоковый AI-анализ)')
+    return parser.parse_args(argv)
+
+
+if GUNICORN_AVAILABLE:
+    class AnalyzerApplication(BaseApplication):
+        """Приложение gunicorn с параметрами из командной строки вместо файла конфигурации"""
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return preload_app()
+
+
+def main(argv=None):
+    """Основная функция"""
+    args = parse_args(argv)
+    if not GUNICORN_AVAILABLE:
+        print("❌ gunicorn не установлен (pip install gunicorn; в Windows недоступен)")
+        print("   Для разработки запустите: python app.py")
+        return 1
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter if args.max_requests else 0,
+        'timeout': args.timeout,
+        'graceful_timeout': 30,
+        'preload_app': True
+    }
+    print(f"🚀 Рабочий режим: {args.workers} процессов x {args.threads} потоков, {args.bind}")
+    if args.max_requests:
+        print(f"♻️  Перезапуск процесса после {args.max_requests}±{args.max_requests_jitter} запросов")
+    AnalyzerApplication(options).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,18 +5,12 @@
 
 import os
 import sys
-import subprocess
+from importlib.util import find_spec
 
 def check_dependencies():
-    """Проверяет установленные зависимости"""
-    required_packages = ['flask', 'pandas', 'openpyxl', 'xlrd']
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_packages.append(package)
+    """Проверяет установленные зависимости (без импорта - только поиск пакетов)"""
+    required_packages = ['flask', 'pandas', 'openpyxl', 'xlrd', 'pdfplumber']
+    missing_packages = [package for package in required_packages if find_spec(package) is None]
     
     if missing_packages:
         print("❌ Отсутствуют необходимые пакеты:")
@@ -54,14 +48,12 @@ def main():
     print("⏹️  Для остановки нажмите Ctrl+C")
     print("=" * 40)
     
-    # Запускаем приложение
+    # Запускаем приложение в этом же процессе (debug и перезагрузчик - FLASK_DEBUG=1)
+    from app import app
     try:
-        subprocess.run([sys.executable, 'app.py'], check=True)
+        app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG') == '1')
     except KeyboardInterrupt:
         print("\n👋 Приложение остановлено")
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Ошибка при запуске: {e}")
-        sys.exit(1)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,6 +4,15 @@ let currentOffset = 0;
 let currentFilename = null;
 let charts = [];
 
+// Интервал опроса состояния задачи обработки файла (мс)
+const JOB_POLL_INTERVAL = 500;
+// Сколько ждать завершения задачи обработки, прежде чем сообщить об ошибке (мс)
+const JOB_MAX_WAIT = 10 * 60 * 1000;
+
+// Текущий запрос к таблице (поиск, фильтры, сортировка) и число совпадений
+let tableQuery = { search: '', filters: [], sort_by: null, descending: false };
+let totalMatches = 0;
+
 // Инициализация при загрузке страницы
 document.addEventListener('DOMContentLoaded', function() {
     console.log('DOM загружен, инициализируем приложение');
@@ -86,21 +95,34 @@ function handleFile(file) {
     showLoading();
     console.log('Индикатор загрузки показан');
     
-    // Создаем FormData для отправки файла
-    const formData = new FormData();
-    formData.append('file', file);
+    // Имя файла и параметры чтения передаются в строке запроса, сам файл - телом запроса
+    const params = new URLSearchParams({ filename: file.name });
+    if (fileExtension === '.pdf') {
+        // Необязательный диапазон страниц PDF
+        params.append('pdf_first_page', document.getElementById('pdfFirstPage').value);
+        params.append('pdf_last_page', document.getElementById('pdfLastPage').value);
+    }
     
     console.log('Отправляем запрос на сервер...');
     
-    // Отправляем файл на сервер
-    fetch('/upload', {
+    // Файл передается потоком: сервер проверяет его начало и сразу отклоняет файлы не того формата,
+    // обработка идет в фоне, сервер сразу возвращает id задачи
+    fetch('/upload_stream?' + params.toString(), {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file
     })
     .then(response => {
         console.log('Получен ответ от сервера, статус:', response.status);
         return response.json();
     })
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error);
+        }
+        console.log('Задача обработки создана:', data.job_id, 'загрузка:', data.upload);
+        return waitForJob(data.job_id);
+    })
     .then(data => {
         console.log('Данные от сервера:', data);
         hideLoading();
@@ -124,9 +146,56 @@ function handleFile(file) {
     });
 }
 
+// Опрос состояния задачи обработки до её завершения
+function waitForJob(jobId) {
+    const startedAt = Date.now();
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            if (Date.now() - startedAt > JOB_MAX_WAIT) {
+                reject(new Error('Обработка файла не завершилась за отведенное время, попробуйте загрузить файл еще раз'));
+                return;
+            }
+            fetch(`/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(job => {
+                if (job.error && !job.status) {
+                    reject(new Error(job.error));
+                    return;
+                }
+                
+                updateLoadingProgress(job);
+                
+                if (job.status === 'done' || job.status === 'error') {
+                    // Результат (или ошибку) забираем отдельным запросом
+                    fetch(`/jobs/${jobId}/result`)
+                    .then(response => response.json())
+                    .then(resolve)
+                    .catch(reject);
+                } else {
+                    setTimeout(poll, JOB_POLL_INTERVAL);
+                }
+            })
+            .catch(reject);
+        };
+        poll();
+    });
+}
+
+// Показ текущего этапа обработки файла
+function updateLoadingProgress(job) {
+    const loadingText = document.getElementById('loadingText');
+    const percent = Math.round(job.progress * 100);
+    if (job.status === 'queued') {
+        loadingText.textContent = 'Файл в очереди на обработку...';
+    } else if (job.stage_label) {
+        loadingText.textContent = `Обрабатываю файл: ${job.stage_label.toLowerCase()} (${percent}%)`;
+    }
+}
+
 // Показать индикатор загрузки
 function showLoading() {
     document.getElementById('uploadSection').style.display = 'none';
+    document.getElementById('loadingText').textContent = 'Обрабатываю файл...';
     document.getElementById('loading').style.display = 'block';
     document.getElementById('results').style.display = 'none';
 }
@@ -143,15 +212,21 @@ function displayResults(data) {
     document.getElementById('results').style.display = 'block';
     
     // Заполняем информацию о файле
-    document.getElementById('fileName').textContent = data.filename;
+    // Файл хранится под именем из хеша содержимого, показываем исходное имя
+    document.getElementById('fileName').textContent = data.original_filename || data.filename;
     document.getElementById('totalRows').textContent = data.total_rows.toLocaleString();
     document.getElementById('totalColumns').textContent = data.columns.length;
     
+    // Выбор листа для книг Excel с несколькими листами
+    populateSheetSelect(data.sheets, data.sheet);
+    
     // Отображаем статистику
     displayStats(data.stats);
     
     // Заполняем селектор категорий
     populateCategorySelect(data.data_types);
+    document.getElementById('timeBucketSelect').value = '';
+    document.getElementById('metricSelect').value = 'sum';
     
     // Отображаем диаграммы
     displayCharts(data.charts);
@@ -166,6 +241,62 @@ function displayResults(data) {
     showExportButton();
 }
 
+// Заполнение селектора листов Excel
+function populateSheetSelect(sheets, activeSheet) {
+    const sheetInfo = document.getElementById('sheetInfo');
+    const sheetSelect = document.getElementById('sheetSelect');
+    sheetSelect.innerHTML = '';
+    
+    if (!sheets || sheets.length < 2) {
+        sheetInfo.style.display = 'none';
+        return;
+    }
+    
+    sheets.forEach(sheet => {
+        const option = document.createElement('option');
+        option.value = sheet;
+        option.textContent = sheet;
+        option.selected = sheet === activeSheet;
+        sheetSelect.appendChild(option);
+    });
+    sheetInfo.style.display = 'block';
+}
+
+// Перечитать файл с выбранным листом
+function selectSheet() {
+    const sheet = document.getElementById('sheetSelect').value;
+    if (!currentFilename || !sheet) return;
+    
+    fetch('/select_sheet', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            filename: currentFilename,
+            sheet: sheet
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            data.original_filename = currentData.original_filename;
+            currentData = data;
+            // У каждого листа свое имя представления файла на сервере
+            currentFilename = data.filename;
+            currentOffset = data.data.length;
+            displayResults(data);
+        } else {
+            console.error('Error:', data.error);
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while switching sheet: ' + error.message);
+    });
+}
+
 // Заполнение селектора категорий
 function populateCategorySelect(dataTypes) {
     const categorySelect = document.getElementById('categorySelect');
@@ -212,6 +343,21 @@ function displayStats(stats) {
                     <span class="stat-value">${stat.count}</span>
                 </div>
             `;
+            if (stat.quantiles) {
+                const approx = stat.approximate ? '≈ ' : '';
+                statContent += `
+                <div class="stat-item">
+                    <span class="stat-label">Std:</span>
+                    <span class="stat-value">${stat.std !== null ? stat.std.toFixed(2) : '-'}</span>
+                </div>
+                <div class="stat-item">
+                    <span class="stat-label">Q1 / Median / Q3:</span>
+                    <span class="stat-value">${approx}${formatStatNumber(stat.quantiles['25%'])} / ${formatStatNumber(stat.quantiles['50%'])} / ${formatStatNumber(stat.quantiles['75%'])}</span>
+                </div>
+                ${renderNullRatio(stat)}
+                ${renderHistogram(stat.histogram)}
+                `;
+            }
         } else if (stat.type === 'datetime') {
             statContent += `
                 <div class="stat-item">
@@ -239,6 +385,7 @@ function displayStats(stats) {
                     <span class="stat-value">${stat.most_common}</span>
                 </div>
                 ` : ''}
+                ${renderNullRatio(stat)}
             `;
         }
         
@@ -247,6 +394,36 @@ function displayStats(stats) {
     });
 }
 
+// Число для карточки статистики
+function formatStatNumber(value) {
+    if (value === null || value === undefined) return '-';
+    return Number.isInteger(value) ? value.toLocaleString() : value.toFixed(2);
+}
+
+// Доля пропусков в столбце
+function renderNullRatio(stat) {
+    if (stat.null_ratio === undefined) return '';
+    return `
+        <div class="stat-item">
+            <span class="stat-label">Missing:</span>
+            <span class="stat-value">${(stat.null_ratio * 100).toFixed(1)}%</span>
+        </div>
+    `;
+}
+
+// Мини-гистограмма распределения значений
+function renderHistogram(histogram) {
+    if (!histogram || !histogram.counts.length) return '';
+    const maxCount = Math.max(...histogram.counts) || 1;
+    const bars = histogram.counts.map((count, index) => {
+        const height = Math.max(Math.round(count / maxCount * 100), count > 0 ? 2 : 0);
+        const from = formatStatNumber(histogram.edges[index]);
+        const to = formatStatNumber(histogram.edges[index + 1]);
+        return `<div class="histogram-bar" style="height: ${height}%" title="${from} – ${to}: ${count}"></div>`;
+    }).join('');
+    return `<div class="stat-histogram">${bars}</div>`;
+}
+
 // Отображение диаграмм
 function displayCharts(chartsData) {
     const chartsGrid = document.getElementById('chartsGrid');
@@ -344,6 +521,8 @@ function displayCharts(chartsData) {
 function updateCharts() {
     const categorySelect = document.getElementById('categorySelect');
     const selectedCategory = categorySelect.value;
+    const timeBucket = document.getElementById('timeBucketSelect').value;
+    const metric = document.getElementById('metricSelect').value;
     
     if (!currentFilename) return;
     
@@ -354,7 +533,9 @@ function updateCharts() {
         },
         body: JSON.stringify({
             filename: currentFilename,
-            selected_category: selectedCategory
+            selected_category: selectedCategory,
+            time_bucket: timeBucket,
+            metric: metric
         })
     })
     .then(response => response.json())
@@ -373,18 +554,34 @@ function updateCharts() {
 // Отображение таблицы
 function displayTable(columns, data) {
     const tableHeader = document.getElementById('tableHeader');
-    const tableBody = document.getElementById('tableBody');
     
-    // Заголовок таблицы
+    // Новый файл - сбрасываем поиск, фильтры и сортировку
+    tableQuery = { search: '', filters: [], sort_by: null, descending: false };
+    totalMatches = currentData.total_rows;
+    document.getElementById('tableSearch').value = '';
+    document.getElementById('filterValue').value = '';
+    populateFilterColumns(columns);
+    
+    // Заголовок таблицы: клик по столбцу сортирует таблицу на сервере
     tableHeader.innerHTML = '';
     columns.forEach(column => {
         const th = document.createElement('th');
         th.textContent = column;
+        th.className = 'sortable';
+        th.title = 'Sort by this column';
+        th.onclick = () => sortTable(column);
         tableHeader.appendChild(th);
     });
     
     // Данные таблицы
-    tableBody.innerHTML = '';
+    document.getElementById('tableBody').innerHTML = '';
+    appendTableRows(columns, data);
+    document.getElementById('loadMoreBtn').style.display = data.length < currentData.total_rows ? '' : 'none';
+}
+
+// Добавление строк в конец таблицы
+function appendTableRows(columns, data) {
+    const tableBody = document.getElementById('tableBody');
     data.forEach(row => {
         const tr = document.createElement('tr');
         columns.forEach(column => {
@@ -396,23 +593,80 @@ function displayTable(columns, data) {
     });
 }
 
-// Загрузка дополнительных данных
-function loadMoreData() {
+// Заполнение списка столбцов для фильтра
+function populateFilterColumns(columns) {
+    const filterColumn = document.getElementById('filterColumn');
+    filterColumn.innerHTML = '<option value="">Column filter</option>';
+    columns.forEach(column => {
+        const option = document.createElement('option');
+        option.value = column;
+        option.textContent = column;
+        filterColumn.appendChild(option);
+    });
+}
+
+// Применение поиска и фильтра из полей над таблицей
+function applyTableQuery() {
+    const column = document.getElementById('filterColumn').value;
+    const op = document.getElementById('filterOp').value;
+    const value = document.getElementById('filterValue').value.trim();
+    
+    tableQuery.search = document.getElementById('tableSearch').value.trim();
+    tableQuery.filters = [];
+    if (column && (value || op === 'empty' || op === 'not_empty')) {
+        tableQuery.filters.push({ column: column, op: op, value: value });
+    }
+    runTableQuery(false);
+}
+
+// Сброс поиска, фильтров и сортировки
+function resetTableQuery() {
+    document.getElementById('tableSearch').value = '';
+    document.getElementById('filterColumn').value = '';
+    document.getElementById('filterValue').value = '';
+    tableQuery = { search: '', filters: [], sort_by: null, descending: false };
+    runTableQuery(false);
+}
+
+// Сортировка по столбцу: повторный клик меняет направление
+function sortTable(column) {
+    if (tableQuery.sort_by === column) {
+        tableQuery.descending = !tableQuery.descending;
+    } else {
+        tableQuery.sort_by = column;
+        tableQuery.descending = false;
+    }
+    
+    document.querySelectorAll('#tableHeader th').forEach(th => {
+        th.classList.remove('sorted-asc', 'sorted-desc');
+        if (th.textContent === column) {
+            th.classList.add(tableQuery.descending ? 'sorted-desc' : 'sorted-asc');
+        }
+    });
+    runTableQuery(false);
+}
+
+// Запрос окна строк с учетом поиска, фильтров и сортировки
+function runTableQuery(append) {
     if (!currentFilename) return;
     
     const loadMoreBtn = document.getElementById('loadMoreBtn');
     loadMoreBtn.disabled = true;
     loadMoreBtn.textContent = 'Loading...';
     
-    fetch('/load_more', {
+    fetch('/table_query', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
             filename: currentFilename,
-            offset: currentOffset,
-            limit: 100
+            offset: append ? currentOffset : 0,
+            limit: 100,
+            search: tableQuery.search,
+            filters: tableQuery.filters,
+            sort_by: tableQuery.sort_by,
+            descending: tableQuery.descending
         })
     })
     .then(response => response.json())
@@ -422,26 +676,19 @@ function loadMoreData() {
             return;
         }
         
-        // Добавляем новые данные в таблицу
-        const tableBody = document.getElementById('tableBody');
-        data.data.forEach(row => {
-            const tr = document.createElement('tr');
-            currentData.columns.forEach(column => {
-                const td = document.createElement('td');
-                td.textContent = row[column] || '';
-                tr.appendChild(td);
-            });
-            tableBody.appendChild(tr);
-        });
+        // Новый запрос заменяет строки, "показать ещё" добавляет их в конец
+        if (!append) {
+            document.getElementById('tableBody').innerHTML = '';
+        }
+        appendTableRows(currentData.columns, data.data);
         
         // Обновляем счетчики
         currentOffset = data.offset;
+        totalMatches = data.total_matches;
         updateRowsInfo();
         
         // Обновляем кнопку
-        if (!data.has_more) {
-            loadMoreBtn.style.display = 'none';
-        }
+        loadMoreBtn.style.display = data.has_more ? '' : 'none';
     })
     .catch(error => {
         console.error('Error:', error);
@@ -453,17 +700,25 @@ function loadMoreData() {
     });
 }
 
+// Загрузка дополнительных данных
+function loadMoreData() {
+    runTableQuery(true);
+}
+
 // Обновление информации о строках
 function updateRowsInfo() {
     const rowsInfo = document.getElementById('rowsInfo');
-    const displayedRows = Math.min(currentOffset, currentData.total_rows);
-    rowsInfo.textContent = `Showing ${displayedRows.toLocaleString()} of ${currentData.total_rows.toLocaleString()} rows`;
+    const displayedRows = Math.min(currentOffset, totalMatches);
+    const filtered = tableQuery.search || tableQuery.filters.length;
+    rowsInfo.textContent = filtered
+        ? `Showing ${displayedRows.toLocaleString()} of ${totalMatches.toLocaleString()} matching rows (${currentData.total_rows.toLocaleString()} total)`
+        : `Showing ${displayedRows.toLocaleString()} of ${currentData.total_rows.toLocaleString()} rows`;
 }
 
-// Проверка статуса AI при загрузке страницы
-async function checkAIStatus() {
+// Проверка статуса AI при загрузке страницы (сервер отдает кэшированный результат, refresh - проверить заново)
+async function checkAIStatus(refresh = false) {
     try {
-        const response = await fetch('/ai_status');
+        const response = await fetch(refresh ? '/ai_status?refresh=1' : '/ai_status');
         const status = await response.json();
         
         const aiPlaceholder = document.getElementById('aiPlaceholder');
@@ -485,7 +740,7 @@ async function checkAIStatus() {
                         <div class="placeholder-icon">⚠️</div>
                         <p>AI анализатор недоступен</p>
                         <p class="ai-status">${status.status}</p>
-                        <button class="btn btn-secondary" onclick="checkAIStatus()">
+                        <button class="btn btn-secondary" onclick="checkAIStatus(true)">
                             Проверить статус
                         </button>
                     </div>
@@ -497,16 +752,90 @@ async function checkAIStatus() {
     }
 }
 
-function requestAIAnalysis() {
+// Экранирует текст для вставки в HTML
+function escapeHtml(text) {
+    return String(text)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;');
+}
+
+function showAIError(title, message) {
+    const aiPlaceholder = document.getElementById('aiPlaceholder');
+    const aiResult = document.getElementById('aiResult');
+    
+    aiResult.style.display = 'none';
+    aiPlaceholder.style.display = 'block';
+    aiPlaceholder.innerHTML = `
+        <div class="placeholder-content">
+            <div class="placeholder-icon">❌</div>
+            <p>${title}</p>
+            <p class="error-message">${escapeHtml(message)}</p>
+            <button class="btn btn-primary" onclick="requestAIAnalysis()">
+                Попробовать снова
+            </button>
+        </div>
+    `;
+}
+
+// Показывает блок результата, в который текст анализа дописывается по мере генерации
+function showAIResult(model, cached) {
+    const aiPlaceholder = document.getElementById('aiPlaceholder');
+    const aiResult = document.getElementById('aiResult');
+    
+    aiPlaceholder.style.display = 'none';
+    aiResult.style.display = 'block';
+    aiResult.innerHTML = `
+        <div class="ai-analysis-result">
+            <div class="ai-header">
+                <h4>🤖 Анализ от нейросети</h4>
+                <span class="ai-model-badge">${escapeHtml(model)}${cached ? ' · из кэша' : ''}</span>
+            </div>
+            <div class="ai-content ai-streaming"></div>
+            <div class="ai-actions">
+                <button class="btn btn-secondary" onclick="resetAIAnalysis()">
+                    Новый анализ
+                </button>
+            </div>
+        </div>
+    `;
+    return aiResult.querySelector('.ai-content');
+}
+
+// Читает события Server-Sent Events из ответа fetch и передает их в onEvent
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // События разделяются пустой строкой, последнее может прийти не полностью
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        frames.forEach(frame => {
+            frame.split('\n')
+                .filter(line => line.startsWith('data: '))
+                .forEach(line => onEvent(JSON.parse(line.slice(6))));
+        });
+    }
+}
+
+async function requestAIAnalysis() {
     if (!currentFilename) {
         alert('Сначала загрузите файл для анализа');
         return;
     }
     
     const aiPlaceholder = document.getElementById('aiPlaceholder');
-    const aiResult = document.getElementById('aiResult');
     
-    // Показываем индикатор загрузки
+    // Показываем индикатор загрузки до первого фрагмента ответа
     aiPlaceholder.innerHTML = `
         <div class="placeholder-content">
             <div class="spinner"></div>
@@ -514,64 +843,49 @@ function requestAIAnalysis() {
         </div>
     `;
     
-    fetch('/ai_analysis', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            filename: currentFilename
-        })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            // Показываем результат
-            aiPlaceholder.style.display = 'none';
-            aiResult.style.display = 'block';
-            aiResult.innerHTML = `
-                <div class="ai-analysis-result">
-                    <div class="ai-header">
-                        <h4>🤖 Анализ от нейросети</h4>
-                        <span class="ai-model-badge">${data.model}</span>
-                    </div>
-                    <div class="ai-content">
-                        ${data.analysis.replace(/\n/g, '<br>')}
-                    </div>
-                    <div class="ai-actions">
-                        <button class="btn btn-secondary" onclick="resetAIAnalysis()">
-                            Новый анализ
-                        </button>
-                    </div>
-                </div>
-            `;
-        } else {
-            // Показываем ошибку
-            aiPlaceholder.innerHTML = `
-                <div class="placeholder-content">
-                    <div class="placeholder-icon">❌</div>
-                    <p>Ошибка анализа данных</p>
-                    <p class="error-message">${data.error}</p>
-                    <button class="btn btn-primary" onclick="requestAIAnalysis()">
-                        Попробовать снова
-                    </button>
-                </div>
-            `;
-        }
-    })
-    .catch(error => {
+    let response;
+    try {
+        // Ответ приходит потоком: текст показывается по мере генерации
+        response = await fetch('/ai_analysis_stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                filename: currentFilename
+            })
+        });
+    } catch (error) {
         console.error('Error:', error);
-        aiPlaceholder.innerHTML = `
-            <div class="placeholder-content">
-                <div class="placeholder-icon">❌</div>
-                <p>Ошибка соединения</p>
-                <p class="error-message">Не удалось подключиться к серверу</p>
-                <button class="btn btn-primary" onclick="requestAIAnalysis()">
-                    Попробовать снова
-                </button>
-            </div>
-        `;
-    });
+        showAIError('Ошибка соединения', 'Не удалось подключиться к серверу');
+        return;
+    }
+    
+    if (!response.ok) {
+        const data = await response.json();
+        showAIError('Ошибка анализа данных', data.error);
+        return;
+    }
+    
+    let aiContent = null;
+    let analysis = '';
+    try {
+        await readEventStream(response, event => {
+            if (event.type === 'meta') {
+                aiContent = showAIResult(event.model, event.cached);
+            } else if (event.type === 'delta') {
+                analysis += event.text;
+                aiContent.innerHTML = escapeHtml(analysis).replace(/\n/g, '<br>');
+            } else if (event.type === 'done') {
+                aiContent.classList.remove('ai-streaming');
+            } else if (event.type === 'error') {
+                showAIError('Ошибка анализа данных', event.error);
+            }
+        });
+    } catch (error) {
+        console.error('Error:', error);
+        showAIError('Ошибка соединения', 'Ответ нейросети прерван');
+    }
 }
 
 function resetAIAnalysis() {
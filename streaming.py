@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Потоковое чтение больших CSV файлов по частям
+Статистика, типы данных и группировки для диаграмм считаются за один проход
+с ограниченным объемом памяти
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from charts import BAR_CHART_VALUES, LINE_CHART_POINTS, TIME_BUCKETS, ChartAggregator, build_line_chart
+from csv_sniffer import csv_read_options
+from profiling import (
+    QUANTILES, TOP_K, HyperLogLog, SampleSketch, histogram, numeric_profile, to_python, value_profile
+)
+
+# Количество строк в одной части файла
+DEFAULT_CHUNKSIZE = 100_000
+
+# Ограничения на размер промежуточных структур
+FREQUENT_VALUES_CAPACITY = 1000
+MAX_GROUPS = 10_000
+
+
+class FrequentValues:
+    """Приближенный подсчет самых частых значений с ограниченной памятью"""
+
+    def __init__(self, capacity=FREQUENT_VALUES_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+
+    def update(self, series):
+        """Добавляет частоты значений из части файла"""
+        for value, count in series.value_counts(dropna=True).items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+
+        if len(self.counts) > self.capacity:
+            # Оставляем только самые частые значения
+            top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+            self.counts = dict(top[:self.capacity])
+
+    def top(self, k=TOP_K):
+        """Возвращает k самых частых значений с частотами"""
+        top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{'value': to_python(value), 'count': count} for value, count in top]
+
+
+class ColumnAccumulator:
+    """Накопитель профиля одного столбца (формат profile_frame)"""
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.rows = 0
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.distinct = None
+        self.frequent = None
+        self.sample = None
+        if dtype == 'numeric':
+            self.sample = SampleSketch()
+        elif dtype != 'datetime':
+            self.distinct = HyperLogLog()
+            self.frequent = FrequentValues()
+
+    def update(self, series):
+        """Обновляет статистику значениями из части файла"""
+        self.rows += len(series)
+        if self.dtype == 'numeric':
+            values = pd.to_numeric(series, errors='coerce').dropna().to_numpy(dtype=np.float64)
+            if len(values) == 0:
+                return
+            self._update_moments(values)
+            self.sample.update(values)
+            self._update_bounds(float(values.min()), float(values.max()))
+        elif self.dtype == 'datetime':
+            self.count += int(series.count())
+            values = pd.to_datetime(series, errors='coerce').dropna()
+            if values.empty:
+                return
+            self._update_bounds(values.min(), values.max())
+        else:
+            self.count += int(series.count())
+            self.distinct.update(series)
+            self.frequent.update(series)
+
+    def _update_moments(self, values):
+        """Объединяет сумму, среднее и сумму квадратов отклонений с частью файла (формула Чана)"""
+        count = len(values)
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        delta = mean - self.mean
+        total = self.count + count
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.sum += float(values.sum())
+
+    def _update_bounds(self, chunk_min, chunk_max):
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+    def to_stats(self):
+        """Возвращает статистику в формате calculate_basic_stats"""
+        if self.dtype == 'numeric':
+            values = self.sample.values
+            quantiles = np.quantile(values, list(QUANTILES.values())) if len(values) else [np.nan] * len(QUANTILES)
+            # Гистограмма по выборке, масштабированная до числа значений
+            scale = self.count / len(values) if len(values) else 1.0
+            return numeric_profile(
+                self.count, self.rows, self.sum, self.min, self.max,
+                math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan'),
+                dict(zip(QUANTILES, quantiles)), histogram(values, self.min, self.max, scale=scale),
+                len(values) < self.count
+            )
+        if self.dtype == 'datetime':
+            return {
+                'type': 'datetime',
+                'min_date': str(self.min),
+                'max_date': str(self.max),
+                'count': self.count,
+                'null_ratio': round(1 - self.count / self.rows, 4) if self.rows else 0.0
+            }
+        return value_profile(self.dtype, self.rows, self.count, self.distinct.estimate(), self.frequent.top(), True)
+
+
+class GroupSums:
+    """Накопитель сумм и количеств числовых столбцов по значениям категории"""
+
+    def __init__(self, category, value_columns, max_groups=MAX_GROUPS):
+        self.category = category
+        self.value_columns = value_columns
+        self.max_groups = max_groups
+        self.aggregate = None
+
+    def update(self, chunk):
+        """Добавляет суммы и количества по группам из части файла"""
+        values = chunk[self.value_columns].apply(pd.to_numeric, errors='coerce')
+        grouped = values.groupby(chunk[self.category]).agg(['sum', 'count'])
+        self.aggregate = grouped if self.aggregate is None else self.aggregate.add(grouped, fill_value=0)
+
+        if len(self.aggregate) > self.max_groups:
+            # Ограничиваем память: оставляем группы с наибольшими суммами
+            first_sums = self.aggregate[(self.value_columns[0], 'sum')]
+            order = first_sums.abs().sort_values(ascending=False).index
+            self.aggregate = self.aggregate.loc[order[:self.max_groups]]
+
+
+class RecentPoints:
+    """Хранит последние по дате точки и суммы по дням для линейной диаграммы"""
+
+    def __init__(self, date_column, value_column, size=LINE_CHART_POINTS):
+        self.date_column = date_column
+        self.value_column = value_column
+        self.size = size
+        self.points = None
+        self.daily = None
+
+    def update(self, chunk):
+        """Добавляет точки из части файла"""
+        points = pd.DataFrame({
+            'date': pd.to_datetime(chunk[self.date_column], errors='coerce'),
+            'value': pd.to_numeric(chunk[self.value_column], errors='coerce')
+        }).dropna(subset=['date'])
+
+        # Суммы по дням ограничены числом дней и позволяют группировать по неделям и месяцам
+        daily = points['value'].groupby(points['date'].dt.floor('D')).sum()
+        self.daily = daily if self.daily is None else self.daily.add(daily, fill_value=0)
+
+        if self.points is not None:
+            points = pd.concat([self.points, points], ignore_index=True)
+        self.points = points.nlargest(self.size, 'date', keep='last')
+
+    def result(self, time_bucket=None):
+        """Возвращает точки (или суммы по дням) в виде таблицы date/value"""
+        if time_bucket in TIME_BUCKETS and self.daily is not None:
+            return pd.DataFrame({'date': self.daily.index, 'value': self.daily.values})
+        if self.points is None:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'value': pd.Series(dtype=float)})
+        return self.points
+
+
+def iter_csv_chunks(source, dialect, chunksize=DEFAULT_CHUNKSIZE):
+    """Итерирует CSV файл (путь или открытый бинарный файл) частями по chunksize строк"""
+    return pd.read_csv(source, chunksize=chunksize, **csv_read_options(dialect))
+
+
+def stream_csv(filepath, dialect, detect_types, chunksize=DEFAULT_CHUNKSIZE, preview_rows=100, progress=None):
+    """Читает CSV по частям и считает всё нужное для ответа /upload за один проход
+
+    progress(done, total) вызывается после каждой части с числом прочитанных и всех байт
+    """
+    preview = None
+    data_types = None
+    accumulators = {}
+    group_sums = []
+    recent_points = None
+    total_rows = 0
+
+    file_size = os.path.getsize(filepath)
+    # Читаем через открытый файл, чтобы по позиции в нем сообщать о прогрессе
+    with open(filepath, 'rb') as handle:
+        for chunk in iter_csv_chunks(handle, dialect, chunksize):
+            if data_types is None:
+                # Типы определяем по первой части файла
+                preview = chunk.head(preview_rows)
+                data_types = detect_types(chunk)
+                accumulators = {column: ColumnAccumulator(data_types[column]) for column in chunk.columns}
+
+                numeric_columns = [col for col, dtype in data_types.items() if dtype == 'numeric']
+                categorical_columns = [col for col, dtype in data_types.items() if dtype == 'categorical']
+                datetime_columns = [col for col, dtype in data_types.items() if dtype == 'datetime']
+
+                if numeric_columns:
+                    for cat_col in categorical_columns:
+                        value_columns = [col for col in numeric_columns if col != cat_col][:BAR_CHART_VALUES]
+                        if value_columns:
+                            group_sums.append(GroupSums(cat_col, value_columns))
+                    if datetime_columns and datetime_columns[0] != numeric_columns[0]:
+                        recent_points = RecentPoints(datetime_columns[0], numeric_columns[0])
+
+            total_rows += len(chunk)
+            for column, accumulator in accumulators.items():
+                accumulator.update(chunk[column])
+            for groups in group_sums:
+                groups.update(chunk)
+            if recent_points is not None:
+                recent_points.update(chunk)
+            if progress:
+                progress(handle.tell(), file_size)
+
+    if data_types is None:
+        return {
+            'preview': pd.DataFrame(),
+            'total_rows': 0,
+            'data_types': {},
+            'stats': {},
+            'group_sums': {},
+            'recent_points': None
+        }
+
+    return {
+        'preview': preview,
+        'total_rows': total_rows,
+        'data_types': data_types,
+        'stats': {column: accumulator.to_stats() for column, accumulator in accumulators.items()},
+        'group_sums': {groups.category: groups for groups in group_sums},
+        'recent_points': recent_points
+    }
+
+
+def build_streaming_charts(summary, selected_category=None, time_bucket=None, metric='sum'):
+    """Строит диаграммы по накопленным группировкам, как generate_charts_data"""
+    aggregates = {category: groups.aggregate for category, groups in summary['group_sums'].items()}
+    aggregator = ChartAggregator(None, summary['data_types'], aggregates)
+    charts = aggregator.bar_charts(selected_category, metric)
+
+    # Line chart: последние точки или суммы по периодам
+    recent_points = summary['recent_points']
+    if recent_points is not None:
+        points = recent_points.result(time_bucket)
+        charts.append(build_line_chart(
+            points['date'], points['value'],
+            recent_points.date_column, recent_points.value_column,
+            time_bucket
+        ))
+
+    return charts
+
+
+def read_csv_window(filepath, dialect, offset, limit):
+    """Читает из CSV только строки с offset по offset + limit"""
+    options = csv_read_options(dialect)
+    first_data_line = dialect['header_row'] + (1 if dialect['has_header'] else 0)
+
+    def skip_line(index):
+        # Пропускаем преамбулу и строки данных до offset, но оставляем заголовок
+        if index < dialect['header_row']:
+            return True
+        return first_data_line <= index < first_data_line + offset
+
+    options['skiprows'] = skip_line
+    return pd.read_csv(filepath, nrows=limit, **options)
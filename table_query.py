@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Запросы к таблице на сервере: фильтры по столбцам, сортировка и поиск
+Клиент получает только нужное окно строк и общее число совпадений.
+Для поиска столбцы кодируются один раз (коды + уникальные значения), порядок
+сортировки по столбцу вычисляется при первом обращении и переиспользуется
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Операции фильтра и их подписи
+FILTER_OPERATIONS = {
+    'contains': 'содержит',
+    'eq': '=',
+    'ne': '≠',
+    'gt': '>',
+    'gte': '≥',
+    'lt': '<',
+    'lte': '≤',
+    'empty': 'пусто',
+    'not_empty': 'не пусто'
+}
+
+# Операции сравнения, которые требуют числового столбца или столбца дат
+COMPARISONS = {
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'lt': np.less,
+    'lte': np.less_equal
+}
+
+
+def format_dates(series):
+    """Форматирует даты для отображения: без нулевого времени"""
+    return series.dt.strftime('%Y-%m-%d %H:%M:%S').str.replace(' 00:00:00', '', regex=False)
+
+
+def parse_filters(filters):
+    """Проверяет список фильтров из запроса: [{column, op, value}, ...]"""
+    parsed = []
+    for item in filters or []:
+        if not isinstance(item, dict) or 'column' not in item:
+            raise ValueError("Фильтр должен содержать столбец (column)")
+        op = item.get('op', 'contains')
+        if op not in FILTER_OPERATIONS:
+            raise ValueError(f"Неизвестная операция фильтра: {op}")
+        value = item.get('value')
+        if op not in ('empty', 'not_empty') and (value is None or str(value) == ''):
+            raise ValueError(f'Не указано значение фильтра для столбца "{item["column"]}"')
+        parsed.append({'column': item['column'], 'op': op, 'value': value})
+    return parsed
+
+
+class TableIndex:
+    """Индексы таблицы для фильтрации, поиска и сортировки без копирования данных"""
+
+    def __init__(self, df):
+        self.df = df
+        self.encoded = {}
+        self.orders = {}
+        # Память, занятая кодами и порядками сортировки (исходная таблица не учитывается)
+        self.nbytes = 0
+
+    def column(self, name):
+        """Возвращает столбец по имени (имена в запросе приходят строками)"""
+        if name in self.df.columns:
+            return self.df[name]
+        for column in self.df.columns:
+            if str(column) == str(name):
+                return self.df[column]
+        raise ValueError(f'Столбец "{name}" не найден')
+
+    def encode(self, name):
+        """Коды значений столбца и их текст в нижнем регистре (вычисляются один раз)"""
+        if name not in self.encoded:
+            series = self.column(name)
+            codes, uniques = pd.factorize(series)
+            uniques = pd.Series(uniques)
+            if pd.api.types.is_datetime64_any_dtype(uniques):
+                text = format_dates(uniques)
+            else:
+                text = uniques.astype(str)
+            text = text.str.lower().to_numpy(dtype=object)
+            self.encoded[name] = (codes, text)
+            self.nbytes += codes.nbytes + text.nbytes + sum(sys.getsizeof(value) for value in text)
+        return self.encoded[name]
+
+    def match_text(self, name, pattern, exact=False):
+        """Маска строк, текст которых содержит pattern (или равен ему) без учета регистра"""
+        codes, text = self.encode(name)
+        pattern = str(pattern).lower()
+        if exact:
+            hits = text == pattern
+        else:
+            hits = pd.Series(text, dtype=object).str.contains(pattern, regex=False).to_numpy(dtype=bool)
+        # Код -1 (пропуск) попадает на последний элемент, который всегда False
+        return np.append(hits, False)[codes]
+
+    def match_filter(self, name, op, value):
+        """Маска строк, удовлетворяющих одному фильтру"""
+        series = self.column(name)
+        if op == 'empty':
+            return series.isna().to_numpy()
+        if op == 'not_empty':
+            return series.notna().to_numpy()
+
+        is_numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        is_datetime = pd.api.types.is_datetime64_any_dtype(series)
+
+        if op in COMPARISONS or (op in ('eq', 'ne') and (is_numeric or is_datetime)):
+            if is_numeric:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f'Значение фильтра для столбца "{name}" должно быть числом')
+                values = series.to_numpy(dtype=float, na_value=np.nan)
+            elif is_datetime:
+                try:
+                    value = pd.Timestamp(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f'Значение фильтра для столбца "{name}" должно быть датой')
+                values = series
+            else:
+                raise ValueError(f'Сравнение "{FILTER_OPERATIONS[op]}" доступно только для чисел и дат')
+
+            if op == 'eq':
+                return np.asarray(values == value, dtype=bool)
+            if op == 'ne':
+                return np.asarray((values != value) & series.notna(), dtype=bool)
+            return np.asarray(COMPARISONS[op](values, value), dtype=bool)
+
+        if op == 'eq':
+            return self.match_text(name, value, exact=True)
+        if op == 'ne':
+            return ~self.match_text(name, value, exact=True) & series.notna().to_numpy()
+        return self.match_text(name, value)
+
+    def mask(self, filters=(), search=''):
+        """Маска строк для фильтров (условие И) и поиска по всем столбцам; None - все строки"""
+        mask = None
+        for item in filters:
+            matched = self.match_filter(item['column'], item['op'], item['value'])
+            mask = matched if mask is None else mask & matched
+
+        if search:
+            found = np.zeros(len(self.df), dtype=bool)
+            for column in self.df.columns:
+                found |= self.match_text(column, search)
+            mask = found if mask is None else mask & found
+        return mask
+
+    def order(self, name, descending=False):
+        """Позиции строк в порядке сортировки по столбцу, пропуски в конце"""
+        key = (str(name), descending)
+        if key not in self.orders:
+            series = self.column(name).reset_index(drop=True)
+            try:
+                ordered = series.sort_values(ascending=not descending, kind='stable', na_position='last')
+            except TypeError:
+                # Значения разных типов сравниваем как текст
+                ordered = series.astype(str).where(series.notna()).sort_values(
+                    ascending=not descending, kind='stable', na_position='last'
+                )
+            self.orders[key] = ordered.index.to_numpy()
+            self.nbytes += self.orders[key].nbytes
+        return self.orders[key]
+
+    def query(self, filters=(), search='', sort_by=None, descending=False, offset=0, limit=100):
+        """Возвращает окно строк, их номера в файле и общее число совпадений"""
+        mask = self.mask(filters, search)
+
+        if sort_by is not None:
+            positions = self.order(sort_by, descending)
+            if mask is not None:
+                positions = positions[mask[positions]]
+        elif mask is not None:
+            positions = np.flatnonzero(mask)
+        else:
+            positions = np.arange(len(self.df))
+
+        window = positions[offset:offset + limit]
+        return self.df.iloc[window], window, len(positions)
+
+
+def coerce_chunk(chunk, data_types, columns):
+    """Приводит нужные для запроса столбцы части CSV к определенным типам"""
+    for column in columns:
+        if column not in chunk.columns:
+            continue
+        if data_types.get(column) == 'numeric':
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        elif data_types.get(column) == 'datetime':
+            chunk[column] = pd.to_datetime(chunk[column], errors='coerce')
+    return chunk
+
+
+def query_chunks(chunks, data_types, filters=(), search='', sort_by=None, descending=False, offset=0, limit=100):
+    """Выполняет запрос за один проход по частям файла, который не хранится в памяти целиком
+
+    Без сортировки собираются только строки окна, с сортировкой - лучшие offset + limit строк
+    """
+    columns = [item['column'] for item in filters] + ([sort_by] if sort_by is not None else [])
+    total = 0
+    parts = []
+    best = None
+
+    for chunk in chunks:
+        chunk = coerce_chunk(chunk, data_types, columns)
+        mask = TableIndex(chunk).mask(filters, search)
+        matched = chunk if mask is None else chunk[mask]
+
+        if sort_by is not None:
+            candidates = matched if best is None else pd.concat([best, matched])
+            best = candidates.sort_values(
+                sort_by, ascending=not descending, kind='stable', na_position='last'
+            ).head(offset + limit)
+        elif total + len(matched) > offset and total < offset + limit:
+            parts.append(matched.iloc[max(offset - total, 0):offset + limit - total])
+        total += len(matched)
+
+    if sort_by is not None:
+        window = best.iloc[offset:offset + limit] if best is not None else pd.DataFrame()
+    else:
+        window = pd.concat(parts) if parts else pd.DataFrame()
+    return window, window.index.to_numpy(), total
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша ответов нейросети и объединения одинаковых запросов (без сети, через StubClient)
+"""
+
+import threading
+import time
+
+import pytest
+
+from ai_analyzer import AIAnalyzer
+from ai_cache import AIResponseCache, CoalescedCallFailed, RequestCoalescer, make_cache_key
+from ai_stub import StubClient
+
+TABLE = [{'Город': 'Москва', 'Сумма': 10}, {'Город': 'Казань', 'Сумма': 20}]
+COLUMNS = ['Город', 'Сумма']
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AIResponseCache(str(tmp_path / 'ai_cache.sqlite'))
+
+
+def make_analyzer(cache, delay=0.0):
+    stub = StubClient(delay=delay)
+    return AIAnalyzer(client=stub, cache=cache), stub
+
+
+def test_repeated_analysis_is_served_from_cache(cache):
+    analyzer, stub = make_analyzer(cache)
+    first = analyzer.analyze_data(TABLE, COLUMNS)
+    second = analyzer.analyze_data(TABLE, COLUMNS)
+
+    assert first['success'] and not first['cached']
+    assert second['cached'] and second['analysis'] == first['analysis']
+    assert stub.calls == 1
+    assert cache.get_stats()['hits'] == 1
+
+    # refresh запрашивает новый ответ в обход кэша
+    assert not analyzer.analyze_data(TABLE, COLUMNS, refresh=True)['cached']
+    assert stub.calls == 2
+
+
+def test_cached_answer_is_replayed_to_stream(cache):
+    analyzer, stub = make_analyzer(cache)
+    streamed = ''.join(event['text'] for event in analyzer.stream_analysis(TABLE, COLUMNS) if event['type'] == 'delta')
+    events = list(analyzer.stream_analysis(TABLE, COLUMNS))
+
+    assert events[0] == {'type': 'meta', 'model': analyzer.model, 'cached': True}
+    assert events[1] == {'type': 'delta', 'text': streamed}
+    assert stub.calls == 1
+
+
+def test_expired_answer_is_removed(tmp_path):
+    cache = AIResponseCache(str(tmp_path / 'ai_cache.sqlite'), ttl_seconds=0.05)
+    key = make_cache_key('model', 'prompt', 0.7, 100)
+    cache.put(key, 'model', 'ответ')
+    assert cache.get(key) == 'ответ'
+
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_least_recently_used_answers_are_pruned(tmp_path):
+    cache = AIResponseCache(str(tmp_path / 'ai_cache.sqlite'), max_entries=2)
+    keys = [make_cache_key('model', f'prompt {index}', 0.7, 100) for index in range(3)]
+    cache.put(keys[0], 'model', 'первый')
+    time.sleep(0.01)
+    cache.put(keys[1], 'model', 'второй')
+    time.sleep(0.01)
+    # Обращение делает первый ответ недавно использованным - вытесняется второй
+    assert cache.get(keys[0]) == 'первый'
+    time.sleep(0.01)
+    cache.put(keys[2], 'model', 'третий')
+
+    assert cache.get_stats()['entries'] == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 'первый'
+    assert cache.get(keys[2]) == 'третий'
+
+
+def test_concurrent_identical_requests_call_api_once(cache):
+    analyzer, stub = make_analyzer(cache, delay=0.3)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def analyze():
+        barrier.wait()
+        results.append(analyzer.analyze_data(TABLE, COLUMNS))
+
+    threads = [threading.Thread(target=analyze) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.calls == 1
+    assert all(result['success'] for result in results)
+    assert len({result['analysis'] for result in results}) == 1
+    assert sum(result['coalesced'] for result in results) == 3
+
+
+class Interrupted(BaseException):
+    """Аналог KeyboardInterrupt или остановки рабочего процесса"""
+
+
+def run_leader_and_waiter(error):
+    coalescer = RequestCoalescer()
+    started = threading.Event()
+    outcome = {}
+
+    def leader():
+        def function():
+            started.set()
+            time.sleep(0.2)
+            raise error
+        try:
+            coalescer.run('key', function)
+        except BaseException as e:
+            outcome['leader'] = e
+
+    def waiter():
+        started.wait()
+        try:
+            outcome['waiter'] = coalescer.run('key', lambda: 'не должен вызываться')
+        except Exception as e:
+            outcome['waiter'] = e
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=waiter)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert coalescer.coalesced == 1
+    return outcome
+
+
+def test_waiters_get_leader_error():
+    error = ValueError('API недоступен')
+    outcome = run_leader_and_waiter(error)
+    assert outcome['leader'] is error
+    assert outcome['waiter'] is error
+
+
+def test_waiters_fail_when_leader_is_interrupted():
+    error = Interrupted()
+    outcome = run_leader_and_waiter(error)
+    assert outcome['leader'] is error
+    assert isinstance(outcome['waiter'], CoalescedCallFailed)
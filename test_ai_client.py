@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Тесты автоматического выключателя и повторов общего клиента AI
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from ai_client import CircuitBreaker, CircuitOpenError, ResilientClient
+
+
+class ServerDown(Exception):
+    """Временная ошибка (как APIConnectionError)"""
+
+
+class NotFound(Exception):
+    """Ответ сервера 4xx (как NotFoundError от прокси без /models)"""
+
+
+def connection_error():
+    return ServerDown('connection error')
+
+
+def not_found_error():
+    return NotFound('not found')
+
+
+def make_client(failure_threshold=1, reset_seconds=30, max_retries=0):
+    client = ResilientClient(None, max_retries=max_retries, failure_threshold=failure_threshold,
+                             reset_seconds=reset_seconds, backoff_base=0)
+    # Классы ошибок openai подменяем, чтобы тесты не зависели от версии библиотеки
+    client.retryable_errors = (ServerDown,)
+    client.client_errors = (NotFound,)
+    return client
+
+
+def fail_with(error):
+    def function():
+        raise error
+    return function
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_half_open_allows_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == 'half_open'
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_trial_success_closes_breaker():
+    client = make_client(reset_seconds=0)
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    assert client.breaker.state == 'half_open'
+    assert client.call(lambda: 'ok') == 'ok'
+    assert client.breaker.state == 'closed'
+
+
+def test_trial_failure_reopens_breaker():
+    client = make_client(reset_seconds=0)
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    client.breaker.reset_seconds = 30
+    client.breaker.opened_at -= 31
+    assert client.breaker.state == 'half_open'
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    assert client.breaker.state == 'open'
+    assert client.breaker.trial is False
+
+
+def test_trial_with_client_error_closes_breaker():
+    """Прокси без /models отвечает 404 - сервер доступен, выключатель не должен зависнуть в half_open"""
+    client = make_client(reset_seconds=0)
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    with pytest.raises(NotFound):
+        client.call(fail_with(not_found_error()))
+    assert client.breaker.state == 'closed'
+    assert client.breaker.trial is False
+    assert client.call(lambda: 'ok') == 'ok'
+
+
+def test_trial_with_unexpected_error_releases_trial():
+    client = make_client(reset_seconds=0)
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    with pytest.raises(ValueError):
+        client.call(fail_with(ValueError('bad arguments')))
+    assert client.breaker.trial is False
+    assert client.call(lambda: 'ok') == 'ok'
+    assert client.breaker.state == 'closed'
+
+
+def test_retryable_error_is_retried():
+    client = make_client(failure_threshold=5, max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise connection_error()
+        return 'ok'
+
+    assert client.call(flaky) == 'ok'
+    assert client.get_stats()['retries'] == 2
+    assert client.breaker.state == 'closed'
+
+
+def test_client_error_is_not_retried():
+    client = make_client(failure_threshold=5, max_retries=3)
+    with pytest.raises(NotFound):
+        client.call(fail_with(not_found_error()))
+    stats = client.get_stats()
+    assert stats['calls'] == 1
+    assert stats['retries'] == 0
+
+
+def broken_stream_client(client):
+    """Клиент, поток которого обрывается после первого фрагмента"""
+    def create(**kwargs):
+        def chunks():
+            yield 'первый фрагмент'
+            raise connection_error()
+        return chunks()
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return client
+
+
+def test_error_mid_stream_opens_breaker():
+    client = broken_stream_client(make_client(failure_threshold=2))
+    for _ in range(2):
+        stream = client.create_completion(stream=True)
+        assert next(stream) == 'первый фрагмент'
+        with pytest.raises(ServerDown):
+            next(stream)
+    assert client.breaker.state == 'open'
+    stats = client.get_stats()
+    assert stats['failures'] == 2
+    assert stats['in_flight'] == 0
+
+
+def test_error_mid_stream_reopens_half_open_breaker():
+    client = broken_stream_client(make_client(reset_seconds=0))
+    with pytest.raises(ServerDown):
+        client.call(fail_with(connection_error()))
+    client.breaker.reset_seconds = 30
+    client.breaker.opened_at -= 31
+
+    stream = client.create_completion(stream=True)
+    # Пробный запрос получил начало ответа, но поток оборвался - выключатель снова разомкнут
+    assert next(stream) == 'первый фрагмент'
+    with pytest.raises(ServerDown):
+        list(stream)
+    assert client.breaker.state == 'open'
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тесты проверки доступности AI: кэш результата, история, фоновая проверка в одном процессе
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai_client import ResilientClient
+from ai_health import FCNTL_AVAILABLE, HealthMonitor
+
+
+class Probe:
+    """Проверка, которая считает вызовы и падает, пока failing=True"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    def __call__(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError('API недоступен')
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fresh_status_is_cached():
+    probe = Probe()
+    monitor = HealthMonitor(probe, ttl_seconds=60)
+    first = monitor.get_status()
+    second = monitor.get_status()
+    assert first['ok'] and second['ok']
+    assert second['stale'] is False
+    assert probe.calls == 1
+
+    monitor.get_status(force=True)
+    assert probe.calls == 2
+
+
+def test_stale_status_is_returned_and_refreshed_in_background():
+    probe = Probe()
+    monitor = HealthMonitor(probe, ttl_seconds=0.05)
+    monitor.get_status()
+    time.sleep(0.1)
+    probe.failing = True
+
+    status = monitor.get_status()
+    # Сразу отдается прежний результат, новая проверка идет в фоне
+    assert status['ok'] is True and status['stale'] is True
+    assert wait_for(lambda: probe.calls == 2 and not monitor.refreshing)
+    assert monitor.get_status()['ok'] is False
+
+
+def test_history_summary():
+    probe = Probe()
+    monitor = HealthMonitor(probe, history_size=3)
+    for failing in (False, True, False, False):
+        probe.failing = failing
+        monitor.check()
+
+    history = monitor.get_history()
+    assert history['checks'] == 3
+    assert history['error_rate'] == round(1 / 3, 4)
+    assert history['latency_avg_ms'] is not None
+    assert [record['ok'] for record in history['history']] == [False, True, True]
+    assert history['history'][0]['error'] == 'API недоступен'
+
+
+@pytest.mark.skipif(not FCNTL_AVAILABLE, reason='нужна блокировка файлов fcntl')
+def test_periodic_refresh_runs_in_one_monitor(tmp_path):
+    lock_path = str(tmp_path / 'ai_health.lock')
+    first, second = Probe(), Probe()
+    monitors = [HealthMonitor(first), HealthMonitor(second)]
+    for monitor in monitors:
+        monitor.start(0.02, lock_path)
+    try:
+        assert wait_for(lambda: first.calls + second.calls >= 5)
+        assert min(first.calls, second.calls) == 0
+
+        # Процесс с блокировкой остановился - проверки подхватывает другой
+        leader, other = (0, 1) if first.calls else (1, 0)
+        monitors[leader].stop()
+        calls = [first, second][other].calls
+        assert wait_for(lambda: [first, second][other].calls > calls)
+    finally:
+        for monitor in monitors:
+            monitor.stop()
+
+
+def test_probe_failures_do_not_open_breaker():
+    def list_models():
+        raise ConnectionError('API недоступен')
+
+    client = ResilientClient(SimpleNamespace(models=SimpleNamespace(list=list_models)), failure_threshold=1)
+    monitor = HealthMonitor(client.probe_models)
+    for _ in range(3):
+        assert monitor.check()['ok'] is False
+    assert client.breaker.state == 'closed'
+    assert client.get_stats()['calls'] == 0
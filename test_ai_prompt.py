@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тесты описания таблицы для промпта: бюджет токенов для широких и высоких таблиц, аномалии, выборка
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_prompt import PROMPT_TOKEN_BUDGET, build_data_profile, estimate_tokens
+from profiling import profile_frame
+
+
+def wide_table(columns, rows=500):
+    """Таблица с числовыми, категориальными и текстовыми столбцами с длинными названиями"""
+    rng = np.random.default_rng(4)
+    data, data_types = {}, {}
+    for index in range(columns):
+        name = f'Показатель эффективности подразделения номер {index}'
+        kind = ('numeric', 'categorical', 'text')[index % 3]
+        if kind == 'numeric':
+            data[name] = rng.normal(1000, 300, rows)
+        elif kind == 'categorical':
+            data[name] = rng.choice(['Москва', 'Санкт-Петербург', 'Екатеринбург'], rows)
+        else:
+            data[name] = [f'Длинный комментарий к строке {row} столбца {index}' for row in range(rows)]
+        data_types[name] = kind
+    df = pd.DataFrame(data)
+    return df, data_types, profile_frame(df, data_types, exact=True)
+
+
+@pytest.mark.parametrize('columns, budget', [(300, PROMPT_TOKEN_BUDGET), (300, 500), (40, 500), (12, PROMPT_TOKEN_BUDGET)])
+def test_profile_fits_token_budget(columns, budget):
+    df, data_types, stats = wide_table(columns)
+    profile = build_data_profile(df, data_types, stats, token_budget=budget)
+
+    assert profile['tokens'] == estimate_tokens(profile['text'])
+    assert profile['tokens'] <= budget
+    assert 0 < profile['columns'] <= columns
+    if profile['columns'] < columns:
+        assert f"and {columns - profile['columns']} more columns" in profile['text']
+    assert profile['sample_rows'] > 0
+
+
+def test_profile_size_does_not_depend_on_rows():
+    df, data_types, stats = wide_table(12, rows=200)
+    small = build_data_profile(df, data_types, stats, total_rows=200)
+    large = build_data_profile(df, data_types, stats, total_rows=20_000_000, exact=False)
+    assert 'Dataset: 20,000,000 rows, 12 columns.' in large['text']
+    assert abs(large['tokens'] - small['tokens']) < 20
+
+
+def test_anomalies_and_stratified_sample():
+    rows = 400
+    df = pd.DataFrame({
+        'Сумма': np.r_[np.full(rows - 1, 10.0) + np.arange(rows - 1) % 5, 1e6],
+        'Город': np.resize(['Москва', 'Казань', 'Омск', 'Самара'], rows),
+        'Статус': ['оплачен'] * rows,
+        'Примечание': [None] * (rows - 10) + ['есть'] * 10
+    })
+    data_types = {'Сумма': 'numeric', 'Город': 'categorical', 'Статус': 'categorical', 'Примечание': 'text'}
+    profile = build_data_profile(df, data_types, profile_frame(df, data_types), sample_size=8)
+
+    assert '- Сумма: 1 values outside Tukey fences' in profile['text']
+    assert '- Статус: constant value оплачен' in profile['text']
+    assert '- Примечание: 98% of values are missing' in profile['text']
+    assert '- Примечание: constant value есть' in profile['text']
+    assert profile['anomalies'] == 4
+
+    assert 'Sample (8 rows sampled evenly across values of Город):' in profile['text']
+    sample = profile['text'].split('Город):\n', 1)[1].splitlines()[1:]
+    # Каждый город попадает в выборку поровну
+    assert sorted(line.split(' | ')[1] for line in sample) == sorted(['Москва', 'Казань', 'Омск', 'Самара'] * 2)
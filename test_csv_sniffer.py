@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тесты определения параметров CSV: кодировка, разделитель, преамбула, оборванный префикс
+"""
+
+import pandas as pd
+
+from csv_sniffer import csv_read_options, sniff_csv, sniff_csv_bytes
+
+# Типичная выгрузка на русском: cp1251, точка с запятой, десятичная запятая
+REPORT_CSV = (
+    'Отчет о продажах за январь\n'
+    'Сформирован: 01.02.2024\n'
+    'Город;Сумма;Дата\n'
+    'Москва;10,5;01.01.2024\n'
+    'Казань;20;02.01.2024\n'
+    'Самара;30;03.01.2024\n'
+)
+
+
+def test_cp1251_semicolon_with_preamble(tmp_path):
+    filepath = tmp_path / 'report.csv'
+    filepath.write_bytes(REPORT_CSV.encode('cp1251'))
+
+    dialect = sniff_csv(str(filepath))
+    assert dialect['encoding'] == 'cp1251'
+    assert dialect['bom'] is False
+    assert dialect['delimiter'] == ';'
+    assert dialect['header_row'] == 2
+    assert dialect['has_header'] is True
+
+    df = pd.read_csv(filepath, **csv_read_options(dialect))
+    assert list(df.columns) == ['Город', 'Сумма', 'Дата']
+    assert df['Город'].tolist() == ['Москва', 'Казань', 'Самара']
+
+
+def test_utf8_comma_without_preamble():
+    dialect = sniff_csv_bytes('Город,Сумма\nМосква,10\nКазань,20\n'.encode('utf-8'), True)
+    assert dialect['encoding'] == 'utf-8'
+    assert dialect['delimiter'] == ','
+    assert dialect['header_row'] == 0
+    assert dialect['has_header'] is True
+
+
+def test_utf8_bom():
+    raw = 'Город;Сумма\nМосква;10\n'.encode('utf-8-sig')
+    dialect = sniff_csv_bytes(raw, True)
+    assert dialect['encoding'] == 'utf-8-sig'
+    assert dialect['bom'] is True
+    assert dialect['delimiter'] == ';'
+
+
+def test_numeric_first_row_has_no_header():
+    dialect = sniff_csv_bytes(b'1;2;3\n4;5;6\n7;8;9\n', True)
+    assert dialect['delimiter'] == ';'
+    assert dialect['has_header'] is False
+    assert csv_read_options(dialect)['header'] is None
+
+
+def test_prefix_cut_inside_multibyte_character_stays_utf8():
+    raw = ('Город,Сумма\n' + 'Москва,10\n' * 50).encode('utf-8')
+    # Префикс обрывается посередине двухбайтной буквы
+    cut = raw[:len('Город,Сумма\n'.encode('utf-8')) + 3]
+    dialect = sniff_csv_bytes(cut, False)
+    assert dialect['encoding'] == 'utf-8'
+    assert dialect['delimiter'] == ','
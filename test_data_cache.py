@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тесты кэша разобранных файлов: бюджет памяти, вытеснение и устаревание записей
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import DataFrameCache
+from table_query import TableIndex
+
+
+def make_frame(rows=1000):
+    return pd.DataFrame({'value': np.arange(rows, dtype=np.float64), 'code': np.arange(rows, dtype=np.int64)})
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'file{index}.csv'
+        path.write_text(f'value\n{index}\n', encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def frame_size(df):
+    return DataFrameCache.estimate_size(df)
+
+
+def test_least_recently_used_entry_is_evicted(files):
+    df = make_frame()
+    cache = DataFrameCache(max_bytes=frame_size(df) * 2 + 100)
+    for path in files[:2]:
+        cache.put(path, df.copy())
+    # Обращение к первому файлу делает второй самым старым
+    assert cache.get(files[0]) is not None
+    cache.put(files[2], df.copy())
+
+    assert cache.get(files[1]) is None
+    assert cache.get(files[0]) is not None
+    assert cache.get(files[2]) is not None
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['current_bytes'] <= stats['max_bytes']
+
+
+def test_entry_larger_than_budget_is_not_cached(files):
+    df = make_frame()
+    cache = DataFrameCache(max_bytes=frame_size(df) // 2)
+    entry = cache.put(files[0], df)
+    assert entry['df'] is df
+    assert cache.get(files[0]) is None
+    assert cache.get_stats()['current_bytes'] == 0
+
+
+def test_artifacts_count_towards_budget(files):
+    df = make_frame()
+    cache = DataFrameCache()
+    entry = cache.put(files[0], df, preview=df, extra=np.zeros(10000))
+    # Та же таблица в другом поле не считается дважды
+    assert entry['size'] >= frame_size(df) + 80000
+    assert entry['size'] < 2 * frame_size(df) + 80000
+
+    size = entry['size']
+    cache.attach(entry, stats={'value': {'mean': 1.0}})
+    assert entry['size'] > size
+    assert cache.get_stats()['current_bytes'] == entry['size']
+
+
+def test_growing_index_evicts_other_entries(files):
+    df = make_frame(5000)
+    cache = DataFrameCache(max_bytes=1_000_000)
+    first = cache.put(files[0], df)
+    cache.put(files[1], make_frame(20000))
+
+    cache.get(files[0])
+    index = TableIndex(df)
+    cache.attach(first, table_index=index)
+    index.query(search='1', sort_by='value', descending=True)
+    index.query(sort_by='code')
+    cache.refresh_size(first)
+
+    assert first['size'] >= frame_size(df) + index.nbytes
+    assert cache.get(files[1]) is None
+    assert cache.get(files[0]) is first
+    assert cache.get_stats()['current_bytes'] == first['size'] <= 1_000_000
+
+
+def test_entry_that_outgrows_budget_is_dropped(files):
+    df = make_frame(5000)
+    cache = DataFrameCache(max_bytes=frame_size(df) + 1000)
+    entry = cache.put(files[0], df)
+    cache.attach(entry, extra=np.zeros(1000))
+    assert cache.get(files[0]) is None
+    assert cache.get_stats()['current_bytes'] == 0
+
+
+def test_changed_file_is_reloaded(files):
+    cache = DataFrameCache()
+    cache.put(files[0], make_frame())
+    with open(files[0], 'a', encoding='utf-8') as file:
+        file.write('1\n')
+    stat = os.stat(files[0])
+    os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert cache.get(files[0]) is None
+    assert cache.get_stats()['current_bytes'] == 0
+
+
+def test_invalidate_removes_all_views(files):
+    cache = DataFrameCache()
+    cache.put(files[0], make_frame(), view='january')
+    cache.put(files[0], make_frame(), view='february')
+    cache.put(files[1], make_frame())
+
+    cache.invalidate(files[0])
+    assert cache.get(files[0], 'january') is None
+    assert cache.get(files[0], 'february') is None
+    assert cache.get(files[1]) is not None
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Тесты чтения Excel: построчное чтение xlsx дает ту же таблицу, что и pd.read_excel
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from excel_reader import detect_excel_format, list_sheets, read_excel
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.mark.parametrize('name', ['III.xlsx', 'test_table.xlsx'])
+def test_xlsx_matches_pandas(name):
+    filepath = os.path.join(HERE, name)
+    df = read_excel(filepath)
+    expected = pd.read_excel(filepath, engine='openpyxl')
+    assert df.attrs['excel_sheet'] == list_sheets(filepath)[0]
+    df.attrs = {}
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_sheet_selection(tmp_path):
+    filepath = str(tmp_path / 'book.xlsx')
+    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+        pd.DataFrame({'Город': ['Москва'], 'Сумма': [10]}).to_excel(writer, sheet_name='Январь', index=False)
+        pd.DataFrame({'Город': ['Казань', 'Омск'], 'Сумма': [20.5, None]}).to_excel(
+            writer, sheet_name='Февраль', index=False
+        )
+
+    assert detect_excel_format(filepath) == 'xlsx'
+    assert list_sheets(filepath) == ['Январь', 'Февраль']
+    df = read_excel(filepath, sheet='Февраль')
+    pd.testing.assert_frame_equal(df, pd.read_excel(filepath, sheet_name='Февраль'))
+    assert df.attrs['excel_sheet'] == 'Февраль'
+    with pytest.raises(ValueError):
+        read_excel(filepath, sheet='Март')
+
+
+def test_not_a_workbook_is_rejected(tmp_path):
+    filepath = tmp_path / 'table.xlsx'
+    filepath.write_text('Город;Сумма\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        detect_excel_format(str(filepath))
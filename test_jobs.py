@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тесты общей для процессов очереди задач: прерванные задачи завершаются с ошибкой
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+import jobs
+from jobs import JobQueue
+
+
+def write_job(folder, job_id, **fields):
+    job = {
+        'id': job_id,
+        'owner_pid': None,
+        'status': 'running',
+        'stage': 'parse',
+        'stages': {stage: {'status': 'pending', 'progress': 0.0} for stage in jobs.JOB_STAGES},
+        'error': None,
+        'created_at': time.time(),
+        'finished_at': None,
+        'saved_at': time.time()
+    }
+    job.update(fields)
+    (folder / f'{job_id}.json').write_text(json.dumps(job), encoding='utf-8')
+
+
+def finished_pid():
+    """pid завершившегося процесса"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def make_queue(tmp_path):
+    queue = JobQueue(workers=1)
+    queue.share_state(str(tmp_path))
+    return queue
+
+
+def test_job_of_dead_process_becomes_error(tmp_path):
+    queue = make_queue(tmp_path)
+    write_job(tmp_path, 'deadjob', owner_pid=finished_pid())
+
+    status = queue.get_status('deadjob')
+    assert status['status'] == 'error'
+    assert status['error'] == jobs.ABANDONED_JOB_ERROR
+    # Отметка сохранена - другие процессы тоже увидят ошибку
+    saved = json.loads((tmp_path / 'deadjob.json').read_text(encoding='utf-8'))
+    assert saved['status'] == 'error'
+
+
+def test_job_without_heartbeat_becomes_error(tmp_path):
+    queue = make_queue(tmp_path)
+    write_job(tmp_path, 'stalejob', saved_at=time.time() - jobs.HEARTBEAT_TIMEOUT - 1)
+    assert queue.get_status('stalejob')['status'] == 'error'
+
+
+def test_job_of_live_process_keeps_running(tmp_path):
+    queue = make_queue(tmp_path)
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        write_job(tmp_path, 'livejob', owner_pid=process.pid)
+        assert queue.get_status('livejob')['status'] == 'running'
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_finished_job_is_shared(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit(lambda report: ({'success': True}, 200))
+    for _ in range(100):
+        if queue.get_status(job_id)['status'] == 'done':
+            break
+        time.sleep(0.02)
+
+    other = make_queue(tmp_path)
+    assert other.get_status(job_id)['status'] == 'done'
+    assert other.get_result(job_id) == [{'success': True}, 200]
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тесты текстового формата Prometheus для /metrics
+"""
+
+import os
+
+import pytest
+
+from metrics import Registry
+
+
+def test_counter_and_gauge_lines():
+    registry = Registry()
+    rows = registry.counter('rows_total', 'Строк', ['format'])
+    memory = registry.gauge('memory_bytes', 'Память')
+    rows.inc(10, format='csv')
+    rows.inc(5, format='csv')
+    memory.set(1024)
+
+    text = registry.render()
+    pid = os.getpid()
+    assert text.endswith('\n')
+    assert '# HELP rows_total Строк\n# TYPE rows_total counter\n' in text
+    assert f'rows_total{{pid="{pid}",format="csv"}} 15\n' in text
+    assert '# TYPE memory_bytes gauge\n' in text
+    assert f'memory_bytes{{pid="{pid}"}} 1024\n' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Задержка', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        latency.observe(value, stage='parse')
+
+    lines = registry.render().splitlines()
+    pid = os.getpid()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert f'latency_seconds_bucket{{pid="{pid}",stage="parse",le="0.1"}} 1' in lines
+    assert f'latency_seconds_bucket{{pid="{pid}",stage="parse",le="1"}} 3' in lines
+    assert f'latency_seconds_bucket{{pid="{pid}",stage="parse",le="+Inf"}} 4' in lines
+    assert f'latency_seconds_sum{{pid="{pid}",stage="parse"}} 6.25' in lines
+    assert f'latency_seconds_count{{pid="{pid}",stage="parse"}} 4' in lines
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Запросы', ['endpoint'])
+    requests.inc(endpoint='a"b\\c\nd')
+    assert 'endpoint="a\\"b\\\\c\\nd"' in registry.render()
+
+
+def test_wrong_labels_are_rejected():
+    registry = Registry()
+    rows = registry.counter('rows_total', 'Строк', ['format'])
+    with pytest.raises(ValueError):
+        rows.inc(format='csv', sheet='1')
+
+
+def test_collectors_run_before_render():
+    registry = Registry()
+    lookups = registry.counter('lookups_total', 'Обращения', ['result'])
+    hits = {'value': 0}
+
+    def collect():
+        hits['value'] += 3
+        lookups.set_total(hits['value'], result='hit')
+
+    registry.add_collector(collect)
+    assert 'result="hit"} 3\n' in registry.render()
+    assert 'result="hit"} 6\n' in registry.render()
+
+
+def test_reset_clears_values():
+    registry = Registry()
+    rows = registry.counter('rows_total', 'Строк')
+    rows.inc(7)
+    registry.reset()
+    assert registry.render() == '# HELP rows_total Строк\n# TYPE rows_total counter\n'
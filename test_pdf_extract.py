@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Тесты склейки таблиц PDF, продолжающихся на следующих страницах
+"""
+
+from pdf_extract import stitch_tables
+
+SALES_HEADER = ['Город', 'Сумма', 'Количество']
+STOCK_HEADER = ['Склад', 'Остаток', 'Резерв']
+
+
+def table(rows, at_top=True, at_bottom=True):
+    return {'rows': rows, 'at_top': at_top, 'at_bottom': at_bottom}
+
+
+def test_continuation_without_header_is_stitched():
+    page_tables = [
+        (0, [table([SALES_HEADER, ['Москва', '10', '1'], ['Казань', '20', '2']], at_top=False)]),
+        (1, [table([['Самара', '30', '3'], ['Омск', '40', '4']], at_bottom=False)])
+    ]
+    stitched = stitch_tables(page_tables)
+    assert len(stitched) == 1
+    assert [row[0] for row in stitched[0]['rows']] == ['Москва', 'Казань', 'Самара', 'Омск']
+    assert (stitched[0]['first_page'], stitched[0]['last_page']) == (0, 1)
+
+
+def test_repeated_header_is_dropped():
+    page_tables = [
+        (0, [table([SALES_HEADER, ['Москва', '10', '1']])]),
+        (1, [table([SALES_HEADER, ['Самара', '30', '3']])])
+    ]
+    stitched = stitch_tables(page_tables)
+    assert len(stitched) == 1
+    assert stitched[0]['rows'] == [['Москва', '10', '1'], ['Самара', '30', '3']]
+
+
+def test_other_table_of_same_width_is_not_stitched():
+    # Другая таблица той же ширины вверху следующей страницы: первая строка - её заголовок
+    page_tables = [
+        (0, [table([SALES_HEADER, ['Москва', '10', '1'], ['Казань', '20', '2']], at_top=False)]),
+        (1, [table([STOCK_HEADER, ['Северный', '100', '5']], at_bottom=False)])
+    ]
+    stitched = stitch_tables(page_tables)
+    assert len(stitched) == 2
+    assert stitched[0]['rows'] == [['Москва', '10', '1'], ['Казань', '20', '2']]
+    assert stitched[1]['header_row'] == STOCK_HEADER
+    assert stitched[1]['rows'] == [['Северный', '100', '5']]
+
+
+def test_table_that_ends_mid_page_is_not_continued():
+    page_tables = [
+        (0, [table([SALES_HEADER, ['Москва', '10', '1']], at_bottom=False)]),
+        (1, [table([['Самара', '30', '3']])])
+    ]
+    assert len(stitch_tables(page_tables)) == 2
+
+
+def test_table_below_page_top_is_not_continued():
+    page_tables = [
+        (0, [table([SALES_HEADER, ['Москва', '10', '1']])]),
+        (1, [table([['Самара', '30', '3']], at_top=False)])
+    ]
+    assert len(stitch_tables(page_tables)) == 2
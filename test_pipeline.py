@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Тесты колоночных снимков разобранных файлов
+"""
+
+import pandas as pd
+import pytest
+
+import pipeline
+
+pytestmark = pytest.mark.skipif(not pipeline.SNAPSHOT_AVAILABLE, reason='pyarrow не установлен')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    filepath = tmp_path / 'report.xlsx'
+    filepath.write_bytes(b'workbook')
+    return str(filepath)
+
+
+def make_frame():
+    df = pd.DataFrame({'Город': ['Москва', 'Казань'], 'Сумма': [10.5, 20.0]})
+    df.attrs['excel_sheet'] = 'Лист1'
+    df.attrs['csv_dialect'] = {'encoding': 'cp1251', 'delimiter': ';'}
+    return df
+
+
+def test_snapshot_restores_frame_and_attrs(workbook):
+    assert pipeline.write_snapshot(workbook, make_frame(), {'sheet': 'Лист1'})
+    df = pipeline.read_snapshot(workbook, {'sheet': 'Лист1'})
+    pd.testing.assert_frame_equal(df, make_frame())
+    assert df.attrs['excel_sheet'] == 'Лист1'
+    assert df.attrs['csv_dialect'] == {'encoding': 'cp1251', 'delimiter': ';'}
+
+
+def test_snapshot_with_other_options_is_ignored(workbook):
+    assert pipeline.write_snapshot(workbook, make_frame(), {'sheet': 'Лист1'})
+    assert pipeline.read_snapshot(workbook, {'sheet': 'Лист2'}) is None
+    assert pipeline.read_snapshot(workbook, {}) is None
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Тесты профилирования: HyperLogLog на известном числе уникальных значений, точный и приближенный профиль
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from profiling import HyperLogLog, profile_frame
+
+
+@pytest.mark.parametrize('cardinality', [100, 1000, 50000, 500000])
+def test_hyperloglog_estimate_is_close(cardinality):
+    sketch = HyperLogLog()
+    values = pd.Series(np.arange(cardinality)).astype(str)
+    # Повторы и пропуски не меняют оценку
+    sketch.update(pd.concat([values, values.iloc[::3], pd.Series([None] * 10)], ignore_index=True))
+    assert sketch.estimate() == pytest.approx(cardinality, rel=0.03)
+
+
+def test_hyperloglog_merge_counts_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(pd.Series(np.arange(0, 60000)))
+    right.update(pd.Series(np.arange(40000, 100000)))
+    left.merge(right)
+    assert left.estimate() == pytest.approx(100000, rel=0.03)
+
+
+def test_approximate_profile_is_close_to_exact():
+    rng = np.random.default_rng(3)
+    rows = 200000
+    df = pd.DataFrame({
+        'Сумма': rng.normal(100, 20, rows),
+        'Клиент': pd.Series(rng.integers(0, 30000, rows)).astype(str),
+        'Город': rng.choice(['Москва', 'Казань', 'Омск'], rows, p=[0.5, 0.3, 0.2])
+    })
+    data_types = {'Сумма': 'numeric', 'Клиент': 'text', 'Город': 'text'}
+    exact = profile_frame(df, data_types, exact=True)
+    approximate = profile_frame(df, data_types, approx_min_rows=100000)
+
+    assert not exact['Клиент']['approximate'] and approximate['Клиент']['approximate']
+    assert approximate['Клиент']['unique_count'] == pytest.approx(exact['Клиент']['unique_count'], rel=0.03)
+    assert approximate['Город']['most_common'] == exact['Город']['most_common'] == 'Москва'
+    assert approximate['Город']['top_values'][0]['count'] == pytest.approx(rows * 0.5, rel=0.02)
+
+    # Сумма, среднее и отклонение всегда точные, квантили - по выборке
+    for field in ('count', 'sum', 'mean', 'std', 'min', 'max'):
+        assert approximate['Сумма'][field] == exact['Сумма'][field]
+    for label, value in exact['Сумма']['quantiles'].items():
+        assert approximate['Сумма']['quantiles'][label] == pytest.approx(value, rel=0.01)
+
+
+def test_exact_profile_matches_pandas():
+    df = pd.DataFrame({'Сумма': [1.5, None, 3.0, 10.0, -2.0], 'Город': ['Омск', 'Омск', None, 'Казань', 'Омск']})
+    profile = profile_frame(df, {'Сумма': 'numeric', 'Город': 'categorical'})
+    expected = df['Сумма'].describe()
+
+    assert profile['Сумма']['count'] == expected['count']
+    assert profile['Сумма']['mean'] == pytest.approx(expected['mean'])
+    assert profile['Сумма']['std'] == pytest.approx(expected['std'])
+    assert profile['Сумма']['quantiles']['50%'] == expected['50%']
+    assert profile['Сумма']['null_ratio'] == 0.2
+    assert profile['Город']['unique_count'] == 2
+    assert profile['Город']['top_values'] == [{'value': 'Омск', 'count': 3}, {'value': 'Казань', 'count': 1}]
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тесты потокового чтения CSV: статистика по частям совпадает с расчетом по всей таблице
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_sniffer import sniff_csv
+from streaming import ColumnAccumulator, stream_csv
+
+DATA_TYPES = {'Сумма': 'numeric', 'Город': 'categorical', 'Дата': 'datetime'}
+
+
+@pytest.fixture
+def table(tmp_path):
+    rng = np.random.default_rng(1)
+    rows = 1000
+    df = pd.DataFrame({
+        'Сумма': rng.normal(1000, 250, rows).round(2),
+        'Город': rng.choice(['Москва', 'Казань', 'Самара', 'Омск'], rows, p=[0.4, 0.3, 0.2, 0.1]),
+        'Дата': pd.date_range('2024-01-01', periods=rows, freq='h').strftime('%Y-%m-%d %H:%M:%S')
+    })
+    df.loc[::17, 'Сумма'] = np.nan
+    filepath = tmp_path / 'sales.csv'
+    df.to_csv(filepath, index=False, sep=';')
+    return str(filepath), df
+
+
+def read_stats(filepath, chunksize):
+    return stream_csv(filepath, sniff_csv(filepath), lambda chunk: DATA_TYPES, chunksize=chunksize)
+
+
+@pytest.mark.parametrize('chunksize', [7, 100, 5000])
+def test_numeric_stats_match_describe(table, chunksize):
+    filepath, df = table
+    summary = read_stats(filepath, chunksize)
+    stats = summary['stats']['Сумма']
+    expected = df['Сумма'].describe()
+
+    assert summary['total_rows'] == len(df)
+    assert stats['count'] == expected['count']
+    assert stats['mean'] == pytest.approx(expected['mean'], rel=1e-12)
+    assert stats['std'] == pytest.approx(expected['std'], rel=1e-9)
+    assert stats['min'] == expected['min'] and stats['max'] == expected['max']
+    assert stats['sum'] == pytest.approx(df['Сумма'].sum(), rel=1e-12)
+    # Выборка больше таблицы - квантили точные
+    for label in ('25%', '50%', '75%'):
+        assert stats['quantiles'][label] == pytest.approx(expected[label])
+    assert stats['null_ratio'] == round(df['Сумма'].isna().mean(), 4)
+
+
+def test_categorical_and_date_stats(table):
+    filepath, df = table
+    stats = read_stats(filepath, 64)['stats']
+
+    counts = df['Город'].value_counts()
+    assert stats['Город']['unique_count'] == len(counts)
+    assert [item['value'] for item in stats['Город']['top_values']] == counts.index.tolist()
+    assert [item['count'] for item in stats['Город']['top_values']] == counts.tolist()
+    assert stats['Город']['total_count'] == len(df)
+    assert stats['Дата']['min_date'] == str(pd.Timestamp(df['Дата'].min()))
+    assert stats['Дата']['max_date'] == str(pd.Timestamp(df['Дата'].max()))
+
+
+def test_moment_merge_is_stable_for_distant_chunks():
+    # Части с сильно разными средними: наивная сумма квадратов теряет точность
+    rng = np.random.default_rng(2)
+    chunks = [rng.normal(1e9, 1, 500), rng.normal(-1e9, 1, 300), rng.normal(0, 1, 1)]
+    accumulator = ColumnAccumulator('numeric')
+    for chunk in chunks:
+        accumulator.update(pd.Series(chunk))
+
+    values = np.concatenate(chunks)
+    stats = accumulator.to_stats()
+    assert stats['count'] == len(values)
+    assert stats['mean'] == pytest.approx(values.mean(), rel=1e-9, abs=1e-3)
+    assert stats['std'] == pytest.approx(values.std(ddof=1), rel=1e-12)
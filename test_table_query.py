@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Тесты запросов к таблице: фильтры, поиск, сортировка и окно строк
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from table_query import TableIndex, parse_filters, query_chunks
+
+
+def make_frame():
+    return pd.DataFrame({
+        'Город': ['Москва', 'Казань', 'Самара', None, 'москва'],
+        'Сумма': [10.0, 30.0, np.nan, 20.0, 5.0],
+        'Дата': pd.to_datetime(['2024-01-03', '2024-01-01', '2024-01-05', None, '2024-01-02'])
+    })
+
+
+DATA_TYPES = {'Город': 'categorical', 'Сумма': 'numeric', 'Дата': 'datetime'}
+
+
+def query(filters=(), **kwargs):
+    return TableIndex(make_frame()).query(parse_filters(filters), **kwargs)
+
+
+def test_parse_filters_defaults_and_errors():
+    assert parse_filters([{'column': 'Город', 'value': 'мос'}]) == [
+        {'column': 'Город', 'op': 'contains', 'value': 'мос'}
+    ]
+    assert parse_filters([{'column': 'Город', 'op': 'empty'}])[0]['value'] is None
+    with pytest.raises(ValueError):
+        parse_filters([{'op': 'eq', 'value': 1}])
+    with pytest.raises(ValueError):
+        parse_filters([{'column': 'Город', 'op': 'like', 'value': 'x'}])
+    with pytest.raises(ValueError):
+        parse_filters([{'column': 'Город', 'op': 'eq', 'value': ''}])
+
+
+def test_text_filters_ignore_case():
+    _, positions, total = query([{'column': 'Город', 'op': 'contains', 'value': 'МОС'}])
+    assert positions.tolist() == [0, 4] and total == 2
+    _, positions, _ = query([{'column': 'Город', 'op': 'ne', 'value': 'москва'}])
+    # Пропуск не считается "не равным" значению
+    assert positions.tolist() == [1, 2]
+
+
+def test_numeric_and_date_comparisons():
+    _, positions, _ = query([{'column': 'Сумма', 'op': 'gte', 'value': '20'}])
+    assert positions.tolist() == [1, 3]
+    _, positions, _ = query([{'column': 'Дата', 'op': 'lt', 'value': '2024-01-03'}])
+    assert positions.tolist() == [1, 4]
+    with pytest.raises(ValueError):
+        query([{'column': 'Сумма', 'op': 'gt', 'value': 'много'}])
+    with pytest.raises(ValueError):
+        query([{'column': 'Город', 'op': 'gt', 'value': 'А'}])
+
+
+def test_empty_filters_and_search():
+    _, positions, _ = query([{'column': 'Сумма', 'op': 'empty'}])
+    assert positions.tolist() == [2]
+    _, positions, total = query(
+        [{'column': 'Город', 'op': 'not_empty'}, {'column': 'Сумма', 'op': 'lt', 'value': 20}],
+        search='москва'
+    )
+    assert positions.tolist() == [0, 4] and total == 2
+
+
+def test_sort_puts_missing_values_last_and_applies_window():
+    _, positions, total = query(sort_by='Сумма')
+    assert positions.tolist() == [4, 0, 3, 1, 2] and total == 5
+    _, positions, _ = query(sort_by='Сумма', descending=True)
+    assert positions.tolist() == [1, 3, 0, 4, 2]
+    _, positions, total = query(
+        [{'column': 'Город', 'op': 'not_empty'}], sort_by='Дата', offset=1, limit=2
+    )
+    assert positions.tolist() == [4, 0] and total == 4
+
+
+def test_query_chunks_reads_csv_in_parts():
+    text = make_frame().to_csv(index=False)
+    filters = parse_filters([{'column': 'Сумма', 'op': 'gt', 'value': 1}])
+
+    def chunks():
+        return pd.read_csv(io.StringIO(text), chunksize=2, dtype=str)
+
+    window, positions, total = query_chunks(chunks(), DATA_TYPES, filters, sort_by='Сумма', offset=1, limit=2)
+    assert positions.tolist() == [0, 3] and total == 4
+    assert window['Сумма'].tolist() == [10.0, 20.0]
+
+    _, positions, total = query_chunks(chunks(), DATA_TYPES, filters, offset=1, limit=2)
+    assert positions.tolist() == [1, 3] and total == 4
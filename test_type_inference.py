@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Тесты определения типов столбцов: типы, уверенность и порог доли подходящих значений
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from type_inference import compact_numeric, infer_column_types, normalize_dtypes, stratified_sample
+
+
+def make_column(good, bad, rows=1000):
+    """Столбец из строк, где доля bad значений не разбирается как число"""
+    bad_rows = int(rows * bad)
+    values = [good(index) for index in range(rows - bad_rows)] + ['н/д'] * bad_rows
+    return pd.Series(values, dtype=object).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_types_of_clean_columns():
+    rows = 3000
+    df = pd.DataFrame({
+        'Сумма': [str(index * 1.5) for index in range(rows)],
+        'Дата': pd.date_range('2024-01-01', periods=rows, freq='D').strftime('%d.%m.%Y'),
+        'Город': np.resize(['Москва', 'Казань', 'Омск'], rows),
+        'Комментарий': [f'заказ номер {index}' for index in range(rows)],
+        'Количество': np.arange(rows),
+        'Пусто': [None] * rows
+    })
+    types = infer_column_types(df)
+
+    assert types['Сумма'] == {'type': 'numeric', 'confidence': 1.0}
+    assert types['Дата']['type'] == 'datetime' and types['Дата']['confidence'] == 1.0
+    assert types['Город']['type'] == 'categorical'
+    assert types['Комментарий']['type'] == 'text'
+    assert types['Количество'] == {'type': 'numeric', 'confidence': 1.0}
+    assert types['Пусто']['type'] == 'empty'
+    assert list(types) == list(df.columns)
+
+
+@pytest.mark.parametrize('bad, expected', [(0.02, 'numeric'), (0.2, 'categorical')])
+def test_threshold_decides_type(bad, expected):
+    df = pd.DataFrame({'Сумма': make_column(lambda index: str(index % 10), bad)})
+    types = infer_column_types(df, threshold=0.9)
+    assert types['Сумма']['type'] == expected
+    # Уверенность показывает, насколько чистый столбец
+    assert types['Сумма']['confidence'] == pytest.approx(1 - bad if expected == 'numeric' else bad, abs=0.03)
+
+
+def test_sample_covers_whole_file():
+    df = pd.DataFrame({'row': np.arange(100000)})
+    sample = stratified_sample(df, sample_size=1000)
+    assert len(sample) <= 1000
+    # В выборку попадают строки из каждой десятой части файла
+    assert len(np.unique(sample['row'].to_numpy() // 10000)) == 10
+    assert sample.index.is_monotonic_increasing
+
+
+def test_default_threshold_keeps_slightly_dirty_columns_numeric():
+    df = pd.DataFrame({
+        'Сумма': make_column(lambda index: str(index % 10), 0.04),
+        'Код': make_column(lambda index: str(index % 10), 0.06)
+    })
+    types = infer_column_types(df)
+    assert types['Сумма'] == {'type': 'numeric', 'confidence': 0.96}
+    assert types['Код']['type'] == 'categorical'
+
+    # Значения, которые не подошли под тип, при приведении становятся пустыми
+    normalized = normalize_dtypes(df, types)
+    assert normalized['Сумма'].isna().sum() == 40
+    assert normalized['Сумма'].sum() == pd.to_numeric(df['Сумма'], errors='coerce').sum()
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([0, 1, 255], np.int16),
+    ([-3, 0, 40000], np.int32),
+    ([1.0, 2.0, 3.0], np.int8),
+    ([0.5, 1.25, -2.0], np.float32),
+    ([0.1, 2.3, 1e10 + 0.5], np.float64),
+    ([1.0, None, 3.0], np.float32)
+])
+def test_compact_numeric_is_lossless(values, dtype):
+    series = pd.Series(values, dtype=np.float64 if None in values else None)
+    compact = compact_numeric(series)
+    assert compact.dtype == dtype
+    np.testing.assert_array_equal(compact.astype(np.float64), series.astype(np.float64))
+
+
+def test_normalize_dtypes_round_trips_values():
+    rows = 200
+    df = pd.DataFrame({
+        'Сумма': [f'{index * 0.1:.1f}' for index in range(rows)],
+        'Дата': pd.date_range('2024-01-31', periods=rows, freq='D').strftime('%d.%m.%Y'),
+        'Город': np.resize(['Москва', 'Казань', None], rows),
+        'Комментарий': [f'заказ {index}' for index in range(rows)]
+    }, index=pd.RangeIndex(100, 100 + rows))
+    df.attrs['excel_sheet'] = 'Лист1'
+    types = infer_column_types(df)
+    normalized = normalize_dtypes(df, types)
+
+    assert types['Дата']['format'] == '%d.%m.%Y'
+    pd.testing.assert_series_equal(
+        normalized['Сумма'].astype(np.float64), pd.to_numeric(df['Сумма']), check_exact=True
+    )
+    pd.testing.assert_series_equal(
+        normalized['Дата'].dt.strftime('%d.%m.%Y'), df['Дата'], check_names=False
+    )
+    assert isinstance(normalized['Город'].dtype, pd.CategoricalDtype)
+    assert normalized['Город'].isna().equals(df['Город'].isna())
+    assert normalized['Город'].dropna().tolist() == df['Город'].dropna().tolist()
+    assert normalized['Комментарий'].tolist() == df['Комментарий'].tolist()
+    assert normalized.index.equals(df.index)
+    assert normalized.attrs == df.attrs
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Тесты хранилища загрузок: повторные загрузки и представления с разными параметрами чтения
+"""
+
+import io
+import threading
+
+import pytest
+
+from pipeline import load_read_options, save_read_options
+from upload_store import (
+    get_view_name, options_key, read_artifacts, remove_saved_data, settings_fingerprint, split_view_name,
+    store_upload, write_artifacts
+)
+
+CSV_BYTES = 'Город;Сумма\nМосква;10\nКазань;20\n'.encode('cp1251')
+
+
+def test_same_content_is_stored_once(tmp_path):
+    first = store_upload(io.BytesIO(CSV_BYTES), str(tmp_path), 'csv')
+    second = store_upload(io.BytesIO(CSV_BYTES), str(tmp_path), 'csv')
+    assert first['is_new'] is True
+    assert second['is_new'] is False
+    assert first['filename'] == second['filename']
+    assert sorted(path.name for path in tmp_path.iterdir()) == [first['filename']]
+
+
+def test_concurrent_uploads_of_same_content_have_one_new(tmp_path):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def upload():
+        barrier.wait()
+        results.append(store_upload(io.BytesIO(CSV_BYTES), str(tmp_path), 'csv'))
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(result['is_new'] for result in results) == 1
+    assert len({result['filename'] for result in results}) == 1
+    assert (tmp_path / results[0]['filename']).read_bytes() == CSV_BYTES
+
+
+STORED_NAME = '0123456789abcdef0123456789abcdef.xlsx'
+
+
+def test_view_names_differ_by_options():
+    assert options_key({}) == ''
+    assert get_view_name(STORED_NAME, {}) == STORED_NAME
+    first = get_view_name(STORED_NAME, {'sheet': 'Январь'})
+    second = get_view_name(STORED_NAME, {'sheet': 'Февраль'})
+    assert first != second
+    assert split_view_name(first) == (STORED_NAME, options_key({'sheet': 'Январь'}))
+    assert split_view_name(STORED_NAME) == (STORED_NAME, '')
+    # Порядок ключей не влияет на имя представления
+    assert options_key({'pdf_first_page': 1, 'pdf_last_page': 3}) == \
+        options_key({'pdf_last_page': 3, 'pdf_first_page': 1})
+
+
+@pytest.mark.parametrize('name', [
+    '../app.py', '/etc/passwd', 'report.xlsx', STORED_NAME + '~../../config.env',
+    STORED_NAME.upper(), STORED_NAME + '/..', None
+])
+def test_foreign_view_names_are_rejected(name):
+    with pytest.raises(ValueError):
+        split_view_name(name)
+
+
+def test_artifacts_are_kept_per_options(tmp_path):
+    filepath = str(tmp_path / 'book.xlsx')
+    january, february = {'sheet': 'Январь'}, {'sheet': 'Февраль'}
+    write_artifacts(filepath, january, {'total_rows': 10})
+    write_artifacts(filepath, february, {'total_rows': 20})
+    assert read_artifacts(filepath, january) == {'total_rows': 10}
+    assert read_artifacts(filepath, february) == {'total_rows': 20}
+    assert read_artifacts(filepath, {}) is None
+
+
+def test_artifacts_of_other_settings_are_stale(tmp_path):
+    filepath = str(tmp_path / 'book.xlsx')
+    approximate = settings_fingerprint({'PROFILE_EXACT': False, 'TYPE_INFERENCE_SAMPLE_SIZE': 1000})
+    exact = settings_fingerprint({'PROFILE_EXACT': True, 'TYPE_INFERENCE_SAMPLE_SIZE': 1000})
+    assert approximate != exact
+
+    write_artifacts(filepath, {}, {'total_rows': 10}, fingerprint=approximate)
+    assert read_artifacts(filepath, {}, approximate) == {'total_rows': 10}
+    assert read_artifacts(filepath, {}, exact) is None
+    # Результаты прежней версии без отпечатка тоже устарели
+    assert read_artifacts(filepath, {}, '') is None
+
+
+def test_read_options_are_kept_per_key(tmp_path):
+    filepath = str(tmp_path / 'book.xlsx')
+    (tmp_path / 'book.xlsx').write_bytes(b'workbook')
+    january_key = save_read_options(filepath, {'sheet': 'Январь'})
+    february_key = save_read_options(filepath, {'sheet': 'Февраль'})
+    assert load_read_options(filepath, january_key) == {'sheet': 'Январь'}
+    assert load_read_options(filepath, february_key) == {'sheet': 'Февраль'}
+    assert load_read_options(filepath, '') == {}
+    assert load_read_options(filepath, 'unknown') is None
+
+    remove_saved_data(filepath)
+    assert load_read_options(filepath, january_key) is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['book.xlsx']
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Определение типов данных столбцов по стратифицированной выборке строк
+Значения всех столбцов разбираются одним векторным вызовом на каждый формат,
+без перебора столбцов в цикле и без исключений в качестве проверки формата
+"""
+
+import numpy as np
+import pandas as pd
+
+# Размер выборки строк для определения типов
+DEFAULT_SAMPLE_SIZE = 1000
+
+# Выборка берется равными долями из стольких частей файла
+SAMPLE_STRATA = 10
+
+# Доля значений, которые должны подойти под тип, чтобы столбец получил этот тип
+# (остальные значения при приведении типов становятся пустыми)
+CONFIDENCE_THRESHOLD = 0.95
+
+# Сколько строк выборки проверять на первом этапе и какая доля совпадений
+# нужна столбцу, чтобы его проверили на всей выборке
+PROBE_ROWS = 50
+PROBE_MIN_RATIO = 0.5
+
+# Поддерживаемые форматы дат
+DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y']
+
+# Пороги для категориальных столбцов
+CATEGORICAL_MAX_UNIQUE = 50
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
+# Текстовые столбцы с долей уникальных значений не больше этой хранятся как category
+TEXT_CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def stratified_sample(df, sample_size=DEFAULT_SAMPLE_SIZE, strata=SAMPLE_STRATA, random_state=0):
+    """Возвращает выборку строк равными долями из начала, середины и конца файла"""
+    total_rows = len(df)
+    if total_rows <= sample_size:
+        return df
+
+    rng = np.random.default_rng(random_state)
+    bounds = np.linspace(0, total_rows, strata + 1, dtype=np.int64)
+    per_stratum = max(sample_size // strata, 1)
+    positions = np.concatenate([
+        rng.integers(low, high, size=per_stratum)
+        for low, high in zip(bounds[:-1], bounds[1:]) if high > low
+    ])
+    return df.iloc[np.unique(positions)]
+
+
+def parse_ratios(block, parse):
+    """Считает для каждого столбца долю непустых значений, которые удалось разобрать"""
+    # Все столбцы разворачиваем в один массив и разбираем одним вызовом
+    values = pd.Series(block.to_numpy().ravel(order='F'))
+    labels = np.repeat(np.arange(block.shape[1]), len(block))
+    mask = values.notna().to_numpy()
+
+    # Повторяющиеся значения (даты, категории) разбираем только один раз
+    codes, uniques = pd.factorize(values)
+    parsed_uniques = parse(pd.Series(uniques, dtype=object)).notna().to_numpy()
+    parsed = np.zeros(len(values), dtype=bool)
+    parsed[codes >= 0] = parsed_uniques[codes[codes >= 0]]
+
+    matched = np.bincount(labels[mask & parsed], minlength=block.shape[1])
+    total = np.bincount(labels[mask], minlength=block.shape[1])
+    return np.where(total > 0, matched / np.maximum(total, 1), 0.0)
+
+
+def staged_ratios(block, parse, probe_rows=PROBE_ROWS):
+    """Сначала проверяет небольшую часть выборки, полную выборку - только для подходящих столбцов"""
+    step = max(len(block) // probe_rows, 1)
+    ratios = parse_ratios(block.iloc[::step], parse)
+    if step == 1:
+        return ratios
+
+    candidates = np.flatnonzero(ratios > PROBE_MIN_RATIO)
+    if len(candidates):
+        ratios[candidates] = parse_ratios(block.iloc[:, candidates], parse)
+    return ratios
+
+
+def infer_column_types(df, sample_size=DEFAULT_SAMPLE_SIZE, threshold=CONFIDENCE_THRESHOLD):
+    """Определяет тип каждого столбца и уверенность в нем (доля подходящих значений)"""
+    sample = stratified_sample(df, sample_size)
+    result = {}
+    text_columns = []
+
+    non_null_counts = sample.notna().sum()
+
+    for position, column in enumerate(df.columns):
+        series = sample.iloc[:, position]
+        if str(column).strip() == '' or non_null_counts.iloc[position] == 0:
+            result[column] = {'type': 'empty', 'confidence': 1.0}
+        elif pd.api.types.is_numeric_dtype(series):
+            result[column] = {'type': 'numeric', 'confidence': 1.0}
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            result[column] = {'type': 'datetime', 'confidence': 1.0}
+        else:
+            text_columns.append(position)
+
+    if not text_columns:
+        return result
+
+    block = sample.iloc[:, text_columns].astype(object)
+    numeric_ratio = staged_ratios(block, lambda values: pd.to_numeric(values, errors='coerce'))
+
+    # Даты ищем только среди нечисловых столбцов, каждый формат - среди еще не подошедших
+    date_ratio = np.zeros(len(text_columns))
+    date_formats = np.full(len(text_columns), None, dtype=object)
+    remaining = np.flatnonzero(numeric_ratio < threshold)
+    for date_format in DATE_FORMATS:
+        columns = remaining[date_ratio[remaining] < threshold]
+        if not len(columns):
+            break
+        ratios = staged_ratios(
+            block.iloc[:, columns],
+            lambda values: pd.to_datetime(values.astype(str), format=date_format, errors='coerce')
+        )
+        improved = ratios > date_ratio[columns]
+        date_formats[columns[improved]] = date_format
+        date_ratio[columns] = np.maximum(date_ratio[columns], ratios)
+
+    unique_counts = block.nunique().to_numpy()
+    total_counts = block.notna().sum().to_numpy()
+
+    for index, position in enumerate(text_columns):
+        column = df.columns[position]
+        if numeric_ratio[index] >= threshold:
+            result[column] = {'type': 'numeric', 'confidence': round(float(numeric_ratio[index]), 4)}
+        elif date_ratio[index] >= threshold:
+            result[column] = {
+                'type': 'datetime',
+                'confidence': round(float(date_ratio[index]), 4),
+                'format': date_formats[index]
+            }
+        else:
+            unique_ratio = unique_counts[index] / total_counts[index]
+            is_categorical = unique_ratio < CATEGORICAL_MAX_UNIQUE_RATIO and unique_counts[index] < CATEGORICAL_MAX_UNIQUE
+            result[column] = {
+                'type': 'categorical' if is_categorical else 'text',
+                # Чем больше значений похожи на число или дату, тем менее надежен текстовый тип
+                'confidence': round(float(1.0 - max(numeric_ratio[index], date_ratio[index])), 4)
+            }
+
+    # Сохраняем порядок столбцов исходной таблицы
+    return {column: result[column] for column in df.columns}
+
+
+def compact_numeric(series):
+    """Приводит столбец к числовому типу минимального размера без потери значений"""
+    values = pd.to_numeric(series, errors='coerce')
+    if pd.api.types.is_bool_dtype(values):
+        return values
+
+    if values.notna().all() and np.array_equal(values, np.floor(values)):
+        return pd.to_numeric(values, downcast='integer')
+
+    if pd.api.types.is_float_dtype(values) and values.dtype != np.float32:
+        compact = values.astype(np.float32)
+        if np.array_equal(compact.astype(np.float64), values, equal_nan=True):
+            return compact
+
+    return values
+
+
+def normalize_dtypes(df, type_info):
+    """Один раз приводит столбцы к определенным типам, чтобы не конвертировать их в каждой функции"""
+    columns = {}
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        info = type_info.get(column, {'type': 'text'})
+
+        if info['type'] == 'numeric':
+            series = compact_numeric(series)
+        elif info['type'] == 'datetime' and not pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, format=info.get('format'), errors='coerce')
+        elif info['type'] == 'categorical':
+            series = series.astype('category')
+        elif info['type'] == 'text' and not isinstance(series.dtype, pd.CategoricalDtype):
+            total_count = series.count()
+            if total_count and series.nunique() / total_count <= TEXT_CATEGORY_MAX_UNIQUE_RATIO:
+                series = series.astype('category')
+
+        columns[position] = series
+
+    normalized = pd.DataFrame(columns)
+    normalized.columns = df.columns
+    normalized.index = df.index
+    normalized.attrs = df.attrs
+    return normalized
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Хранилище загрузок с адресацией по содержимому
+Файл записывается на диск по частям с подсчетом SHA-256 и сохраняется под именем
+из хеша, поэтому повторная загрузка того же файла находит уже разобранные
+результаты (снимок, типы, статистику, диаграммы), а разные файлы с одинаковым
+именем не перезаписывают друг друга. Начало файла проверяется до чтения
+остальной части, поэтому файлы не того формата отклоняются сразу
+
+Один и тот же файл разные пользователи могут открыть с разными параметрами
+чтения (лист книги, страницы PDF). Каждый набор параметров - отдельное
+представление файла со своим именем (хеш + ключ параметров), своими
+сохраненными результатами и снимком, поэтому выбор листа одним пользователем
+не меняет то, что видит другой
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from csv_sniffer import SNIFF_SAMPLE_SIZE, sniff_csv_bytes
+from excel_reader import XLS_SIGNATURE, XLSX_SIGNATURE
+
+# Размер части при записи загружаемого файла
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Сколько символов хеша использовать в имени файла (128 бит)
+HASH_NAME_LENGTH = 32
+
+# Сколько байт от начала файла проверяется до записи остальной части
+VALIDATION_PREFIX_SIZE = SNIFF_SAMPLE_SIZE
+
+# Разделитель имени файла и ключа параметров чтения в имени представления
+VIEW_SEPARATOR = '~'
+
+# Сколько символов хеша параметров чтения использовать в ключе
+OPTIONS_KEY_LENGTH = 12
+
+# Имя представления: хеш содержимого с расширением и необязательный ключ параметров чтения
+VIEW_NAME_PATTERN = re.compile(
+    rf'([0-9a-f]{{{HASH_NAME_LENGTH}}}\.[a-z]+)(?:{re.escape(VIEW_SEPARATOR)}([0-9a-f]{{{OPTIONS_KEY_LENGTH}}}))?'
+)
+
+# Версия сохраненных результатов анализа: увеличивается, когда меняется их состав или расчет
+ARTIFACTS_VERSION = 1
+
+
+class UploadRejected(ValueError):
+    """Загрузка отклонена по содержимому начала файла"""
+
+
+def validate_upload_head(extension, head, is_complete):
+    """Проверяет сигнатуру и заголовок начала файла, возвращает определенный формат"""
+    if not head:
+        raise UploadRejected("Файл пустой")
+
+    if extension in ('xlsx', 'xls'):
+        # Формат книги определяется по содержимому, расширение может не совпадать
+        if head.startswith(XLSX_SIGNATURE):
+            return {'format': 'xlsx'}
+        if head.startswith(XLS_SIGNATURE):
+            return {'format': 'xls'}
+        raise UploadRejected("Файл не является книгой Excel (xlsx или xls)")
+
+    if extension == 'pdf':
+        # Сигнатура PDF может идти не с первого байта
+        if b'%PDF-' not in head[:1024]:
+            raise UploadRejected("Файл не является PDF документом")
+        return {'format': 'pdf'}
+
+    if head.startswith((XLSX_SIGNATURE, XLS_SIGNATURE)) or b'%PDF-' in head[:1024]:
+        raise UploadRejected("Файл имеет расширение .csv, но является книгой Excel или PDF документом")
+    dialect = sniff_csv_bytes(head, is_complete)
+    if b'\x00' in head and not dialect['bom']:
+        raise UploadRejected("Файл .csv содержит двоичные данные")
+    return {'format': 'csv', 'dialect': dialect}
+
+
+def options_key(options):
+    """Ключ параметров чтения: короткий хеш, пустая строка для параметров по умолчанию"""
+    if not options:
+        return ''
+    canonical = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:OPTIONS_KEY_LENGTH]
+
+
+def get_view_name(filename, options):
+    """Имя представления файла с параметрами чтения - его получает браузер для следующих запросов"""
+    key = options_key(options)
+    return f'{filename}{VIEW_SEPARATOR}{key}' if key else filename
+
+
+def split_view_name(view_name):
+    """Разделяет имя представления на имя сохраненного файла и ключ параметров чтения
+
+    Имя приходит из запроса, поэтому всё, что не похоже на имя из хеша, отклоняется
+    (ValueError) - через такое имя нельзя обратиться к файлу вне папки загрузок
+    """
+    match = VIEW_NAME_PATTERN.fullmatch(str(view_name))
+    if match is None:
+        raise ValueError(f"Некорректное имя файла: {view_name}")
+    return match.group(1), match.group(2) or ''
+
+
+def get_view_path(filepath, options):
+    """Начало путей к данным, сохраненным для файла с этими параметрами чтения"""
+    key = options_key(options)
+    return f'{filepath}.{key}' if key else filepath
+
+
+def write_atomically(path, write, mode='w'):
+    """Записывает файл через временный файл с уникальным именем и os.replace
+
+    Одновременные записи одного и того же файла не портят друг друга - остается одна целая копия
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                         suffix='.tmp')
+    try:
+        if mode is None:
+            # Запись по пути (например, pyarrow) - сам файл открывает write
+            os.close(handle)
+            write(temp_path)
+        else:
+            with os.fdopen(handle, mode, encoding='utf-8' if 'b' not in mode else None) as file:
+                write(file)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def publish_upload(temp_path, filepath):
+    """Переносит записанный файл под имя из хеша, если такого файла еще нет
+
+    Возвращает True, если файл новый. Жесткая ссылка создается атомарно и не
+    заменяет существующий файл, поэтому из одновременных загрузок одного и того
+    же содержимого новой считается ровно одна
+    """
+    try:
+        os.link(temp_path, filepath)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        # Файловая система без жестких ссылок - занимаем имя флагом O_EXCL
+        marker = filepath + '.lock'
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        try:
+            if os.path.exists(filepath):
+                return False
+            os.replace(temp_path, filepath)
+            return True
+        finally:
+            os.remove(marker)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def store_upload(stream, folder, extension, chunk_size=UPLOAD_CHUNK_SIZE, validate=True):
+    """Записывает поток в папку загрузок по частям, считая хеш содержимого
+
+    Начало файла проверяется validate_upload_head до чтения остальной части потока.
+    Возвращает словарь: filename, filepath, content_hash, is_new, format, bytes, seconds
+    """
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    detected = None
+    handle, temp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            while True:
+                chunk = stream.read(chunk_size)
+                if validate and detected is None:
+                    # Проверяем начало файла, как только его набралось достаточно
+                    head += chunk[:VALIDATION_PREFIX_SIZE]
+                    if len(head) >= VALIDATION_PREFIX_SIZE or not chunk:
+                        detected = validate_upload_head(extension, head[:VALIDATION_PREFIX_SIZE], not chunk)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                output.write(chunk)
+                size += len(chunk)
+
+        content_hash = digest.hexdigest()
+        stored_name = f'{content_hash[:HASH_NAME_LENGTH]}.{extension}'
+        filepath = os.path.join(folder, stored_name)
+
+        # Тот же файл уже загружался - остается существующая копия и её результаты
+        is_new = publish_upload(temp_path, filepath)
+
+        return {
+            'filename': stored_name,
+            'filepath': filepath,
+            'content_hash': content_hash,
+            'is_new': is_new,
+            'format': detected,
+            'bytes': size,
+            'seconds': time.perf_counter() - started
+        }
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class UploadMetrics:
+    """Счетчики загрузок: объем, скорость записи, повторы и отклоненные файлы"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploads = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.last_throughput = None
+
+    def record(self, upload):
+        """Учитывает сохраненную загрузку, возвращает её метрики для ответа"""
+        throughput = upload['bytes'] / upload['seconds'] / 1024 / 1024 if upload['seconds'] else 0.0
+        with self.lock:
+            self.uploads += 1
+            self.duplicates += 0 if upload['is_new'] else 1
+            self.bytes += upload['bytes']
+            self.seconds += upload['seconds']
+            self.last_throughput = throughput
+        return {
+            'bytes': upload['bytes'],
+            'seconds': round(upload['seconds'], 4),
+            'throughput_mb_s': round(throughput, 2),
+            'duplicate': not upload['is_new']
+        }
+
+    def record_rejected(self):
+        """Учитывает отклоненную загрузку"""
+        with self.lock:
+            self.rejected += 1
+
+    def get_stats(self):
+        """Возвращает накопленные метрики загрузок"""
+        with self.lock:
+            return {
+                'uploads': self.uploads,
+                'duplicates': self.duplicates,
+                'rejected': self.rejected,
+                'bytes': self.bytes,
+                'avg_throughput_mb_s': round(self.bytes / self.seconds / 1024 / 1024, 2) if self.seconds else None,
+                'last_throughput_mb_s': round(self.last_throughput, 2) if self.last_throughput is not None else None
+            }
+
+
+def get_artifacts_path(filepath, options=None):
+    """Возвращает путь к сохраненным результатам анализа файла с этими параметрами чтения"""
+    return get_view_path(filepath, options) + '.artifacts.json'
+
+
+def settings_fingerprint(settings):
+    """Отпечаток версии результатов и параметров анализа (типы, профилирование)
+
+    Результат, сохраненный другой версией кода или с другими параметрами, считается устаревшим
+    """
+    canonical = json.dumps([ARTIFACTS_VERSION, settings], sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:OPTIONS_KEY_LENGTH]
+
+
+def write_artifacts(filepath, options, payload, serialize=json.dumps, fingerprint=''):
+    """Сохраняет результат анализа вместе с параметрами чтения и отпечатком параметров анализа"""
+    try:
+        text = serialize({'options': options or {}, 'fingerprint': fingerprint, 'payload': payload})
+        write_atomically(get_artifacts_path(filepath, options), lambda file: file.write(text))
+        return True
+    except (OSError, TypeError, ValueError):
+        # Результат не сериализуется - при следующей загрузке файл просто разберется заново
+        return False
+
+
+def read_artifacts(filepath, options, fingerprint=''):
+    """Возвращает сохраненный результат анализа, если он получен с теми же параметрами чтения и анализа"""
+    try:
+        with open(get_artifacts_path(filepath, options), 'r', encoding='utf-8') as file:
+            artifacts = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if artifacts.get('options') != (options or {}) or artifacts.get('fingerprint') != fingerprint:
+        return None
+    return artifacts.get('payload')
+
+
+def remove_saved_data(filepath):
+    """Удаляет всё, что сохранено для файла со всеми параметрами чтения (снимки, результаты, параметры)"""
+    for path in glob.glob(glob.escape(filepath) + '.*'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass